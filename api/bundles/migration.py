@@ -362,9 +362,10 @@ async def _migrate_settings_by_bundle(
             conn,
         )
 
-        for event in events:
-            event["user"] = user_name
-            await EventStream.dispatch("settings.changed", **event)
+        await EventStream.dispatch_many(
+            [{"topic": "settings.changed", **event} for event in events],
+            user=user_name,
+        )
 
 
 #
@@ -1,8 +1,10 @@
 import re
+import time
 
 from ayon_server.api.dependencies import CurrentUser
 from ayon_server.api.responses import EmptyResponse
 from ayon_server.events.enroll import EnrollResponseModel, enroll_job
+from ayon_server.events.waiters import enroll_waiters
 from ayon_server.exceptions import (
     BadRequestException,
     ForbiddenException,
@@ -52,6 +54,15 @@ class EnrollRequestModel(OPModel):
         None, title="Filter", description="Filter source events"
     )
     max_retries: int = Field(3, title="Max retries", example=3)
+    wait: int = Field(
+        0,
+        title="Wait",
+        description="When there is no job available, wait up to this number "
+        "of seconds for a new one, instead of returning immediately",
+        ge=0,
+        le=60,
+        example=30,
+    )
     debug: bool = False
 
 
@@ -78,6 +89,10 @@ async def enroll(
 
     Non-error response is returned because having nothing to do is not an error
     and we don't want to spam the logs.
+
+    When `wait` is set, the request is parked until a matching source
+    event is dispatched (or a failed job may be retried) or the timeout
+    expires, so workers don't need to poll in a tight loop.
     """
 
     if not current_user.is_service:
@@ -104,18 +119,24 @@ async def enroll(
 
     user_name = current_user.name
 
-    res = await enroll_job(
-        source_topic,
-        payload.target_topic,
-        sender=payload.sender,
-        user_name=user_name,
-        description=payload.description,
-        sequential=payload.sequential,
-        filter=payload.filter,
-        max_retries=payload.max_retries,
-    )
-
-    if res is None:
-        return EmptyResponse()
-
-    return res
+    deadline = time.monotonic() + payload.wait
+
+    with enroll_waiters.watch(source_topic, payload.target_topic) as waiter:
+        while True:
+            waiter.event.clear()
+            res = await enroll_job(
+                source_topic,
+                payload.target_topic,
+                sender=payload.sender,
+                user_name=user_name,
+                description=payload.description,
+                sequential=payload.sequential,
+                filter=payload.filter,
+                max_retries=payload.max_retries,
+            )
+            if res is not None:
+                return res
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not await waiter.wait(remaining):
+                return EmptyResponse()
@@ -131,7 +131,12 @@ async def update_existing_event(
     user: CurrentUser,
     event_id: EventID,
 ) -> EmptyResponse:
-    """Update existing event."""
+    """Update existing event.
+
+    When `event_update_coalescing_window` is configured, frequent
+    progress updates of the same event are merged and only the latest
+    state is stored. Status changes are always applied immediately.
+    """
 
     res = await Postgres.fetch(
         "SELECT topic, user_name, status, depends_on FROM events WHERE id = $1",
@@ -172,6 +177,7 @@ async def update_existing_event(
         payload=payload.payload,
         progress=payload.progress,
         retries=payload.retries,
+        coalesce=True,
     )
 
     return EmptyResponse()
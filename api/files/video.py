@@ -1,48 +1,216 @@
+"""Range requests for video files.
+
+Video players request the file in (often many, overlapping) byte ranges
+while the user scrubs through it. Ranges are streamed from the file
+in chunks of CHUNK_SIZE bytes, so the memory used by a connection does
+not depend on the size of the requested range. Servers supporting the
+ASGI zero-copy send extension send the ranges using sendfile instead.
+"""
+
+import email.utils
 import os
 
 import aiofiles
 from fastapi import Request, Response, status
+from starlette.types import Receive, Scope, Send
 
 from ayon_server.exceptions import (
     NotFoundException,
     RangeNotSatisfiableException,
 )
+from ayon_server.utils import create_uuid
 
 MAX_200_SIZE = 1024 * 1024 * 12
-MAX_CHUNK_SIZE = 1024 * 1024 * 2
+MAX_CHUNK_SIZE = 1024 * 1024 * 4
+CHUNK_SIZE = 1024 * 256
+
+# Requests with more (non-overlapping) ranges get the whole file.
+# Serving many tiny ranges costs more than sending the file
+MAX_RANGES = 16
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
 
 
 class VideoResponse(Response):
-    pass
+    """Stream byte ranges of a file.
 
+    A single range (or the whole file) is sent as is, multiple ranges
+    are sent as a `multipart/byteranges` body.
+    """
 
-def get_file_size(file_name: str) -> int:
-    """Get the size of a file"""
-    if not os.path.exists(file_name):
-        raise NotFoundException("File not found")
-    return os.stat(file_name).st_size
+    def __init__(
+        self,
+        file_path: str,
+        file_size: int,
+        ranges: list[tuple[int, int]],
+        headers: dict[str, str],
+        status_code: int = status.HTTP_200_OK,
+    ) -> None:
+        self.file_path = file_path
+        self.status_code = status_code
+        self.background = None
+        self.parts: list[tuple[bytes, int, int]] = []
 
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.parts.append((b"", start, end))
+            headers["content-length"] = str(end - start + 1)
+        else:
+            content_type = headers["content-type"]
+            boundary = create_uuid()
+            headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+            content_length = 0
+            for start, end in ranges:
+                part_header = (
+                    f"\r\n--{boundary}\r\n"
+                    f"content-type: {content_type}\r\n"
+                    f"content-range: bytes {start}-{end}/{file_size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((part_header, start, end))
+                content_length += len(part_header) + end - start + 1
+            self.trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            content_length += len(self.trailer)
+            headers["content-length"] = str(content_length)
 
-async def get_bytes_range(file_name: str, start: int, end: int) -> bytes:
-    """Get a range of bytes from a file"""
-    async with aiofiles.open(file_name, mode="rb") as f:
-        await f.seek(start)
-        pos = start
-        read_size = end - pos + 1
-        return await f.read(read_size)
+        self.init_headers(headers)
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
 
-def _get_range_header(range_header: str, file_size: int) -> tuple[int, int]:
-    try:
-        h = range_header.replace("bytes=", "").split("-")
-        start = int(h[0]) if h[0] != "" else 0
-        end = int(h[1]) if h[1] != "" else file_size - 1
-    except ValueError as e:
-        raise RangeNotSatisfiableException(str(e)) from e
+        if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            await self.send_zerocopy(send)
+        else:
+            await self.send_chunked(send)
+
+    async def send_chunked(self, send: Send) -> None:
+        async with aiofiles.open(self.file_path, mode="rb") as f:
+            for part_header, start, end in self.parts:
+                if part_header:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": part_header,
+                            "more_body": True,
+                        }
+                    )
+                await f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = await f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        # The file was truncated while being sent
+                        break
+                    remaining -= len(chunk)
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": True,
+                        }
+                    )
+        await self.send_trailer(send)
+
+    async def send_zerocopy(self, send: Send) -> None:
+        with open(self.file_path, mode="rb") as f:
+            for part_header, start, end in self.parts:
+                if part_header:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": part_header,
+                            "more_body": True,
+                        }
+                    )
+                await send(
+                    {
+                        "type": ZEROCOPY_EXTENSION,
+                        "file": f,
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": True,
+                    }
+                )
+        await self.send_trailer(send)
+
+    async def send_trailer(self, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.body",
+                "body": getattr(self, "trailer", b""),
+                "more_body": False,
+            }
+        )
+
+
+def _get_ranges(range_header: str, file_size: int) -> list[tuple[int, int]]:
+    """Parse the Range header.
 
-    if start > end or start < 0 or end > file_size - 1:
-        raise RangeNotSatisfiableException(f"Invalid range: {start}-{end}")
-    return start, end
+    Returns a sorted list of (start, end) tuples (inclusive) with
+    overlapping and adjacent ranges merged. Ranges starting past
+    the end of the file are ignored.
+    """
+    unit, _, specs = range_header.partition("=")
+    if unit.strip().lower() != "bytes":
+        raise RangeNotSatisfiableException(f"Unsupported range unit: {unit}")
+
+    ranges: list[tuple[int, int]] = []
+    for spec in specs.split(","):
+        if not (spec := spec.strip()):
+            continue
+        first, sep, last = spec.partition("-")
+        try:
+            if not sep:
+                raise ValueError(spec)
+            if first == "":
+                # Suffix range: the last N bytes
+                start = max(0, file_size - int(last))
+                end = file_size - 1
+            else:
+                start = int(first)
+                end = min(int(last), file_size - 1) if last else file_size - 1
+        except ValueError as e:
+            raise RangeNotSatisfiableException(f"Invalid range: {spec}") from e
+
+        if start < 0 or start > end:
+            continue
+        ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiableException(f"Invalid range: {range_header}")
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(end, last_end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_matches(
+    if_range: str | None,
+    etag: str,
+    last_modified: str,
+) -> bool:
+    """Check whether the Range header should be honored.
+
+    If-Range contains either an entity tag (compared strongly) or
+    a date. If the file changed, the client gets the whole file.
+    """
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    return if_range == last_modified
 
 
 async def range_requests_response(
@@ -52,8 +220,12 @@ async def range_requests_response(
 ) -> VideoResponse:
     """Handle range requests for video files."""
 
-    file_size = get_file_size(file_path)
-    max_chunk_size = 1024 * 1024 * 4
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError as e:
+        raise NotFoundException("File not found") from e
+    file_size = stat.st_size
+    max_chunk_size = MAX_CHUNK_SIZE
     range_header = request.headers.get("range")
     max_200_size = MAX_200_SIZE
 
@@ -64,17 +236,22 @@ async def range_requests_response(
         elif "safari" in ua.lower():
             max_200_size = 0
 
+    etag = f'"{stat.st_mtime_ns:x}-{file_size:x}"'
+    last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+    if not _if_range_matches(request.headers.get("if-range"), etag, last_modified):
+        range_header = None
+
     headers = {
         "content-type": content_type,
-        "content-length": str(file_size),
         "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": last_modified,
         "access-control-expose-headers": (
             "content-type, accept-ranges, content-length, "
-            "content-range, content-encoding"
+            "content-range, content-encoding, etag"
         ),
     }
-    start = 0
-    end = file_size - 1
+    ranges = [(0, file_size - 1)]
     status_code = status.HTTP_200_OK
 
     if file_size <= max_200_size:
@@ -82,29 +259,30 @@ async def range_requests_response(
         # in one go. That allows the browser to cache the video
         # and prevent unnecessary requests.
 
-        headers["content-range"] = f"bytes 0-{end}/{file_size}"
+        headers["content-range"] = f"bytes 0-{file_size - 1}/{file_size}"
 
     elif range_header is not None:
-        start, end = _get_range_header(range_header, file_size)
-        end = min(end, start + max_chunk_size - 1, file_size - 1)
+        requested = _get_ranges(range_header, file_size)
 
-        size = end - start + 1
-        headers["content-length"] = str(size)
-        headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+        if len(requested) == 1:
+            start, end = requested[0]
+            end = min(end, start + max_chunk_size - 1)
+            ranges = [(start, end)]
+            headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+            if end - start + 1 < file_size:
+                status_code = status.HTTP_206_PARTIAL_CONTENT
 
-        if size == file_size:
-            status_code = status.HTTP_200_OK
-        else:
+        elif len(requested) <= MAX_RANGES:
+            ranges = requested
             status_code = status.HTTP_206_PARTIAL_CONTENT
 
-    payload = await get_bytes_range(file_path, start, end)
-
     if status_code == status.HTTP_200_OK:
         headers["cache-control"] = "private, max-age=600"
 
-    # print("Video Response", start, end, file_size, status_code)
     return VideoResponse(
-        content=payload,
+        file_path,
+        file_size,
+        ranges,
         headers=headers,
         status_code=status_code,
     )
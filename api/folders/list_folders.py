@@ -1,37 +1,26 @@
-import datetime
 import time
-from typing import Any
+from typing import AsyncGenerator
 
-from fastapi import Response
-from nxtools import log_traceback
-from pydantic.error_wrappers import ValidationError
+from fastapi import Header, Response
+from fastapi.responses import StreamingResponse
 
-from ayon_server.access.utils import folder_access_list
+from ayon_server.access.folder_access import FolderAccessSet
+from ayon_server.access.utils import folder_access_set
 from ayon_server.api.dependencies import CurrentUser, ProjectName
-from ayon_server.exceptions import AyonException
-from ayon_server.helpers.hierarchy_cache import rebuild_hierarchy_cache
-from ayon_server.lib.redis import Redis
+from ayon_server.api.responses import etag_matches
+from ayon_server.helpers.commit_scheduler import ensure_committed
+from ayon_server.helpers.hierarchy_cache import (
+    FolderListItem,
+    get_hierarchy_cache_version,
+    load_hierarchy_cache,
+)
 from ayon_server.types import OPModel
-from ayon_server.utils import json_loads
+from ayon_server.utils import hash_data, json_dumps, json_loads
 
 from .router import router
 
-
-class FolderListItem(OPModel):
-    id: str
-    path: str
-    parent_id: str | None = None
-    parents: list[str]
-    name: str
-    label: str | None = None
-    folder_type: str
-    has_tasks: bool = False
-    has_children: bool = False
-    task_names: list[str] | None
-    status: str
-    attrib: dict[str, Any] | None = None
-    own_attrib: list[str] | None = None
-    updated_at: datetime.datetime
+# Number of folders sent to the client in a single chunk
+CHUNK_SIZE = 1000
 
 
 class FolderListModel(OPModel):
@@ -39,12 +28,43 @@ class FolderListModel(OPModel):
     folders: list[FolderListItem]
 
 
-async def get_entities(project_name: str) -> list[dict[str, str]]:
-    entities_data = await Redis.get("project.folders", project_name)
-    if entities_data is None:
-        return await rebuild_hierarchy_cache(project_name)
-    else:
-        return json_loads(entities_data)
+async def stream_folder_list(
+    project_name: str,
+    items: list[bytes],
+    access_set: FolderAccessSet | None,
+    attrib: bool,
+) -> AsyncGenerator[bytes, None]:
+    start_time = time.monotonic()
+    count = 0
+    chunk: list[bytes] = []
+
+    yield b'{"folders":['
+    for value in items:
+        if access_set is not None or not attrib:
+            # Cached items are already serialized, so we only need to
+            # parse them when the payload needs to be altered
+            item = json_loads(value.decode("utf-8"))
+            if access_set is not None:
+                if not access_set.matches(item["path"]):
+                    continue
+            if not attrib:
+                item.pop("attrib", None)
+                item.pop("ownAttrib", None)
+            value = json_dumps(item).encode()
+
+        chunk.append(value)
+        count += 1
+
+        if len(chunk) >= CHUNK_SIZE:
+            yield (b"," if count > len(chunk) else b"") + b",".join(chunk)
+            chunk = []
+
+    if chunk:
+        yield (b"," if count > len(chunk) else b"") + b",".join(chunk)
+
+    elapsed_time = time.monotonic() - start_time
+    detail = f"{count} folders of {project_name} fetched in {elapsed_time:.2f} seconds"
+    yield f'],"detail":{json_dumps(detail)}}}'.encode()
 
 
 @router.get("", response_class=Response, responses={200: {"model": FolderListModel}})
@@ -52,6 +72,7 @@ async def get_folder_list(
     user: CurrentUser,
     project_name: ProjectName,
     attrib: bool = False,
+    if_none_match: str | None = Header(None),
 ):
     """Return all folders in the project. Fast.
 
@@ -61,40 +82,38 @@ async def get_folder_list(
     folder is created, updated, or deleted.
 
     The endpoint handles ACL and also returns folder attributes.
-    """
 
-    start_time = time.monotonic()
-    access_list = await folder_access_list(user, project_name, "read")
-    entities = await get_entities(project_name)
-
-    result = []
-    for folder in entities:
-        if access_list is not None and folder["path"] not in access_list:
-            continue
-        if not attrib:
-            folder.pop("attrib", None)
-            folder.pop("own_attrib", None)
-        else:
-            pass  # TODO: handle attrib whitelist
-        result.append(folder)
+    The response carries an ETag header. When the same value is sent
+    back in the If-None-Match header and nothing has changed since,
+    the endpoint returns 304 Not Modified without a body.
+    """
 
-    elapsed_time = time.monotonic() - start_time
-    detail = (
-        f"{len(result)} folders "
-        f"of {project_name} fetched in {elapsed_time:.2f} seconds"
+    await ensure_committed(project_name)
+    access_set = await folder_access_set(user, project_name, "read")
+
+    # The response depends on the cache version, requested fields
+    # and folders the user has access to
+    access_key = access_set.to_dict() if access_set is not None else None
+
+    def get_etag(version: int) -> str:
+        return f'"{hash_data([version, attrib, access_key])}"'
+
+    # Items of a version never change, so the client's copy is still
+    # valid if the version did not change
+    if (version := await get_hierarchy_cache_version(project_name)) is not None:
+        etag = get_etag(version)
+        if etag_matches(etag, if_none_match):
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            return Response(status_code=304, headers=headers)
+
+    version, items = await load_hierarchy_cache(project_name)
+    etag = get_etag(version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    return StreamingResponse(
+        stream_folder_list(project_name, items, access_set, attrib),
+        media_type="application/json",
+        headers=headers,
     )
-
-    # we need to do the validation here in order to convert snake_case to camelCase
-    # dumping to json here to bypass fastapi re-validation, which takes ages
-
-    try:
-        r = FolderListModel(detail=detail, folders=result).json(
-            by_alias=True,
-            exclude_unset=True,
-        )
-    except ValidationError:
-        await rebuild_hierarchy_cache(project_name)
-        log_traceback("Wrong model. Revalidating")
-        raise AyonException("Invalid cache data. Please try again")
-
-    return Response(content=r, media_type="application/json")
@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING, ForwardRef
 
 from fastapi import APIRouter, Query
 
-from ayon_server.access.utils import folder_access_list
+from ayon_server.access.utils import folder_access_set
 from ayon_server.api.dependencies import CurrentUser, ProjectName
 from ayon_server.lib.postgres import Postgres
 from ayon_server.types import Field, OPModel
@@ -77,10 +77,10 @@ async def get_folder_hierarchy(
     if type_list:
         conds.append(f"folder_type IN {SQLTool.array(type_list)}")
 
-    access_list = await folder_access_list(user, project_name, "read")
+    access_set = await folder_access_set(user, project_name, "read")
 
-    if access_list is not None:
-        conds.append(f"path like ANY ('{{ {','.join(access_list)} }}')")
+    if access_set is not None:
+        conds.append(access_set.sql_condition("path"))
 
     # TODO: eventually solve products too. ATM it clashes with the
     # task names list (group by hell), which is more important.
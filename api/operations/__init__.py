@@ -1,3 +1,4 @@
 __all__ = ["router"]
 
+from . import stream as stream
 from .operations import router
@@ -0,0 +1,505 @@
+"""Set-based processing of operation batches.
+
+Processing operations one by one costs several round trips per
+operation (load, access check, default status, write). Operations of
+the same type on the same entity type are processed together instead:
+
+- rows are loaded using a single `WHERE id = ANY($1) FOR UPDATE` query
+- access is evaluated for the whole batch using a single query
+- rows are written using `executemany`
+
+Per-operation results are preserved. Operations, which fail validation,
+loading or the access check are reported individually. When the write
+itself fails (e.g. a constraint violation), the batch is rolled back
+and processed again operation by operation, so the failing operation
+is reported the same way it would be without batching.
+
+Only entity types without custom save/delete logic are processed in
+batches. Other operations (and batches too small to benefit) are
+processed one by one.
+"""
+
+from contextlib import contextmanager, suppress
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterator
+
+from nxtools import log_traceback, logging
+from pydantic import BaseModel
+
+from ayon_server.access.utils import get_accessible_entity_ids
+from ayon_server.entities import UserEntity
+from ayon_server.entities.core import ProjectLevelEntity
+from ayon_server.events.patch import build_pl_entity_change_events
+from ayon_server.exceptions import AyonException
+from ayon_server.helpers.get_entity_class import get_entity_class
+from ayon_server.helpers.statuses import get_default_status_for_entity
+from ayon_server.lib.postgres import Connection, Postgres
+from ayon_server.types import AccessType, ProjectLevelEntityType
+from ayon_server.utils import dict_exclude
+
+from .common import (
+    build_create_payload,
+    build_update_patch,
+    created_events,
+    deleted_events,
+)
+from .models import OperationModel, OperationResponseModel, OperationType
+
+BULK_ENTITY_TYPES: list[ProjectLevelEntityType] = [
+    "product",
+    "version",
+    "representation",
+    "workfile",
+]
+
+# Smaller batches are processed one by one
+BULK_MIN_SIZE = 2
+
+# Creates in a run of create operations are reordered, so parents
+# are created first and entities of the same type end up in one batch
+CREATE_ORDER: dict[str, int] = {
+    "folder": 0,
+    "task": 1,
+    "product": 1,
+    "workfile": 2,
+    "version": 2,
+    "representation": 3,
+}
+
+# Entity type, attribute holding its id (None for the entity itself)
+# and access type checked for the operation
+ACCESS_RULES: dict[
+    tuple[OperationType, ProjectLevelEntityType],
+    tuple[ProjectLevelEntityType, str | None, AccessType],
+] = {
+    ("create", "product"): ("folder", "folder_id", "publish"),
+    ("create", "version"): ("product", "product_id", "publish"),
+    ("create", "representation"): ("version", "version_id", "publish"),
+    ("create", "workfile"): ("task", "task_id", "publish"),
+    ("update", "product"): ("folder", "folder_id", "publish"),
+    ("update", "version"): ("product", "product_id", "publish"),
+    ("update", "representation"): ("version", "version_id", "publish"),
+    ("update", "workfile"): ("workfile", None, "update"),
+    ("delete", "product"): ("product", None, "delete"),
+    ("delete", "version"): ("version", None, "delete"),
+    ("delete", "representation"): ("representation", None, "delete"),
+    ("delete", "workfile"): ("workfile", None, "delete"),
+}
+
+ProcessedOperation = tuple[
+    int,
+    ProjectLevelEntity | None,
+    list[dict[str, Any]] | None,
+    OperationResponseModel,
+]
+
+FallbackHandler = Callable[
+    [list[tuple[int, OperationModel]], Connection | None],
+    Awaitable[list[ProcessedOperation]],
+]
+
+
+class BulkFallback(Exception):
+    """The batch must be processed operation by operation"""
+
+
+#
+# Planning
+#
+
+
+def _group(indices: list[int], operations: list[OperationModel]) -> list[list[int]]:
+    """Split indices to groups of consecutive operations on the same entity type"""
+    groups: list[list[int]] = []
+    for index in indices:
+        if groups and (
+            operations[groups[-1][0]].entity_type == operations[index].entity_type
+        ):
+            groups[-1].append(index)
+        else:
+            groups.append([index])
+    return groups
+
+
+def plan_batches(operations: list[OperationModel]) -> list[list[int]]:
+    """Split operations to batches processed at once.
+
+    Returns a list of batches of operation indices. Runs of operations
+    of the same type are grouped by the entity type:
+
+    - creates are ordered by the entity hierarchy (parents first)
+    - updates (each affecting a different entity) are grouped by
+      the entity type in the order of their first appearance
+    - deletes are only grouped when consecutive, so their order
+      is preserved
+    """
+
+    batches: list[list[int]] = []
+    start = 0
+    while start < len(operations):
+        op_type = operations[start].type
+        end = start
+        while end < len(operations) and operations[end].type == op_type:
+            end += 1
+        run = list(range(start, end))
+        start = end
+
+        if op_type == "create":
+            run.sort(key=lambda i: CREATE_ORDER.get(operations[i].entity_type, 0))
+        elif op_type == "update":
+            first_seen: dict[str, int] = {}
+            for i in run:
+                first_seen.setdefault(operations[i].entity_type, i)
+            run.sort(key=lambda i: first_seen[operations[i].entity_type])
+
+        for group in _group(run, operations):
+            entity_type = operations[group[0]].entity_type
+            if entity_type in BULK_ENTITY_TYPES and len(group) >= BULK_MIN_SIZE:
+                batches.append(group)
+            else:
+                batches.extend([i] for i in group)
+    return batches
+
+
+#
+# Batch processing
+#
+
+
+class BulkItem:
+    def __init__(self, index: int, operation: OperationModel) -> None:
+        self.index = index
+        self.operation = operation
+        self.entity: ProjectLevelEntity | None = None
+        self.patch: BaseModel | None = None
+        self.events: list[dict[str, Any]] | None = None
+        self.error: OperationResponseModel | None = None
+
+    def fail(self, status: int, detail: str) -> None:
+        self.error = OperationResponseModel(
+            success=False,
+            id=self.operation.id,
+            type=self.operation.type,
+            status=status,
+            detail=detail,
+            entity_id=self.operation.entity_id,
+            entity_type=self.operation.entity_type,
+        )
+
+    def result(self) -> ProcessedOperation:
+        if self.error is not None:
+            return self.index, None, None, self.error
+        assert self.entity is not None
+        return (
+            self.index,
+            self.entity,
+            self.events,
+            OperationResponseModel(
+                success=True,
+                id=self.operation.id,
+                type=self.operation.type,
+                entity_id=self.entity.id,
+                entity_type=self.operation.entity_type,
+            ),
+        )
+
+
+@contextmanager
+def operation_errors(item: BulkItem) -> Iterator[None]:
+    """Report exceptions raised in the block as the item failure"""
+    try:
+        yield
+    except AyonException as e:
+        item.fail(e.status, e.detail)
+    except Exception as e:
+        log_traceback()
+        item.fail(500, str(e))
+
+
+def _own_attrib(entity: ProjectLevelEntity) -> dict[str, Any]:
+    attrib = {}
+    for key in entity.own_attrib:
+        with suppress(AttributeError):
+            if (value := getattr(entity.attrib, key)) is not None:
+                attrib[key] = value
+    return attrib
+
+
+class BulkBatch:
+    def __init__(
+        self,
+        project_name: str,
+        user: UserEntity,
+        items: list[BulkItem],
+        can_fail: bool,
+    ) -> None:
+        self.project_name = project_name
+        self.user = user
+        self.items = items
+        self.can_fail = can_fail
+        self.op_type = items[0].operation.type
+        self.entity_type = items[0].operation.entity_type
+        self.entity_class = get_entity_class(self.entity_type)
+        self.table = f"project_{project_name}.{self.entity_type}s"
+
+    @property
+    def valid_items(self) -> list[BulkItem]:
+        return [item for item in self.items if item.error is None]
+
+    def check_failures(self) -> None:
+        """Stop batch processing on the first failure, if failures are fatal.
+
+        Processing the batch one by one reports the failure in the
+        right order and skips the following operations.
+        """
+        if not self.can_fail and any(item.error for item in self.items):
+            raise BulkFallback()
+
+    async def load(self, conn: Connection) -> None:
+        """Load the entities of update or delete operations"""
+        ids: list[str] = []
+        for item in self.valid_items:
+            with operation_errors(item):
+                assert item.operation.entity_id is not None, "entity_id is required"
+                ids.append(item.operation.entity_id)
+
+        records = {
+            str(row["id"]): dict(row)
+            for row in await conn.fetch(
+                f"SELECT * FROM {self.table} WHERE id = ANY($1::UUID[]) FOR UPDATE",
+                ids,
+            )
+        }
+        for item in self.valid_items:
+            record = records.get(str(item.operation.entity_id))
+            if record is None:
+                item.fail(404, "Entity not found")
+                continue
+            with operation_errors(item):
+                item.entity = self.entity_class.from_record(self.project_name, record)
+
+    async def check_access(self, conn: Connection) -> None:
+        if self.user.is_manager:
+            return
+
+        target_type, attr, access_type = ACCESS_RULES[(self.op_type, self.entity_type)]
+        targets: dict[int, str] = {}
+        for item in self.valid_items:
+            assert item.entity is not None
+            target_id = getattr(item.entity, attr) if attr else item.entity.id
+            targets[item.index] = str(target_id) if target_id else ""
+
+        accessible = await get_accessible_entity_ids(
+            self.user,
+            self.project_name,
+            target_type,
+            targets.values(),
+            access_type,
+            transaction=conn,
+        )
+        for item in self.valid_items:
+            if targets[item.index] not in accessible:
+                item.fail(403, "Entity access denied")
+
+    async def create(self, conn: Connection) -> None:
+        statuses: dict[str | None, str] = {}
+        for item in self.items:
+            with operation_errors(item):
+                payload = build_create_payload(
+                    self.entity_class, item.operation, self.user
+                )
+                entity = self.entity_class(self.project_name, payload)
+                if entity.status is None:
+                    subtype = entity.entity_subtype
+                    if subtype not in statuses:
+                        statuses[subtype] = await get_default_status_for_entity(
+                            self.project_name, self.entity_type, subtype
+                        )
+                    entity.status = statuses[subtype]
+                item.entity = entity
+        self.check_failures()
+
+        await self.check_access(conn)
+        self.check_failures()
+        self.ensure_no_hero_versions()
+
+        rows = []
+        for item in self.valid_items:
+            assert item.entity is not None
+            fields = dict_exclude(
+                item.entity.dict(exclude_none=True),
+                item.entity.model.dynamic_fields,
+            )
+            fields["attrib"] = _own_attrib(item.entity)
+            rows.append(fields)
+            item.events = created_events(item.entity)
+
+        if self.entity_type == "product":
+            await conn.execute(
+                """
+                INSERT INTO product_types (name)
+                SELECT UNNEST($1::VARCHAR[])
+                ON CONFLICT DO NOTHING
+                """,
+                list({row["product_type"] for row in rows}),
+            )
+
+        for columns, values in _by_columns(rows):
+            placeholders = ", ".join(f"${i + 1}" for i in range(len(columns)))
+            await conn.executemany(
+                f"""
+                INSERT INTO {self.table} ({", ".join(columns)})
+                VALUES ({placeholders})
+                """,
+                values,
+            )
+        await self.touch_tasks(conn)
+
+    async def update(self, conn: Connection) -> None:
+        for item in self.items:
+            with operation_errors(item):
+                item.patch = build_update_patch(
+                    self.entity_class, item.operation, self.user
+                )
+        self.check_failures()
+
+        await self.load(conn)
+        self.check_failures()
+        await self.check_access(conn)
+        self.check_failures()
+
+        rows = []
+        now = datetime.now()
+        for item in self.valid_items:
+            assert item.entity is not None and item.patch is not None
+            item.events = build_pl_entity_change_events(item.entity, item.patch)
+            item.entity.patch(item.patch)
+            fields = dict_exclude(
+                item.entity.dict(),
+                ["created_at", "updated_at"] + item.entity.model.dynamic_fields,
+            )
+            fields["attrib"] = _own_attrib(item.entity)
+            fields["updated_at"] = now
+            rows.append(fields)
+        self.ensure_no_hero_versions()
+
+        for columns, values in _by_columns(rows):
+            assignments = ", ".join(
+                f"{column} = ${i + 1}"
+                for i, column in enumerate(columns)
+                if column != "id"
+            )
+            id_placeholder = f"${columns.index('id') + 1}"
+            await conn.executemany(
+                f"UPDATE {self.table} SET {assignments} WHERE id = {id_placeholder}",
+                values,
+            )
+        await self.touch_tasks(conn)
+
+    async def delete(self, conn: Connection) -> None:
+        await self.load(conn)
+        self.check_failures()
+        await self.check_access(conn)
+
+        for item in self.valid_items:
+            if item.operation.force and not self.user.is_manager:
+                item.fail(403, "Only managers can force delete")
+        self.check_failures()
+
+        ids = []
+        for item in self.valid_items:
+            assert item.entity is not None
+            item.events = deleted_events(item.entity)
+            ids.append(item.entity.id)
+
+        if ids:
+            await conn.execute(
+                f"DELETE FROM {self.table} WHERE id = ANY($1::UUID[])",
+                ids,
+            )
+
+    def ensure_no_hero_versions(self) -> None:
+        """Hero versions require additional checks done in VersionEntity.save"""
+        if self.entity_type != "version":
+            return
+        for item in self.valid_items:
+            if item.entity is not None and item.entity.version < 0:  # type: ignore
+                raise BulkFallback()
+
+    async def touch_tasks(self, conn: Connection) -> None:
+        """Bump updated_at of tasks of saved versions (as VersionEntity.save does)"""
+        if self.entity_type != "version":
+            return
+        task_ids = {
+            item.entity.task_id  # type: ignore
+            for item in self.valid_items
+            if item.entity is not None and item.entity.task_id  # type: ignore
+        }
+        if task_ids:
+            await conn.execute(
+                f"""
+                UPDATE project_{self.project_name}.tasks
+                SET updated_at = NOW()
+                WHERE id = ANY($1::UUID[])
+                """,
+                list(task_ids),
+            )
+
+    async def process(self, conn: Connection) -> None:
+        if self.op_type == "create":
+            await self.create(conn)
+        elif self.op_type == "update":
+            await self.update(conn)
+        elif self.op_type == "delete":
+            await self.delete(conn)
+
+
+def _by_columns(
+    rows: list[dict[str, Any]],
+) -> Iterator[tuple[list[str], list[tuple[Any, ...]]]]:
+    """Group rows by their set of columns to write them using executemany"""
+    groups: dict[tuple[str, ...], list[tuple[Any, ...]]] = {}
+    for row in rows:
+        columns = tuple(row.keys())
+        groups.setdefault(columns, []).append(tuple(row.values()))
+    for columns, values in groups.items():
+        yield list(columns), values
+
+
+async def process_bulk_operations(
+    project_name: str,
+    user: UserEntity,
+    operations: list[tuple[int, OperationModel]],
+    fallback: FallbackHandler,
+    can_fail: bool = False,
+    transaction: Connection | None = None,
+) -> list[ProcessedOperation]:
+    """Process a batch of operations of the same type and entity type.
+
+    `fallback` processes the given operations one by one. It is used
+    when the batch cannot be processed at once.
+
+    Returns (index, entity, events, response) tuples of processed
+    operations in the order of their indices.
+    """
+
+    items = [BulkItem(index, operation) for index, operation in operations]
+    batch = BulkBatch(project_name, user, items, can_fail)
+
+    try:
+        if transaction is not None:
+            # Savepoint, so the batch may be retried one by one
+            async with transaction.transaction():
+                await batch.process(transaction)
+        else:
+            async with Postgres.acquire() as conn, conn.transaction():
+                await batch.process(conn)
+    except BulkFallback:
+        return await fallback(operations, transaction)
+    except Exception as e:
+        # Most likely a constraint violation. Processing the operations
+        # one by one reports it for the operation, which caused it.
+        logging.debug(f"Bulk {batch.op_type} of {batch.entity_type}s failed: {e}")
+        return await fallback(operations, transaction)
+
+    return sorted((item.result() for item in items), key=lambda r: r[0])
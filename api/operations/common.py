@@ -0,0 +1,72 @@
+from typing import Any, Type
+
+from pydantic import BaseModel
+
+from ayon_server.config import ayonconfig
+from ayon_server.entities import UserEntity
+from ayon_server.entities.core import ProjectLevelEntity
+
+from .models import OperationModel
+
+
+def build_create_payload(
+    entity_class: Type[ProjectLevelEntity],
+    operation: OperationModel,
+    user: UserEntity,
+) -> dict[str, Any]:
+    """Validate the data of a create operation and fill in the defaults"""
+    assert operation.data is not None, "data is required for create"
+    payload = entity_class.model.post_model(**operation.data)
+    payload_dict = payload.dict()
+    if operation.entity_id is not None:
+        payload_dict["id"] = operation.entity_id
+    if operation.entity_type == "version":
+        if not payload_dict.get("author"):
+            payload_dict["author"] = user.name
+    elif operation.entity_type == "workfile":
+        if not payload_dict.get("created_by"):
+            payload_dict["created_by"] = user.name
+        if not payload_dict.get("updated_by"):
+            payload_dict["updated_by"] = payload_dict["created_by"]
+    return payload_dict
+
+
+def build_update_patch(
+    entity_class: Type[ProjectLevelEntity],
+    operation: OperationModel,
+    user: UserEntity,
+) -> BaseModel:
+    """Validate the data of an update operation and fill in the defaults"""
+    assert operation.data is not None, "data is required for update"
+    payload = entity_class.model.patch_model(**operation.data)
+    if operation.entity_type == "workfile":
+        if not payload.updated_by:  # type: ignore
+            payload.updated_by = user.name  # type: ignore
+    return payload
+
+
+def created_events(entity: ProjectLevelEntity) -> list[dict[str, Any]]:
+    description = f"{entity.entity_type.capitalize()} {entity.name} created"
+    return [
+        {
+            "topic": f"entity.{entity.entity_type}.created",
+            "summary": {"entityId": entity.id, "parentId": entity.parent_id},
+            "description": description,
+            "project": entity.project_name,
+        }
+    ]
+
+
+def deleted_events(entity: ProjectLevelEntity) -> list[dict[str, Any]]:
+    description = f"{entity.entity_type.capitalize()} {entity.name} deleted"
+    events: list[dict[str, Any]] = [
+        {
+            "topic": f"entity.{entity.entity_type}.deleted",
+            "summary": {"entityId": entity.id, "parentId": entity.parent_id},
+            "description": description,
+            "project": entity.project_name,
+        }
+    ]
+    if ayonconfig.audit_trail:
+        events[0]["payload"] = {"entityData": entity.dict_simple()}
+    return events
@@ -0,0 +1,64 @@
+from typing import Any, Literal
+
+from ayon_server.types import Field, OPModel, ProjectLevelEntityType
+from ayon_server.utils import create_uuid
+
+OperationType = Literal["create", "update", "delete"]
+
+
+class OperationModel(OPModel):
+    id: str = Field(
+        default_factory=create_uuid,
+        title="Operation ID",
+        description="identifier manually or automatically assigned to each operation",
+    )
+    type: OperationType = Field(
+        ...,
+        title="Operation type",
+    )
+    entity_type: ProjectLevelEntityType = Field(
+        ...,
+        title="Entity type",
+    )
+    entity_id: str | None = Field(
+        None,
+        title="Entity ID",
+        description="ID of the entity. None for create",
+    )
+    data: dict[str, Any] | None = Field(
+        None,
+        title="Data",
+        description="Data to be used for create or update. Ignored for delete.",
+    )
+    force: bool = Field(False, title="Force recursive deletion")
+
+
+class OperationsRequestModel(OPModel):
+    operations: list[OperationModel] = Field(default_factory=list)
+    can_fail: bool = False
+
+
+class OperationResponseModel(OPModel):
+    id: str = Field(..., title="Operation ID")
+    type: OperationType = Field(..., title="Operation type")
+    success: bool = Field(..., title="Operation success")
+    status: int | None = Field(None, title="HTTP-like status code")
+    detail: str | None = Field(None, title="Error message")
+    entity_type: ProjectLevelEntityType = Field(..., title="Entity type")
+    entity_id: str | None = Field(
+        None,
+        title="Entity ID",
+        description="`None` if type is `create` and the operation fails.",
+    )
+
+
+class OperationsResponseModel(OPModel):
+    operations: list[OperationResponseModel] = Field(default_factory=list)
+    success: bool = Field(..., title="Overall success")
+
+
+class OperationsStreamSummaryModel(OPModel):
+    success: bool = Field(..., title="Overall success")
+    processed: int = Field(0, title="Number of processed operations")
+    failed: int = Field(0, title="Number of failed operations")
+    detail: str | None = Field(None, title="Error message")
@@ -1,14 +1,14 @@
 from contextlib import suppress
-from typing import Any, Literal
+from typing import Any
 
 from fastapi import APIRouter, BackgroundTasks, Header
 from nxtools import log_traceback
 
+from ayon_server.access.utils import get_accessible_entity_ids
 from ayon_server.api.dependencies import CurrentUser, ProjectName
-from ayon_server.config import ayonconfig
-from ayon_server.entities import UserEntity
+from ayon_server.entities import FolderEntity, UserEntity
 from ayon_server.entities.core import ProjectLevelEntity
-from ayon_server.events import dispatch_event
+from ayon_server.events import EventStream
 from ayon_server.events.patch import build_pl_entity_change_events
 from ayon_server.exceptions import (
     AyonException,
@@ -17,8 +17,21 @@ from ayon_server.exceptions import (
 )
 from ayon_server.helpers.get_entity_class import get_entity_class
 from ayon_server.lib.postgres import Postgres
-from ayon_server.types import Field, OPModel, ProjectLevelEntityType
-from ayon_server.utils import create_uuid
+from ayon_server.types import AccessType, ProjectLevelEntityType
+
+from .bulk import ProcessedOperation, plan_batches, process_bulk_operations
+from .common import (
+    build_create_payload,
+    build_update_patch,
+    created_events,
+    deleted_events,
+)
+from .models import (
+    OperationModel,
+    OperationResponseModel,
+    OperationsRequestModel,
+    OperationsResponseModel,
+)
 
 router = APIRouter(tags=["Projects"])
 
@@ -27,64 +40,6 @@ class RollbackException(Exception):
     pass
 
 
-#
-# Models
-#
-
-OperationType = Literal["create", "update", "delete"]
-
-
-class OperationModel(OPModel):
-    id: str = Field(
-        default_factory=create_uuid,
-        title="Operation ID",
-        description="identifier manually or automatically assigned to each operation",
-    )
-    type: OperationType = Field(
-        ...,
-        title="Operation type",
-    )
-    entity_type: ProjectLevelEntityType = Field(
-        ...,
-        title="Entity type",
-    )
-    entity_id: str | None = Field(
-        None,
-        title="Entity ID",
-        description="ID of the entity. None for create",
-    )
-    data: dict[str, Any] | None = Field(
-        None,
-        title="Data",
-        description="Data to be used for create or update. Ignored for delete.",
-    )
-    force: bool = Field(False, title="Force recursive deletion")
-
-
-class OperationsRequestModel(OPModel):
-    operations: list[OperationModel] = Field(default_factory=list)
-    can_fail: bool = False
-
-
-class OperationResponseModel(OPModel):
-    id: str = Field(..., title="Operation ID")
-    type: OperationType = Field(..., title="Operation type")
-    success: bool = Field(..., title="Operation success")
-    status: int | None = Field(None, title="HTTP-like status code")
-    detail: str | None = Field(None, title="Error message")
-    entity_type: ProjectLevelEntityType = Field(..., title="Entity type")
-    entity_id: str | None = Field(
-        None,
-        title="Entity ID",
-        description="`None` if type is `create` and the operation fails.",
-    )
-
-
-class OperationsResponseModel(OPModel):
-    operations: list[OperationResponseModel] = Field(default_factory=list)
-    success: bool = Field(..., title="Overall success")
-
-
 #
 # Processing
 #
@@ -104,30 +59,10 @@ async def process_operation(
     events: list[dict[str, Any]] | None = None
 
     if operation.type == "create":
-        assert operation.data is not None, "data is required for create"
-        payload = entity_class.model.post_model(**operation.data)
-        payload_dict = payload.dict()
-        if operation.entity_id is not None:
-            payload_dict["id"] = operation.entity_id
-        if operation.entity_type == "version":
-            if not payload_dict.get("author"):
-                payload_dict["author"] = user.name
-        elif operation.entity_type == "workfile":
-            if not payload_dict.get("created_by"):
-                payload_dict["created_by"] = user.name
-            if not payload_dict.get("updated_by"):
-                payload_dict["updated_by"] = payload_dict["created_by"]
+        payload_dict = build_create_payload(entity_class, operation, user)
         entity = entity_class(project_name, payload_dict)
         await entity.ensure_create_access(user)
-        description = f"{operation.entity_type.capitalize()} {entity.name} created"
-        events = [
-            {
-                "topic": f"entity.{operation.entity_type}.created",
-                "summary": {"entityId": entity.id, "parentId": entity.parent_id},
-                "description": description,
-                "project": project_name,
-            }
-        ]
+        events = created_events(entity)
         await entity.save(transaction=transaction)
 
     elif operation.type == "update":
@@ -135,13 +70,9 @@ async def process_operation(
         assert operation.data is not None, "data is required for update"
         thumbnail_only = len(operation.data) == 1 and "thumbnailId" in operation.data
 
-        payload = entity_class.model.patch_model(**operation.data)
+        payload = build_update_patch(entity_class, operation, user)
         assert operation.entity_id is not None, "entity_id is required for update"
 
-        if operation.entity_type == "workfile":
-            if not payload.updated_by:  # type: ignore
-                payload.updated_by = user.name  # type: ignore
-
         entity = await entity_class.load(
             project_name,
             operation.entity_id,
@@ -157,21 +88,11 @@ async def process_operation(
         assert operation.entity_id is not None, "entity_id is required for delete"
         entity = await entity_class.load(project_name, operation.entity_id)
         await entity.ensure_delete_access(user)
-        description = f"{operation.entity_type.capitalize()} {entity.name} deleted"
 
         if operation.force and not user.is_manager:
             raise ForbiddenException("Only managers can force delete")
 
-        events = [
-            {
-                "topic": f"entity.{operation.entity_type}.deleted",
-                "summary": {"entityId": entity.id, "parentId": entity.parent_id},
-                "description": description,
-                "project": project_name,
-            }
-        ]
-        if ayonconfig.audit_trail:
-            events[0]["payload"] = {"entityData": entity.dict_simple()}
+        events = deleted_events(entity)
         await entity.delete(transaction=transaction, force=operation.force)
     else:
         raise BadRequestException(f"Unknown operation type {operation.type}")
@@ -189,28 +110,59 @@ async def process_operation(
     )
 
 
-async def process_operations(
+async def preload_access(
     project_name: str,
     user: UserEntity,
-    operations: list[OperationModel],
-    can_fail: bool = False,
+    operations: list[tuple[int, OperationModel]],
     transaction=None,
-) -> tuple[list[dict[str, Any]], OperationsResponseModel]:
-    """Process a list of operations.
+) -> None:
+    """Check access to folders and tasks updated or deleted by the operations.
 
-    This is separated from the endpoint so the endpoint can
-    run this operation within or without a transaction context.
-
-    This function should not raise an exception. If an operation
-    fails, success=False is returned.
+    Access to all the entities is evaluated at once. Accessible entities
+    are cached in the user object, so the per-entity checks performed
+    by process_operation do not need to query the database.
     """
 
-    result: list[OperationResponseModel] = []
-    to_commit: list[ProjectLevelEntity] = []
+    targets: dict[tuple[ProjectLevelEntityType, AccessType], list[str]] = {}
+    for _, operation in operations:
+        if operation.entity_type not in ("folder", "task"):
+            continue
+        if operation.type not in ("update", "delete") or not operation.entity_id:
+            continue
+        key = (operation.entity_type, operation.type)
+        targets.setdefault(key, []).append(operation.entity_id)
 
-    events: list[dict[str, Any]] = []
+    for (entity_type, access_type), entity_ids in targets.items():
+        if len(entity_ids) < 2:
+            continue
+        await get_accessible_entity_ids(
+            user,
+            project_name,
+            entity_type,
+            entity_ids,
+            access_type,
+            transaction=transaction,
+        )
+
+
+async def process_one_by_one(
+    project_name: str,
+    user: UserEntity,
+    operations: list[tuple[int, OperationModel]],
+    can_fail: bool = False,
+    transaction=None,
+) -> list[ProcessedOperation]:
+    """Process the given (index, operation) pairs in order.
+
+    Returns (index, entity, events, response) tuples. Processing
+    stops on the first failure unless can_fail is set.
+    """
 
-    for _i, operation in enumerate(operations):
+    if not user.is_manager:
+        await preload_access(project_name, user, operations, transaction)
+
+    result: list[ProcessedOperation] = []
+    for index, operation in operations:
         try:
             entity, evt, response = await process_operation(
                 project_name,
@@ -218,21 +170,22 @@ async def process_operations(
                 operation,
                 transaction=transaction,
             )
-            if evt is not None:
-                events.extend(evt)
-            result.append(response)
-            if entity.entity_type not in [e.entity_type for e in to_commit]:
-                to_commit.append(entity)
+            result.append((index, entity, evt, response))
         except AyonException as e:
             result.append(
-                OperationResponseModel(
-                    success=False,
-                    id=operation.id,
-                    type=operation.type,
-                    status=e.status,
-                    detail=e.detail,
-                    entity_id=operation.entity_id,
-                    entity_type=operation.entity_type,
+                (
+                    index,
+                    None,
+                    None,
+                    OperationResponseModel(
+                        success=False,
+                        id=operation.id,
+                        type=operation.type,
+                        status=e.status,
+                        detail=e.detail,
+                        entity_id=operation.entity_id,
+                        entity_type=operation.entity_type,
+                    ),
                 )
             )
             if not can_fail:
@@ -240,20 +193,97 @@ async def process_operations(
         except Exception as exc:
             log_traceback()
             result.append(
-                OperationResponseModel(
-                    success=False,
-                    id=operation.id,
-                    type=operation.type,
-                    status=500,
-                    detail=str(exc),
-                    entity_id=operation.entity_id,
-                    entity_type=operation.entity_type,
+                (
+                    index,
+                    None,
+                    None,
+                    OperationResponseModel(
+                        success=False,
+                        id=operation.id,
+                        type=operation.type,
+                        status=500,
+                        detail=str(exc),
+                        entity_id=operation.entity_id,
+                        entity_type=operation.entity_type,
+                    ),
                 )
             )
 
             if not can_fail:
                 # No need to continue
                 break
+    return result
+
+
+async def process_operations(
+    project_name: str,
+    user: UserEntity,
+    operations: list[OperationModel],
+    can_fail: bool = False,
+    transaction=None,
+) -> tuple[list[dict[str, Any]], OperationsResponseModel]:
+    """Process a list of operations.
+
+    This is separated from the endpoint so the endpoint can
+    run this operation within or without a transaction context.
+
+    Operations of the same type on the same entity type are
+    processed in batches (see bulk.py). Results are reported
+    in the order of the operations in the request.
+
+    This function should not raise an exception. If an operation
+    fails, success=False is returned.
+    """
+
+    async def one_by_one(
+        batch: list[tuple[int, OperationModel]],
+        conn,
+    ) -> list[ProcessedOperation]:
+        return await process_one_by_one(
+            project_name,
+            user,
+            batch,
+            can_fail=can_fail,
+            transaction=conn,
+        )
+
+    processed: list[ProcessedOperation] = []
+    for batch in plan_batches(operations):
+        indexed = [(i, operations[i]) for i in batch]
+        if len(indexed) > 1:
+            batch_result = await process_bulk_operations(
+                project_name,
+                user,
+                indexed,
+                one_by_one,
+                can_fail=can_fail,
+                transaction=transaction,
+            )
+        else:
+            batch_result = await one_by_one(indexed, transaction)
+
+        processed.extend(batch_result)
+        if not can_fail and not all(r[3].success for r in batch_result):
+            break
+
+    processed.sort(key=lambda r: r[0])
+
+    result: list[OperationResponseModel] = []
+    to_commit: list[ProjectLevelEntity] = []
+    changed_folder_ids: set[str] = set()
+
+    events: list[dict[str, Any]] = []
+
+    for _index, entity, evt, response in processed:
+        result.append(response)
+        if entity is None:
+            continue
+        if evt is not None:
+            events.extend(evt)
+        if entity.entity_type == "folder" and response.type != "delete":
+            changed_folder_ids.add(entity.id)
+        if entity.entity_type not in [e.entity_type for e in to_commit]:
+            to_commit.append(entity)
 
     for op in result:
         if op.status:
@@ -269,6 +299,13 @@ async def process_operations(
     success = all(op.success for op in result)
     if success or can_fail:
         for entity in to_commit:
+            if isinstance(entity, FolderEntity):
+                # Rebuild inherited attributes only for the changed subtrees
+                await entity.commit(
+                    transaction=transaction,
+                    folder_ids=changed_folder_ids,
+                )
+                continue
             await entity.commit(transaction=transaction)
 
     return events, OperationsResponseModel(operations=result, success=success)
@@ -354,12 +391,12 @@ async def operations(
                     events = []
                     raise RollbackException()
 
-    for event in events:
+    if events:
         background_tasks.add_task(
-            dispatch_event,
+            EventStream.dispatch_many,
+            events,
             sender=x_sender,
             user=user.name,
-            **event,
         )
 
     return response
@@ -0,0 +1,206 @@
+"""Streaming variant of the operations endpoint.
+
+The request body is a stream of operations in the NDJSON format
+(one OperationModel per line). Operations are parsed as they arrive
+and processed in batches, each batch in its own transaction.
+Results of the operations are streamed back (also as NDJSON) as soon
+as their batch is committed, so neither the request nor the response
+is ever held in memory as a whole.
+"""
+
+from typing import Any, AsyncGenerator
+
+from fastapi import Header, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from ayon_server.api.dependencies import CurrentUser, ProjectName
+from ayon_server.entities import UserEntity
+from ayon_server.events import EventStream
+from ayon_server.lib.postgres import Postgres
+
+from .models import (
+    OperationModel,
+    OperationResponseModel,
+    OperationsStreamSummaryModel,
+)
+from .operations import RollbackException, process_operations, router
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streaming response which keeps reading the request body.
+
+    The default StreamingResponse listens for the client disconnect
+    while streaming, which consumes (and drops) the request body
+    messages. Here the body is read by the generator itself, and
+    a disconnect is detected by the body stream.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def read_ndjson_lines(request: Request) -> AsyncGenerator[bytes, None]:
+    """Yield non-empty lines of the request body as they arrive"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def batch_key(operation: OperationModel) -> tuple[str, str] | None:
+    if operation.type == "create":
+        return None
+    return (operation.entity_type, operation.entity_id or "")
+
+
+async def process_batch(
+    project_name: str,
+    user: UserEntity,
+    operations: list[OperationModel],
+    can_fail: bool,
+) -> tuple[list[dict[str, Any]], list[OperationResponseModel], bool]:
+    """Process a batch of operations in a single transaction.
+
+    If can_fail is not set and an operation fails, the whole batch
+    is rolled back. Returns events to dispatch, results and whether
+    the batch was committed.
+    """
+
+    if can_fail:
+        events, response = await process_operations(
+            project_name,
+            user,
+            operations,
+            can_fail=True,
+        )
+        return events, response.operations, True
+
+    try:
+        async with Postgres.acquire() as conn, conn.transaction():
+            events, response = await process_operations(
+                project_name,
+                user,
+                operations,
+                transaction=conn,
+            )
+            if not response.success:
+                raise RollbackException()
+    except RollbackException:
+        return [], response.operations, False
+    return events, response.operations, True
+
+
+@router.post(
+    "/projects/{project_name}/operations/stream",
+    response_class=NDJSONStreamingResponse,
+)
+async def operations_stream(
+    request: Request,
+    project_name: ProjectName,
+    user: CurrentUser,
+    batch_size: int = Query(
+        500,
+        ge=1,
+        le=10000,
+        description="Number of operations processed in a single transaction",
+    ),
+    can_fail: bool = Query(
+        False,
+        description="Continue processing when an operation fails",
+    ),
+    x_sender: str | None = Header(None),
+) -> NDJSONStreamingResponse:
+    """Process a stream of operations (create / update / delete).
+
+    The request body contains one operation per line (NDJSON).
+    Operations are processed in the order they are received, in batches
+    of `batch_size` operations. Each batch is processed in a single
+    transaction (a batch is closed early when it already contains
+    an operation on the same entity).
+
+    The response is a stream of operation results (one per line),
+    sent as soon as the batch of the operation is committed.
+    The last line of the response is a summary with the overall
+    `success` flag.
+
+    If can_fail is not set, the processing stops on the first error:
+    the failed batch is rolled back, but previous batches stay committed.
+    The results of the rolled back batch are still reported.
+    If can_fail is set, the processing continues and all successful
+    operations are committed.
+    """
+
+    async def generator() -> AsyncGenerator[str, None]:
+        summary = OperationsStreamSummaryModel(success=True)
+        batch: list[OperationModel] = []
+        batch_keys: set[tuple[str, str]] = set()
+
+        async def flush() -> AsyncGenerator[str, None]:
+            events, results, committed = await process_batch(
+                project_name,
+                user,
+                batch,
+                can_fail,
+            )
+            batch.clear()
+            batch_keys.clear()
+
+            if events:
+                await EventStream.dispatch_many(
+                    events,
+                    sender=x_sender,
+                    user=user.name,
+                )
+
+            for result in results:
+                summary.processed += 1
+                if not result.success:
+                    summary.failed += 1
+                yield result.json(by_alias=True) + "\n"
+
+            if not committed:
+                summary.success = False
+                summary.detail = "Batch rolled back"
+
+        line_number = 0
+        async for line in read_ndjson_lines(request):
+            line_number += 1
+            try:
+                operation = OperationModel.parse_raw(line)
+            except ValidationError as e:
+                summary.detail = f"Invalid operation on line {line_number}: {e}"
+                break
+
+            key = batch_key(operation)
+            if len(batch) >= batch_size or (key is not None and key in batch_keys):
+                async for result_line in flush():
+                    yield result_line
+                if not summary.success:
+                    break
+
+            batch.append(operation)
+            if key is not None:
+                batch_keys.add(key)
+
+        # Operations received before the end of the stream (or before
+        # an invalid line) are processed, unless a batch was rolled back
+        if batch and summary.success:
+            async for result_line in flush():
+                yield result_line
+
+        if summary.failed or summary.detail:
+            summary.success = False
+
+        yield summary.json(by_alias=True) + "\n"
+
+    return NDJSONStreamingResponse(generator())
@@ -1,15 +1,26 @@
+import asyncio
 import traceback
 from typing import Any
 
-from fastapi import Query
+from fastapi import Header, Query, Response
 from nxtools import log_traceback, logging
 
 from ayon_server.addons import AddonLibrary
 from ayon_server.api.dependencies import CurrentUser, SiteID
+from ayon_server.api.responses import etag_matches
 from ayon_server.exceptions import NotFoundException
+from ayon_server.helpers.settings_resolver import (
+    prefetch_overrides,
+    resolve_addon_settings,
+    run_in_settings_pool,
+)
+from ayon_server.helpers.settings_snapshot import (
+    get_settings_snapshot,
+    set_settings_snapshot,
+)
 from ayon_server.lib.postgres import Postgres
-from ayon_server.settings import BaseSettingsModel
 from ayon_server.types import NAME_REGEX, SEMVER_REGEX, Field, OPModel
+from ayon_server.utils import hash_data
 
 from .router import router
 
@@ -49,61 +60,39 @@ class AllSettingsResponseModel(OPModel):
     addons: list[AddonSettingsItemModel] = Field(default_factory=list)
 
 
-@router.get("/settings", response_model_exclude_none=True)
-async def get_all_settings(
-    user: CurrentUser,
-    site_id: SiteID,
-    bundle_name: str | None = Query(
-        None,
-        title="Bundle name",
-        description="Production if not set",
-        regex=NAME_REGEX,
-    ),
-    project_name: str | None = Query(
-        None,
-        title="Project name",
-        description="Studio settings if not set",
-        regex=NAME_REGEX,
-    ),
-    variant: str = Query("production"),
-    summary: bool = Query(False, title="Summary", description="Summary mode"),
+async def resolve_settings(
+    user_name: str,
+    bundle_name: str,
+    addons: dict[str, str | None],
+    site_id: str | None,
+    project_name: str | None,
+    variant: str,
+    summary: bool,
 ) -> AllSettingsResponseModel:
-    if variant not in ("production", "staging"):
-        query = [
-            """
-            SELECT name, is_production, is_staging, data->'addons' as addons
-            FROM bundles WHERE name = $1
-            """,
-            variant,
-        ]
-    elif bundle_name is None:
-        query = [
-            f"""
-            SELECT name, is_production, is_staging, data->'addons' as addons
-            FROM bundles WHERE is_{variant} IS TRUE
-            """
-        ]
-    else:
-        query = [
-            """
-            SELECT name, is_production, is_staging, data->'addons' as addons
-            FROM bundles WHERE name = $1
-            """,
-            bundle_name,
-        ]
+    """Resolve settings of all addons in the bundle.
 
-    brow = await Postgres.fetch(*query)
-    if not brow:
-        raise NotFoundException(status_code=404, detail="Bundle not found")
+    Overrides of all addons are loaded upfront and the addons
+    are resolved concurrently.
+    """
 
-    bundle_name = brow[0]["name"]
-    addons = brow[0]["addons"]
+    addon_versions: list[tuple[str, str]] = [
+        (addon_name, addon_version)
+        for addon_name, addon_version in addons.items()
+        if addon_version is not None
+    ]
 
-    addon_result = []
-    for addon_name, addon_version in addons.items():
-        if addon_version is None:
-            continue
+    overrides = await prefetch_overrides(
+        addon_versions,
+        variant=variant,
+        project_name=project_name,
+        user_name=user_name,
+        site_id=site_id,
+    )
 
+    async def resolve_addon(
+        addon_name: str,
+        addon_version: str,
+    ) -> AddonSettingsItemModel:
         try:
             addon = AddonLibrary.addon(addon_name, addon_version)
         except NotFoundException:
@@ -114,18 +103,15 @@ async def get_all_settings(
 
             broken_reason = AddonLibrary.is_broken(addon_name, addon_version)
 
-            addon_result.append(
-                AddonSettingsItemModel(
-                    name=addon_name,
-                    title=addon_name,
-                    version=addon_version,
-                    settings={},
-                    site_settings=None,
-                    is_broken=bool(broken_reason),
-                    reason=broken_reason,
-                )
+            return AddonSettingsItemModel(
+                name=addon_name,
+                title=addon_name,
+                version=addon_version,
+                settings={},
+                site_settings=None,
+                is_broken=bool(broken_reason),
+                reason=broken_reason,
             )
-            continue
 
         # Determine which scopes addon has settings for
 
@@ -147,80 +133,158 @@ async def get_all_settings(
 
         # Load settings for the addon
 
-        site_settings = None
-        settings: BaseSettingsModel | None = None
-
         try:
-            if site_id:
-                site_settings = await addon.get_site_settings(user.name, site_id)
-
-                if project_name is None:
-                    # Studio level settings (studio level does not have)
-                    # site overrides per se but it can have site settings
-                    settings = await addon.get_studio_settings(variant)
-                else:
-                    # Project and site is requested, so we are returning
-                    # project level settings WITH site overrides
-                    settings = await addon.get_project_site_settings(
-                        project_name,
-                        user.name,
-                        site_id,
-                        variant,
-                    )
-            elif project_name:
-                # Project level settings (no site overrides)
-                settings = await addon.get_project_settings(project_name, variant)
-            else:
-                # Just studio level settings (no project, no site)
-                settings = await addon.get_studio_settings(variant)
+            settings, site_settings = await resolve_addon_settings(
+                addon,
+                overrides,
+                variant=variant,
+                project_name=project_name,
+                user_name=user_name,
+                site_id=site_id,
+            )
+            settings_data: dict[str, Any] = {}
+            if settings and not summary:
+                settings_data = await run_in_settings_pool(settings.dict)
 
         except Exception:
             log_traceback(f"Unable to load {addon_name} {addon_version} settings")
-            addon_result.append(
-                AddonSettingsItemModel(
-                    name=addon_name,
-                    title=addon_name,
-                    version=addon_version,
-                    settings={},
-                    site_settings=None,
-                    is_broken=True,
-                    reason={
-                        "error": "Unable to load settings",
-                        "traceback": traceback.format_exc(),
-                    },
-                )
-            )
-            continue
-
-        # Add addon to the result
-
-        addon_result.append(
-            AddonSettingsItemModel(
+            return AddonSettingsItemModel(
                 name=addon_name,
-                title=addon.title if addon.title else addon_name,
+                title=addon_name,
                 version=addon_version,
-                # Has settings means that addon has settings model
-                has_settings=has_settings,
-                has_project_settings=has_project_settings,
-                has_project_site_settings=has_project_site_settings,
-                has_site_settings=has_site_settings,
-                # Has overrides means that addon has overrides for the requested
-                # project/site
-                has_studio_overrides=settings._has_studio_overrides
-                if settings
-                else None,
-                has_project_overrides=settings._has_project_overrides
-                if settings
-                else None,
-                has_site_overrides=settings._has_site_overrides if settings else None,
-                settings=settings.dict() if (settings and not summary) else {},
-                site_settings=site_settings,
+                settings={},
+                site_settings=None,
+                is_broken=True,
+                reason={
+                    "error": "Unable to load settings",
+                    "traceback": traceback.format_exc(),
+                },
             )
+
+        return AddonSettingsItemModel(
+            name=addon_name,
+            title=addon.title if addon.title else addon_name,
+            version=addon_version,
+            # Has settings means that addon has settings model
+            has_settings=has_settings,
+            has_project_settings=has_project_settings,
+            has_project_site_settings=has_project_site_settings,
+            has_site_settings=has_site_settings,
+            # Has overrides means that addon has overrides for the requested
+            # project/site
+            has_studio_overrides=settings._has_studio_overrides if settings else None,
+            has_project_overrides=settings._has_project_overrides if settings else None,
+            has_site_overrides=settings._has_site_overrides if settings else None,
+            settings=settings_data,
+            site_settings=site_settings,
         )
 
+    addon_result = list(
+        await asyncio.gather(
+            *(resolve_addon(name, version) for name, version in addon_versions)
+        )
+    )
+
     addon_result.sort(key=lambda x: x.title.lower())
 
     return AllSettingsResponseModel(
         bundle_name=bundle_name,
         addons=addon_result,
     )
+
+
+@router.get(
+    "/settings",
+    response_model=AllSettingsResponseModel,
+    response_model_exclude_none=True,
+)
+async def get_all_settings(
+    user: CurrentUser,
+    site_id: SiteID,
+    bundle_name: str | None = Query(
+        None,
+        title="Bundle name",
+        description="Production if not set",
+        regex=NAME_REGEX,
+    ),
+    project_name: str | None = Query(
+        None,
+        title="Project name",
+        description="Studio settings if not set",
+        regex=NAME_REGEX,
+    ),
+    variant: str = Query("production"),
+    summary: bool = Query(False, title="Summary", description="Summary mode"),
+    if_none_match: str | None = Header(None),
+) -> Response:
+    """Return resolved settings of all addons in the bundle.
+
+    Resolved settings are cached until any settings overrides change.
+    The response carries an ETag header. When the same value is sent
+    back in the If-None-Match header and settings have not changed,
+    the endpoint returns 304 Not Modified without a body.
+    """
+
+    if variant not in ("production", "staging"):
+        condition = "name = $1"
+        args = [variant]
+    elif bundle_name is None:
+        condition = f"is_{variant} IS TRUE"
+        args = []
+    else:
+        condition = "name = $1"
+        args = [bundle_name]
+
+    brow = await Postgres.fetch(
+        f"""
+        SELECT
+            name, is_production, is_staging, data->'addons' as addons,
+            (SELECT revision FROM settings_revision) AS settings_revision
+        FROM bundles WHERE {condition}
+        """,
+        *args,
+    )
+    if not brow:
+        raise NotFoundException(status_code=404, detail="Bundle not found")
+
+    bundle_name = brow[0]["name"]
+    assert bundle_name is not None
+    addons = brow[0]["addons"]
+
+    # Site and project-site settings are user specific
+    snapshot_key = hash_data(
+        [
+            brow[0]["settings_revision"],
+            bundle_name,
+            addons,
+            variant,
+            project_name,
+            site_id,
+            user.name if site_id else None,
+            summary,
+        ]
+    )
+
+    if (snapshot := await get_settings_snapshot(snapshot_key)) is not None:
+        etag, payload = snapshot
+    else:
+        result = await resolve_settings(
+            user.name,
+            bundle_name,
+            addons,
+            site_id,
+            project_name,
+            variant,
+            summary,
+        )
+        payload = result.json(by_alias=True, exclude_none=True)
+        if any(addon.is_broken for addon in result.addons):
+            # Do not cache (possibly temporary) failures
+            etag = hash_data(payload)
+        else:
+            etag = await set_settings_snapshot(snapshot_key, payload)
+
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(payload, media_type="application/json", headers=headers)
@@ -1,13 +1,20 @@
+import datetime
+
 from fastapi import Query
 from fastapi.responses import PlainTextResponse
 
 from ayon_server.api.dependencies import ApiKey, CurrentUser, CurrentUserOptional
+from ayon_server.api.messaging import messaging
+from ayon_server.auth.session import session_cache
 from ayon_server.config import ayonconfig
 from ayon_server.exceptions import ForbiddenException
+from ayon_server.graphql.cache import graphql_caches
+from ayon_server.helpers.commit_scheduler import get_pending_commits
 from ayon_server.lib.postgres import Postgres
 from ayon_server.lib.redis import Redis
 from ayon_server.metrics import Metrics, get_metrics
-from ayon_server.metrics.system import system_metrics
+from ayon_server.metrics.system import Metric, system_metrics
+from ayon_server.thumbnails import thumbnail_cache
 
 from .router import router
 
@@ -64,4 +71,51 @@ async def get_system_metrics(
 
     result += await system_metrics.render_prometheus()
 
+    # Websocket fan-out metrics
+
+    for metric in messaging.get_metrics():
+        result += metric.render_prometheus()
+
+    # Session cache metrics
+
+    for metric in [
+        Metric("session_cache_size", len(session_cache.data)),
+        Metric("session_cache_hits_total", session_cache.hits),
+        Metric("session_cache_misses_total", session_cache.misses),
+    ]:
+        result += metric.render_prometheus()
+
+    # GraphQL document caches
+
+    for cache in graphql_caches:
+        tags = {"cache": cache.name}
+        for metric in [
+            Metric("graphql_cache_size", len(cache.data), tags),
+            Metric("graphql_cache_hits_total", cache.hits, tags),
+            Metric("graphql_cache_misses_total", cache.misses, tags),
+        ]:
+            result += metric.render_prometheus()
+
+    # Thumbnail payload cache
+
+    for metric in [
+        Metric("thumbnail_cache_items", len(thumbnail_cache.data)),
+        Metric("thumbnail_cache_bytes", thumbnail_cache.size),
+        Metric("thumbnail_cache_hits_total", thumbnail_cache.hits),
+        Metric("thumbnail_cache_misses_total", thumbnail_cache.misses),
+    ]:
+        result += metric.render_prometheus()
+
+    # Deferred folder commits
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for pending in await get_pending_commits():
+        tags = {"project": pending.project_name}
+        age = (now - pending.oldest_change).total_seconds()
+        for metric in [
+            Metric("pending_commit_folders", pending.folder_count, tags),
+            Metric("pending_commit_age_seconds", round(age, 3), tags),
+        ]:
+            result += metric.render_prometheus()
+
     return PlainTextResponse(result)
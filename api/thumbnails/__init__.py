@@ -1,3 +1,4 @@
 __all__ = ["router"]
 
+from . import batch as batch
 from .thumbnails import router
@@ -0,0 +1,341 @@
+"""Batch thumbnail retrieval.
+
+Grid views display hundreds of thumbnails at once. Instead of loading
+each entity, checking its access and fetching its thumbnail in separate
+requests, the batch endpoint resolves access and thumbnail IDs of all
+requested entities using a single query and streams the payloads back
+as a multipart response.
+"""
+
+from typing import Any, AsyncGenerator, Literal
+
+from fastapi import Header
+from fastapi.responses import StreamingResponse
+
+from ayon_server.access.utils import folder_access_set
+from ayon_server.api.dependencies import CurrentUser, ProjectName
+from ayon_server.api.responses import etag_matches
+from ayon_server.entities import UserEntity
+from ayon_server.exceptions import ForbiddenException
+from ayon_server.helpers.thumbnails import get_fake_thumbnail
+from ayon_server.lib.postgres import Postgres
+from ayon_server.thumbnails import (
+    get_thumbnail_storage,
+    thumbnail_cache,
+    thumbnail_hash,
+)
+from ayon_server.thumbnails.cache import cache_key
+from ayon_server.thumbnails.processing import load_thumbnail_rendition
+from ayon_server.thumbnails.renditions import (
+    RENDITION_FORMATS,
+    rendition_variant,
+    select_rendition_format,
+    select_rendition_width,
+)
+from ayon_server.types import Field, OPModel
+from ayon_server.utils import EntityID, create_uuid
+
+from .thumbnails import PlaceholderOption, router
+
+ThumbnailEntityType = Literal["folder", "version", "workfile", "task"]
+
+MAX_BATCH_SIZE = 1000
+
+# Selects (entity_type, id, path, thumbnail_id) of the requested
+# entities of each type. $n is replaced by the parameter index
+ENTITY_QUERIES: dict[str, str] = {
+    "folder": """
+        SELECT 'folder' AS entity_type, h.id, h.path, f.thumbnail_id
+        FROM project_{project_name}.folders f
+        INNER JOIN project_{project_name}.hierarchy h ON h.id = f.id
+        WHERE f.id = ANY(${n}::UUID[])
+    """,
+    "version": """
+        SELECT 'version' AS entity_type, v.id, h.path, v.thumbnail_id
+        FROM project_{project_name}.versions v
+        INNER JOIN project_{project_name}.products p ON p.id = v.product_id
+        INNER JOIN project_{project_name}.hierarchy h ON h.id = p.folder_id
+        WHERE v.id = ANY(${n}::UUID[])
+    """,
+    "workfile": """
+        SELECT 'workfile' AS entity_type, w.id, h.path, w.thumbnail_id
+        FROM project_{project_name}.workfiles w
+        INNER JOIN project_{project_name}.tasks t ON t.id = w.task_id
+        INNER JOIN project_{project_name}.hierarchy h ON h.id = t.folder_id
+        WHERE w.id = ANY(${n}::UUID[])
+    """,
+    # Tasks without a thumbnail use the thumbnail of their latest version
+    "task": """
+        SELECT 'task' AS entity_type, t.id, h.path,
+        COALESCE(t.thumbnail_id, (
+            SELECT v.thumbnail_id
+            FROM project_{project_name}.versions v
+            WHERE v.task_id = t.id
+            AND v.thumbnail_id IS NOT NULL
+            ORDER BY v.updated_at DESC
+            LIMIT 1
+        )) AS thumbnail_id
+        FROM project_{project_name}.tasks t
+        INNER JOIN project_{project_name}.hierarchy h ON h.id = t.folder_id
+        WHERE t.id = ANY(${n}::UUID[])
+    """,
+}
+
+
+class ThumbnailBatchItemModel(OPModel):
+    entity_type: ThumbnailEntityType = Field(..., title="Entity type")
+    entity_id: str = EntityID.field("entity")
+    etag: str | None = Field(
+        None,
+        title="ETag",
+        description="ETag of the thumbnail the client already has. "
+        "If it matches, the payload is not sent (status 304)",
+        example='"3a7bd3e2360a3d29eea436fcfb7e44c7..."',
+    )
+
+
+class ThumbnailBatchRequestModel(OPModel):
+    items: list[ThumbnailBatchItemModel] = Field(
+        ...,
+        title="Items",
+        max_items=MAX_BATCH_SIZE,
+    )
+    size: int | None = Field(
+        None,
+        title="Size",
+        ge=1,
+        le=4096,
+        description="Requested width of the thumbnails in pixels",
+    )
+    placeholder: PlaceholderOption = Field(
+        "none",
+        title="Placeholder",
+        description="Send a placeholder image for missing "
+        "and inaccessible thumbnails",
+    )
+
+
+async def resolve_thumbnails(
+    user: UserEntity,
+    project_name: str,
+    items: list[ThumbnailBatchItemModel],
+) -> dict[tuple[str, str], dict[str, Any]]:
+    """Resolve access and thumbnails of the requested entities.
+
+    Returns a dict of (entity_type, entity_id) to a record with
+    `accessible` flag and thumbnail metadata (`thumbnail_id`, `mime`,
+    `hash`, `inline` and `legacy_data`). Missing entities are omitted.
+    """
+
+    ids_by_type: dict[str, list[str]] = {}
+    for item in items:
+        ids_by_type.setdefault(item.entity_type, []).append(item.entity_id)
+
+    try:
+        access_set = await folder_access_set(user, project_name, "read")
+    except ForbiddenException:
+        access_condition = "FALSE"
+    else:
+        if access_set is None:
+            access_condition = "TRUE"
+        else:
+            access_condition = access_set.sql_condition("e.path")
+
+    subqueries = []
+    args = []
+    for entity_type, entity_ids in ids_by_type.items():
+        args.append(entity_ids)
+        subqueries.append(
+            ENTITY_QUERIES[entity_type].format(project_name=project_name, n=len(args))
+        )
+
+    query = f"""
+        WITH e AS ({" UNION ALL ".join(subqueries)})
+        SELECT
+            e.entity_type,
+            e.id,
+            e.thumbnail_id,
+            e.accessible,
+            th.mime,
+            th.hash,
+            th.data IS NOT NULL AS inline,
+            CASE WHEN e.accessible AND th.hash IS NULL
+                THEN th.data
+            END AS legacy_data
+        FROM (SELECT *, {access_condition} AS accessible FROM e) e
+        LEFT JOIN project_{project_name}.thumbnails th ON th.id = e.thumbnail_id
+    """
+
+    result: dict[tuple[str, str], dict[str, Any]] = {}
+    async for row in Postgres.iterate(query, *args):
+        result[(row["entity_type"], row["id"])] = dict(row)
+    return result
+
+
+async def load_inline_payloads(
+    project_name: str,
+    records: list[dict[str, Any]],
+    variant: str | None = None,
+) -> dict[str, bytes]:
+    """Load payloads kept in the database (by thumbnail ID) in one query.
+
+    Thumbnails whose payload (or requested rendition) is cached
+    are skipped.
+    """
+    thumbnail_ids = [
+        r["thumbnail_id"]
+        for r in records
+        if r["inline"] and cache_key(r["hash"], variant) not in thumbnail_cache.data
+    ]
+    if not thumbnail_ids:
+        return {}
+    query = f"""
+        SELECT id, data FROM project_{project_name}.thumbnails
+        WHERE id = ANY($1::UUID[])
+    """
+    return {
+        row["id"]: row["data"] async for row in Postgres.iterate(query, thumbnail_ids)
+    }
+
+
+def render_part(boundary: str, headers: dict[str, str], payload: bytes) -> bytes:
+    head = f"--{boundary}\r\n"
+    for key, value in headers.items():
+        head += f"{key}: {value}\r\n"
+    head += f"Content-Length: {len(payload)}\r\n\r\n"
+    return head.encode("ascii") + payload + b"\r\n"
+
+
+@router.post("/projects/{project_name}/thumbnails/batch")
+async def get_thumbnails_batch(
+    user: CurrentUser,
+    project_name: ProjectName,
+    payload: ThumbnailBatchRequestModel,
+    accept: str | None = Header(None),
+) -> StreamingResponse:
+    """Get thumbnails of multiple entities in a single request.
+
+    The response is a `multipart/mixed` stream with one part per
+    requested item, in the order of the request. Each part has the
+    following headers:
+
+    - `X-Entity-Type` and `X-Entity-Id` identifying the item
+    - `X-Status`: 200 (payload sent), 304 (the `etag` of the item
+      matches), 403 (access denied), 404 (entity or thumbnail not found)
+      or 203 (placeholder sent in place of 403/404)
+    - `ETag`, `X-Thumbnail-Id` and `Content-Type` of the thumbnail
+      (if it exists and is accessible)
+
+    If `size` is specified, renditions are sent in place of the originals,
+    as with the `size` parameter of the single thumbnail endpoints.
+    """
+
+    records = await resolve_thumbnails(user, project_name, payload.items)
+    storage = get_thumbnail_storage()
+
+    width = select_rendition_width(payload.size) if payload.size else None
+    format_name = select_rendition_format(accept)
+    variant = rendition_variant(width, format_name) if width else None
+
+    # Content hashes of legacy thumbnails are computed from their payloads
+    for record in records.values():
+        if record["legacy_data"] is not None:
+            record["hash"] = thumbnail_hash(record["legacy_data"])
+        if storage is None:
+            record["inline"] = True
+
+    def get_etag(record: dict[str, Any]) -> str:
+        return f'"{cache_key(record["hash"], variant)}"'
+
+    to_send = [
+        records[key]
+        for item in payload.items
+        if (key := (item.entity_type, item.entity_id)) in records
+        and records[key]["accessible"]
+        and records[key]["hash"]
+        and records[key]["legacy_data"] is None
+        and not etag_matches(get_etag(records[key]), item.etag)
+    ]
+    inline_payloads = await load_inline_payloads(project_name, to_send, variant)
+
+    boundary = create_uuid()
+
+    async def load_original(record: dict[str, Any]) -> bytes | None:
+        if record["legacy_data"] is not None:
+            return record["legacy_data"]
+        if (data := thumbnail_cache.get(record["hash"])) is not None:
+            return data
+        if record["inline"]:
+            data = inline_payloads.get(record["thumbnail_id"])
+            if data is None:
+                # Not prefetched, because its rendition was cached
+                # when the batch started
+                query = f"""
+                    SELECT data FROM project_{project_name}.thumbnails
+                    WHERE id = $1
+                """
+                res = await Postgres.fetch(query, record["thumbnail_id"])
+                data = res[0]["data"] if res else None
+        elif storage is not None:
+            data = await storage.load(project_name, record["hash"])
+        if data is not None:
+            thumbnail_cache.put(record["hash"], data)
+        return data
+
+    async def load_payload(record: dict[str, Any]) -> tuple[bytes | None, str]:
+        """Return the payload to send and its mime type"""
+        if width is not None:
+            rendition = await load_thumbnail_rendition(
+                project_name,
+                record["hash"],
+                width,
+                format_name,
+                lambda: load_original(record),
+            )
+            if rendition is not None:
+                return rendition, RENDITION_FORMATS[format_name][1]
+        return await load_original(record), record["mime"]
+
+    async def generator() -> AsyncGenerator[bytes, None]:
+        for item in payload.items:
+            headers = {
+                "X-Entity-Type": item.entity_type,
+                "X-Entity-Id": item.entity_id,
+            }
+            content = b""
+            record = records.get((item.entity_type, item.entity_id))
+            if record is None:
+                status = 404
+            elif not record["accessible"]:
+                status = 403
+            elif not record["hash"]:
+                status = 404
+            else:
+                etag = get_etag(record)
+                headers["X-Thumbnail-Id"] = record["thumbnail_id"]
+                headers["ETag"] = etag
+                if etag_matches(etag, item.etag):
+                    status = 304
+                else:
+                    loaded, mime = await load_payload(record)
+                    if loaded is None:
+                        status = 404
+                    else:
+                        status = 200
+                        content = loaded
+                        headers["Content-Type"] = mime
+
+            if status in (403, 404) and payload.placeholder == "empty":
+                status = 203
+                content = get_fake_thumbnail()
+                headers["Content-Type"] = "image/png"
+
+            headers["X-Status"] = str(status)
+            yield render_part(boundary, headers, content)
+        yield f"--{boundary}--\r\n".encode("ascii")
+
+    return StreamingResponse(
+        generator(),
+        media_type=f"multipart/mixed; boundary={boundary}",
+        headers={"Cache-Control": "no-store"},
+    )
@@ -1,7 +1,7 @@
-from typing import Any, Literal
+from typing import Annotated, Any, Literal
 
 import aiocache
-from fastapi import APIRouter, Query, Request, Response
+from fastapi import APIRouter, Header, Query, Request, Response
 from nxtools import logging
 
 from ayon_server.api.dependencies import (
@@ -14,7 +14,7 @@ from ayon_server.api.dependencies import (
     VersionID,
     WorkfileID,
 )
-from ayon_server.api.responses import EmptyResponse
+from ayon_server.api.responses import EmptyResponse, etag_matches
 from ayon_server.entities.folder import FolderEntity
 from ayon_server.entities.task import TaskEntity
 from ayon_server.entities.version import VersionEntity
@@ -27,6 +27,23 @@ from ayon_server.exceptions import (
 )
 from ayon_server.helpers.thumbnails import get_fake_thumbnail
 from ayon_server.lib.postgres import Postgres
+from ayon_server.thumbnails import (
+    get_thumbnail_storage,
+    lock_thumbnail_payloads,
+    release_thumbnail_payloads,
+    thumbnail_cache,
+    thumbnail_hash,
+)
+from ayon_server.thumbnails.processing import (
+    create_thumbnail_renditions,
+    load_thumbnail_rendition,
+)
+from ayon_server.thumbnails.renditions import (
+    RENDITION_FORMATS,
+    rendition_variant,
+    select_rendition_format,
+    select_rendition_width,
+)
 from ayon_server.types import Field, OPModel
 from ayon_server.utils import EntityID
 
@@ -44,6 +61,16 @@ router = APIRouter(
 
 PlaceholderOption = Literal["empty", "none"]
 
+ThumbnailSize = Annotated[
+    int | None,
+    Query(
+        ge=1,
+        le=4096,
+        description="Requested width of the thumbnail in pixels. "
+        "The smallest pre-rendered size at least this wide is sent.",
+    ),
+]
+
 
 async def body_from_request(request: Request) -> bytes:
     result = b""
@@ -69,48 +96,168 @@ async def store_thumbnail(
     if len(payload) < 10:
         raise BadRequestException("Thumbnail cannot be empty")
 
+    content_hash = thumbnail_hash(payload)
+    storage = get_thumbnail_storage()
+    data = payload if storage is None else None
+
     query = f"""
-        INSERT INTO project_{project_name}.thumbnails (id, mime, data)
-        VALUES ($1, $2, $3)
+        WITH previous AS (
+            SELECT hash FROM project_{project_name}.thumbnails WHERE id = $1
+        )
+        INSERT INTO project_{project_name}.thumbnails (id, mime, data, hash)
+        VALUES ($1, $2, $3, $4)
         ON CONFLICT (id)
-        DO UPDATE SET data = EXCLUDED.data
-        RETURNING id
+        DO UPDATE SET
+            mime = EXCLUDED.mime,
+            data = EXCLUDED.data,
+            hash = EXCLUDED.hash
+        RETURNING
+            EXISTS (SELECT 1 FROM previous) AS replaced,
+            (SELECT hash FROM previous) AS previous_hash
     """
-    await Postgres.execute(query, thumbnail_id, mime, payload)
-    for entity_type in ["workfiles", "versions", "folders", "tasks"]:
-        await Postgres.execute(
-            f"""
+    async with Postgres.acquire() as conn, conn.transaction():
+        if storage is not None:
+            # The payload may be stored already. Keep it from being
+            # released until the row referring to it is committed
+            await lock_thumbnail_payloads(conn, project_name, [content_hash])
+            await storage.store(project_name, content_hash, payload)
+        res = await conn.fetch(query, thumbnail_id, mime, data, content_hash)
+
+    if storage is not None:
+        await create_thumbnail_renditions(project_name, content_hash, payload)
+
+    if not (res and res[0]["replaced"]):
+        # A new thumbnail. No entity may reference it yet
+        return
+
+    if res[0]["previous_hash"] not in (None, content_hash):
+        await release_thumbnail_payloads(project_name, [res[0]["previous_hash"]])
+
+    # Touch entities using the replaced thumbnail, so clients reload it.
+    # Uses the partial thumbnail_id indices of the entity tables
+    updates = ",\n".join(
+        f"""
+        touch_{entity_type} AS (
             UPDATE project_{project_name}.{entity_type}
             SET updated_at = NOW() WHERE thumbnail_id = $1
-            """,
-            thumbnail_id,
         )
+        """
+        for entity_type in ["workfiles", "versions", "folders", "tasks"]
+    )
+    await Postgres.execute(f"WITH {updates} SELECT 1", thumbnail_id)
+
+
+async def load_thumbnail_payload(
+    project_name: str,
+    thumbnail_id: str,
+    content_hash: str,
+    inline: bool,
+) -> bytes | None:
+    """Load the payload of a thumbnail from the cache, storage or database"""
+    if (payload := thumbnail_cache.get(content_hash)) is not None:
+        return payload
+
+    storage = get_thumbnail_storage()
+    if inline or storage is None:
+        query = f"SELECT data FROM project_{project_name}.thumbnails WHERE id = $1"
+        res = await Postgres.fetch(query, thumbnail_id)
+        payload = res[0]["data"] if res else None
+    else:
+        payload = await storage.load(project_name, content_hash)
+
+    if payload is not None:
+        thumbnail_cache.put(content_hash, payload)
+    return payload
 
 
 async def retrieve_thumbnail(
     project_name: str,
     thumbnail_id: str | None,
     placeholder: PlaceholderOption = "none",
+    if_none_match: str | None = None,
+    size: int | None = None,
+    accept: str | None = None,
 ) -> Response:
-    query = f"SELECT * FROM project_{project_name}.thumbnails WHERE id = $1"
+    """Return a thumbnail response.
+
+    If size is specified, the smallest rendition at least `size` pixels
+    wide is sent instead of the original (in WebP if the client
+    accepts it, JPEG otherwise).
+    """
+    query = f"""
+        SELECT mime, hash, created_at, data IS NOT NULL AS inline,
+        CASE WHEN hash IS NULL THEN data END AS legacy_data
+        FROM project_{project_name}.thumbnails WHERE id = $1
+    """
     if thumbnail_id is not None:
         try:
             res = await Postgres.fetch(query, thumbnail_id)
         except Postgres.UndefinedTableError:
-            pass  # project does not exist
-        else:
-            if res:
-                record = res[0]
+            res = None  # project does not exist
+
+        if res:
+            record = res[0]
+            payload: bytes | None = record["legacy_data"]
+            if payload is not None:
+                # Thumbnail stored before content hashes were introduced
+                content_hash = thumbnail_hash(payload)
+            else:
+                content_hash = record["hash"]
+
+            headers = {
+                "ETag": f'"{content_hash}"',
+                "X-Thumbnail-Id": thumbnail_id,
+                "X-Thumbnail-Time": str(record.get("created_at", 0)),
+                "Cache-Control": f"max-age={60}",
+            }
+
+            async def load_original() -> bytes | None:
+                if payload is not None:
+                    return payload
+                assert thumbnail_id is not None  # keeps pyright happy
+                return await load_thumbnail_payload(
+                    project_name,
+                    thumbnail_id,
+                    content_hash,
+                    record["inline"],
+                )
+
+            if size and (width := select_rendition_width(size)):
+                format_name = select_rendition_format(accept)
+                variant = rendition_variant(width, format_name)
+                headers["ETag"] = f'"{content_hash}.{variant}"'
+                headers["Vary"] = "Accept"
+                if etag_matches(headers["ETag"], if_none_match):
+                    return Response(status_code=304, headers=headers)
+
+                rendition = await load_thumbnail_rendition(
+                    project_name,
+                    content_hash,
+                    width,
+                    format_name,
+                    load_original,
+                )
+                if rendition is not None:
+                    return Response(
+                        media_type=RENDITION_FORMATS[format_name][1],
+                        status_code=200,
+                        content=rendition,
+                        headers=headers,
+                    )
+                # Not an image PIL can read. Send the original
+                headers["ETag"] = f'"{content_hash}"'
+
+            if etag_matches(headers["ETag"], if_none_match):
+                return Response(status_code=304, headers=headers)
+
+            if (original := await load_original()) is not None:
                 return Response(
                     media_type=record["mime"],
                     status_code=200,
-                    content=record["data"],
-                    headers={
-                        "X-Thumbnail-Id": thumbnail_id,
-                        "X-Thumbnail-Time": str(record.get("created_at", 0)),
-                        "Cache-Control": f"max-age={60}",
-                    },
+                    content=original,
+                    headers=headers,
                 )
+            logging.warning(f"Payload of thumbnail {thumbnail_id} is missing")
 
     if placeholder == "empty":
         return get_fake_thumbnail_response()
@@ -180,6 +327,9 @@ async def get_thumbnail(
     project_name: ProjectName,
     thumbnail_id: ThumbnailID,
     placeholder: PlaceholderOption = Query("empty"),
+    size: ThumbnailSize = None,
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
 ) -> Response:
     """Get a thumbnail by its ID.
 
@@ -190,7 +340,14 @@ async def get_thumbnail(
     if not user.is_manager:
         raise ForbiddenException("Only managers can access arbitrary thumbnails")
 
-    return await retrieve_thumbnail(project_name, thumbnail_id, placeholder)
+    return await retrieve_thumbnail(
+        project_name,
+        thumbnail_id,
+        placeholder,
+        if_none_match,
+        size,
+        accept,
+    )
 
 
 #
@@ -233,6 +390,9 @@ async def get_folder_thumbnail(
     project_name: ProjectName,
     folder_id: FolderID,
     placeholder: PlaceholderOption = Query("empty"),
+    size: ThumbnailSize = None,
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
 ) -> Response:
     try:
         folder = await FolderEntity.load(project_name, folder_id)
@@ -242,7 +402,14 @@ async def get_folder_thumbnail(
             return get_fake_thumbnail_response()
         raise e
 
-    return await retrieve_thumbnail(project_name, folder.thumbnail_id, placeholder)
+    return await retrieve_thumbnail(
+        project_name,
+        folder.thumbnail_id,
+        placeholder,
+        if_none_match,
+        size,
+        accept,
+    )
 
 
 #
@@ -282,6 +449,9 @@ async def get_version_thumbnail(
     project_name: ProjectName,
     version_id: VersionID,
     placeholder: PlaceholderOption = Query("empty"),
+    size: ThumbnailSize = None,
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
 ) -> Response:
     try:
         version = await VersionEntity.load(project_name, version_id)
@@ -290,7 +460,14 @@ async def get_version_thumbnail(
         if placeholder == "empty":
             return get_fake_thumbnail_response()
         raise e
-    return await retrieve_thumbnail(project_name, version.thumbnail_id, placeholder)
+    return await retrieve_thumbnail(
+        project_name,
+        version.thumbnail_id,
+        placeholder,
+        if_none_match,
+        size,
+        accept,
+    )
 
 
 #
@@ -332,6 +509,9 @@ async def get_workfile_thumbnail(
     project_name: ProjectName,
     workfile_id: WorkfileID,
     placeholder: PlaceholderOption = Query("empty"),
+    size: ThumbnailSize = None,
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
 ) -> Response:
     try:
         workfile = await WorkfileEntity.load(project_name, workfile_id)
@@ -341,7 +521,14 @@ async def get_workfile_thumbnail(
             return get_fake_thumbnail_response()
         else:
             raise NotFoundException("Workfile not found")
-    return await retrieve_thumbnail(project_name, workfile.thumbnail_id, placeholder)
+    return await retrieve_thumbnail(
+        project_name,
+        workfile.thumbnail_id,
+        placeholder,
+        if_none_match,
+        size,
+        accept,
+    )
 
 
 #
@@ -401,6 +588,9 @@ async def get_task_thumbnail(
     project_name: ProjectName,
     task_id: TaskID,
     placeholder: PlaceholderOption = Query("empty"),
+    size: ThumbnailSize = None,
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
 ) -> Response:
     try:
         task = await TaskEntity.load(project_name, task_id)
@@ -420,4 +610,11 @@ async def get_task_thumbnail(
     else:
         thumbnail_id = task.thumbnail_id
 
-    return await retrieve_thumbnail(project_name, thumbnail_id, placeholder)
+    return await retrieve_thumbnail(
+        project_name,
+        thumbnail_id,
+        placeholder,
+        if_none_match,
+        size,
+        accept,
+    )
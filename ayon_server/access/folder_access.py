@@ -0,0 +1,152 @@
+"""Compiled sets of folder paths a user has access to.
+
+Folder access is defined by paths: a folder itself (`exact`) or all
+descendants of a folder (`subtree`). A user with "assigned" access to
+many tasks may end up with thousands of such paths, most of them
+redundant (covered by a subtree of their ancestor).
+
+FolderAccessSet stores the paths in a prefix trie (one node per path
+element), which drops the redundant entries and allows matching a path
+in time proportional to its depth, regardless of the number of entries.
+The same set is rendered as an SQL predicate using only the minimal
+set of paths.
+"""
+
+from typing import Any, Iterable
+
+from ayon_server.utils import SQLTool
+
+# Above this number of subtrees, the SQL predicate uses a single
+# LIKE ANY condition instead of OR-ed LIKE conditions
+# (which may use the path index, but are expensive to plan)
+SQL_OR_LIMIT = 64
+
+
+class _TrieNode:
+    __slots__ = ("children", "exact", "subtree")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.exact = False
+        self.subtree = False
+
+
+def _split(path: str) -> list[str]:
+    return [elm for elm in path.strip().strip("/").split("/") if elm]
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _quote(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def _quote_array_element(value: str) -> str:
+    value = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{value}"'
+
+
+class FolderAccessSet:
+    """Set of folder paths compiled to a prefix trie"""
+
+    def __init__(
+        self,
+        exact: Iterable[str] = (),
+        subtrees: Iterable[str] = (),
+    ) -> None:
+        self._root = _TrieNode()
+        for path in subtrees:
+            self.add_subtree(path)
+        for path in exact:
+            self.add_exact(path)
+
+    def _walk(self, path: str) -> _TrieNode | None:
+        """Return the node of the path (created if needed).
+
+        Returns None if the path is already covered by a subtree
+        of one of its ancestors.
+        """
+        elms = _split(path)
+        if not elms:
+            return None
+        node = self._root
+        for elm in elms:
+            if node.subtree:
+                return None
+            node = node.children.setdefault(elm, _TrieNode())
+        return node
+
+    def add_exact(self, path: str) -> None:
+        """Grant access to the folder itself"""
+        if (node := self._walk(path)) is not None:
+            node.exact = True
+
+    def add_subtree(self, path: str) -> None:
+        """Grant access to all descendants of the folder"""
+        if (node := self._walk(path)) is not None:
+            node.subtree = True
+            node.children = {}
+
+    def _iter(self, node: _TrieNode, prefix: str):
+        for name, child in node.children.items():
+            path = f"{prefix}/{name}" if prefix else name
+            yield path, child
+            yield from self._iter(child, path)
+
+    @property
+    def exact_paths(self) -> list[str]:
+        return [path for path, node in self._iter(self._root, "") if node.exact]
+
+    @property
+    def subtree_paths(self) -> list[str]:
+        return [path for path, node in self._iter(self._root, "") if node.subtree]
+
+    def __bool__(self) -> bool:
+        nodes = self._iter(self._root, "")
+        return any(node.exact or node.subtree for _, node in nodes)
+
+    def matches(self, path: str) -> bool:
+        """Check whether the folder path is accessible"""
+        node = self._root
+        for elm in _split(path):
+            if node.subtree:
+                return True
+            if (child := node.children.get(elm)) is None:
+                return False
+            node = child
+        return node is not self._root and node.exact
+
+    @property
+    def access_list(self) -> list[str]:
+        """Return the set as a list of quoted paths for `LIKE ANY` queries.
+
+        Subtrees are represented by paths with a trailing wildcard.
+        This is the format returned by `folder_access_list`.
+        """
+        return [f'"{path}/%"' for path in self.subtree_paths] + [
+            f'"{path}"' for path in self.exact_paths
+        ]
+
+    def sql_condition(self, column: str = "hierarchy.path") -> str:
+        """Return an SQL predicate matching accessible paths in the column"""
+        conditions = []
+        patterns = [f"{_escape_like(path)}/%" for path in self.subtree_paths]
+        if len(patterns) > SQL_OR_LIMIT:
+            elements = ", ".join(_quote_array_element(p) for p in patterns)
+            conditions.append(f"{column} LIKE ANY ('{{{_quote(elements)}}}')")
+        else:
+            conditions.extend(f"{column} LIKE '{_quote(p)}'" for p in patterns)
+        if exact := [_quote(path) for path in self.exact_paths]:
+            conditions.append(f"{column} IN {SQLTool.array(exact)}")
+        if not conditions:
+            return "FALSE"
+        return f"({' OR '.join(conditions)})"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"exact": self.exact_paths, "subtrees": self.subtree_paths}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "FolderAccessSet":
+        return cls(exact=data.get("exact", []), subtrees=data.get("subtrees", []))
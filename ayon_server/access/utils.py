@@ -1,11 +1,14 @@
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Iterable, Literal
 
 from ayon_server.exceptions import ForbiddenException
-from ayon_server.lib.postgres import Postgres
+from ayon_server.lib.postgres import Connection, Postgres
+from ayon_server.lib.redis import Redis
 from ayon_server.types import AccessType, ProjectLevelEntityType
-from ayon_server.utils import SQLTool
+from ayon_server.utils import hash_data, json_dumps, json_loads
 
 if TYPE_CHECKING:
+    from ayon_server.access.folder_access import FolderAccessSet
+    from ayon_server.access.permissions import FolderAccessList
     from ayon_server.entities import UserEntity
 
 
@@ -37,73 +40,67 @@ def path_to_paths(
     return result
 
 
-async def folder_access_list(
-    user: "UserEntity",
-    project_name: str,
-    access_type: AccessType = "read",
-) -> list[str] | None:
-    """Return a list of paths user has access to
-
-    Result is either a list of strings or None,
-    if there's no access limit, so if the result is not none,
-    user has access to all folders in the list.
+FOLDER_ACCESS_NS = "folder-access"
+FOLDER_ACCESS_TTL = 3600
 
-    Multiple access types can be specified, in which case
-    the result is a union of all access types.
 
-    Requires folowing columns to be selected:
-        - hierarchy.path AS path
+async def get_folder_access_revision(project_name: str) -> int:
+    """Return the revision of data the "assigned" folder access depends on.
 
-    Raises ForbiddenException in case it is obvious the user
-    does not have rights to access any of the folders in the project.
-
-    The list is returned as a list of strings WITHOUT leading slash,
-    so it can be used directly in an SQL query.
+    The revision is bumped by database triggers whenever task assignees
+    change or folders are renamed or moved.
     """
+    res = await Postgres.fetch(
+        "SELECT revision FROM folder_access_revision WHERE project_schema = $1",
+        f"project_{project_name.lower()}",
+    )
+    return res[0]["revision"] if res else 0
 
-    if user.is_manager:
-        return None
 
-    if user.path_access_cache is None:
-        user.path_access_cache = {}
-    if (
-        plist := user.path_access_cache.get(project_name, {}).get(access_type)
-    ) is not None:
-        if not plist:
-            raise ForbiddenException(
-                f"User {user.name} does not have access "
-                f"to any folders in project {project_name}"
-            )
-        return plist
+def _add_access_path(
+    access_set: "FolderAccessSet",
+    path: str,
+    include_parents: bool = False,
+    include_self: bool = True,
+) -> None:
+    """Add a path to the access set (see `path_to_paths`)"""
+    access_set.add_subtree(path)
+    pelms = path.strip().strip("/").split("/")
+    if include_parents:
+        for i in range(len(pelms)):
+            access_set.add_exact("/".join(pelms[0 : i + 1]))
+    if include_self:
+        access_set.add_exact(path)
 
-    perms = user.permissions(project_name)
-    assert perms is not None, "folder_access_list without selected project"
-    fpaths = set()
 
-    permset = perms.__getattribute__(access_type)
-    if not permset.enabled:
-        return None
+async def _build_folder_access_set(
+    user: "UserEntity",
+    project_name: str,
+    permset: "FolderAccessList",
+    access_type: AccessType,
+) -> "FolderAccessSet":
+    # Imported here to avoid a circular import
+    # (entities -> access.utils -> access.permissions -> settings -> entities)
+    from ayon_server.access.folder_access import FolderAccessSet
 
-    for perm in permset.access_list:
-        if perm.access_type == "hierarchy":
-            for path in path_to_paths(
-                perm.path,
-                # Read access implies reading parent folders
-                include_parents=access_type == "read",
-            ):
-                fpaths.add(path)
+    # Read access implies reading parent folders
+    include_parents = access_type == "read"
+    access_set = FolderAccessSet()
 
-        elif perm.access_type == "children":
-            for path in path_to_paths(
+    for perm in permset.access_list:
+        if perm.access_type in ("hierarchy", "children"):
+            if not perm.path:
+                continue
+            _add_access_path(
+                access_set,
                 perm.path,
-                include_parents=access_type == "read",
-                include_self=False,
-            ):
-                fpaths.add(path)
+                include_parents=include_parents,
+                include_self=perm.access_type == "hierarchy",
+            )
 
         elif perm.access_type == "assigned":
             query = f"""
-                SELECT
+                SELECT DISTINCT
                     h.path
                 FROM
                     project_{project_name}.hierarchy as h
@@ -111,52 +108,122 @@ async def folder_access_list(
                     project_{project_name}.tasks as t
                     ON h.id = t.folder_id
                 WHERE
-                    '{user.name}' = ANY (t.assignees)
+                    $1 = ANY (t.assignees)
                 """
-            async for record in Postgres.iterate(query):
-                for path in path_to_paths(
-                    record["path"],
-                    include_parents=access_type == "read",
-                ):
-                    fpaths.add(path)
+            async for record in Postgres.iterate(query, user.name):
+                _add_access_path(access_set, record["path"], include_parents)
+
+    return access_set
+
+
+async def folder_access_set(
+    user: "UserEntity",
+    project_name: str,
+    access_type: AccessType = "read",
+) -> "FolderAccessSet | None":
+    """Return a set of folder paths user has access to
+
+    Result is either a FolderAccessSet or None, if there's no access
+    limit. The set may be used to match folder paths in Python
+    (`matches`) or in SQL queries (`sql_condition`).
+
+    Raises ForbiddenException in case it is obvious the user
+    does not have rights to access any of the folders in the project.
 
-    path_list = list(fpaths)
+    Sets depending on task assignments are cached across requests.
+    The cache key contains the permissions of the user (so access group
+    changes take effect immediately) and the folder access revision
+    of the project (bumped on assignee changes and hierarchy moves).
+    """
+
+    if user.is_manager:
+        return None
+
+    if user.path_access_cache is None:
+        user.path_access_cache = {}
+    project_cache = user.path_access_cache.setdefault(project_name, {})
 
-    # cache the result for the lifetime of the request
-    if project_name not in user.path_access_cache:
-        user.path_access_cache[project_name] = {}
-    user.path_access_cache[project_name][access_type] = path_list
+    if (access_set := project_cache.get(access_type)) is None:
+        perms = user.permissions(project_name)
+        assert perms is not None, "folder_access_set without selected project"
 
-    if not path_list:
+        permset = perms.__getattribute__(access_type)
+        if not permset.enabled:
+            return None
+
+        if any(perm.access_type == "assigned" for perm in permset.access_list):
+            revision = await get_folder_access_revision(project_name)
+            cache_key = hash_data([user.name, access_type, permset.dict(), revision])
+            cache_key = f"{project_name}:{cache_key}"
+
+            if (cached := await Redis.get(FOLDER_ACCESS_NS, cache_key)) is not None:
+                from ayon_server.access.folder_access import FolderAccessSet
+
+                access_set = FolderAccessSet.from_dict(json_loads(cached))
+            else:
+                access_set = await _build_folder_access_set(
+                    user, project_name, permset, access_type
+                )
+                await Redis.set(
+                    FOLDER_ACCESS_NS,
+                    cache_key,
+                    json_dumps(access_set.to_dict()),
+                    ttl=FOLDER_ACCESS_TTL,
+                )
+        else:
+            # Not depending on the project data, cheap to build
+            access_set = await _build_folder_access_set(
+                user, project_name, permset, access_type
+            )
+
+        # cache the result for the lifetime of the request
+        project_cache[access_type] = access_set
+
+    if not access_set:
         raise ForbiddenException(
             f"{access_type.capitalize()} access denied "
             f"for {user.name} in project {project_name}"
         )
 
-    return path_list
+    return access_set
 
 
-async def ensure_entity_access(
+async def folder_access_list(
     user: "UserEntity",
     project_name: str,
-    entity_type: ProjectLevelEntityType,
-    entity_id: str,
     access_type: AccessType = "read",
-) -> Literal[True]:
-    """Check whether the user has access to a given entity.
+) -> list[str] | None:
+    """Return a list of paths user has access to
+
+    Result is either a list of strings or None,
+    if there's no access limit, so if the result is not none,
+    user has access to all folders in the list.
+
+    Requires folowing columns to be selected:
+        - hierarchy.path AS path
+
+    Raises ForbiddenException in case it is obvious the user
+    does not have rights to access any of the folders in the project.
 
-    Warning: THIS IS SLOW. DO NOT USE IN BATCHES!
+    The list is returned as a list of strings WITHOUT leading slash,
+    so it can be used directly in an SQL query.
+
+    Prefer `folder_access_set`, which provides an SQL predicate
+    able to use the path index and fast matching in Python.
     """
 
-    access_list = await folder_access_list(
-        user,
-        project_name,
-        access_type=access_type,
-    )
-    if access_list is None:
-        return True
+    access_set = await folder_access_set(user, project_name, access_type)
+    if access_set is None:
+        return None
+    return access_set.access_list
+
+
+def _entity_access_joins(
+    project_name: str,
+    entity_type: ProjectLevelEntityType,
+) -> list[str]:
+    """Return joins from the hierarchy table to the given entity type"""
 
-    conditions = [f"hierarchy.path like ANY ('{{{', '.join(access_list)}}}')"]
     joins = []
 
     if entity_type in ("product", "version", "representation"):
@@ -197,17 +264,124 @@ async def ensure_entity_access(
                 """
             )
 
-    if entity_type == "folder":
-        conditions.append(f"hierarchy.id = '{entity_id}'")
-    else:
-        conditions.append(f"{entity_type}s.id = '{entity_id}'")
+    return joins
+
+
+async def ensure_entity_access(
+    user: "UserEntity",
+    project_name: str,
+    entity_type: ProjectLevelEntityType,
+    entity_id: str,
+    access_type: AccessType = "read",
+) -> Literal[True]:
+    """Check whether the user has access to a given entity.
+
+    Each call runs a query, unless the access was already confirmed
+    during the request by `get_accessible_entity_ids`. When checking
+    multiple entities, use `get_accessible_entity_ids` or
+    `ensure_entities_access` to evaluate them at once.
+    """
+
+    if user.is_manager:
+        return True
+
+    cache_key = (project_name, entity_type, access_type)
+    if entity_id in (user.entity_access_cache or {}).get(cache_key, ()):
+        return True
+
+    accessible = await get_accessible_entity_ids(
+        user,
+        project_name,
+        entity_type,
+        [entity_id],
+        access_type,
+    )
+    if entity_id not in accessible:
+        raise ForbiddenException("Entity access denied")
+    return True
+
 
+async def ensure_entities_access(
+    user: "UserEntity",
+    project_name: str,
+    entity_type: ProjectLevelEntityType,
+    entity_ids: Iterable[str],
+    access_type: AccessType = "read",
+    transaction: Connection | None = None,
+) -> None:
+    """Check whether the user has access to all given entities.
+
+    Raises ForbiddenException if any of the entities is not accessible.
+    """
+
+    ids = {entity_id for entity_id in entity_ids if entity_id}
+    accessible = await get_accessible_entity_ids(
+        user,
+        project_name,
+        entity_type,
+        ids,
+        access_type,
+        transaction=transaction,
+    )
+    if denied := ids - accessible:
+        raise ForbiddenException(
+            f"{access_type.capitalize()} access denied "
+            f"to {len(denied)} of {len(ids)} {entity_type}s"
+        )
+
+
+async def get_accessible_entity_ids(
+    user: "UserEntity",
+    project_name: str,
+    entity_type: ProjectLevelEntityType,
+    entity_ids: Iterable[str],
+    access_type: AccessType = "read",
+    transaction: Connection | None = None,
+) -> set[str]:
+    """Return the subset of the given entity IDs the user has access to.
+
+    Unlike `ensure_entity_access`, the access is evaluated for all the
+    entities using a single query, so this is suitable for batches.
+    Accessible entities are remembered for the rest of the request,
+    so `ensure_entity_access` calls on them are answered from memory.
+    """
+
+    ids = list({str(entity_id) for entity_id in entity_ids if entity_id})
+    if not ids:
+        return set()
+
+    try:
+        access_set = await folder_access_set(
+            user,
+            project_name,
+            access_type=access_type,
+        )
+    except ForbiddenException:
+        return set()
+    if access_set is None:
+        return set(ids)
+
+    id_column = "hierarchy.id" if entity_type == "folder" else f"{entity_type}s.id"
+    joins = _entity_access_joins(project_name, entity_type)
     query = f"""
-        SELECT hierarchy.id FROM project_{project_name}.hierarchy
+        SELECT DISTINCT {id_column} AS id
+        FROM project_{project_name}.hierarchy
         {" ".join(joins)}
-        {SQLTool.conditions(conditions)}
+        WHERE {access_set.sql_condition("hierarchy.path")}
+        AND {id_column} = ANY($1::UUID[])
     """
 
-    async for _ in Postgres.iterate(query):
-        return True
-    raise ForbiddenException("Entity access denied")
+    result = {
+        str(row["id"])
+        async for row in Postgres.iterate(query, ids, transaction=transaction)
+    }
+
+    # Remember the accessible entities for the lifetime of the request,
+    # so subsequent per-entity checks do not hit the database.
+    # Denied entities are not cached - they may be created later
+    # within the same request.
+    if user.entity_access_cache is None:
+        user.entity_access_cache = {}
+    cache_key = (project_name, entity_type, access_type)
+    user.entity_access_cache.setdefault(cache_key, set()).update(result)
+    return result
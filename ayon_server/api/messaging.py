@@ -1,11 +1,11 @@
 import asyncio
-import copy
 import time
 import uuid
+from collections import OrderedDict
 from contextlib import suppress
 from typing import Any
 
-from fastapi.websockets import WebSocket, WebSocketDisconnect
+from fastapi.websockets import WebSocket
 from nxtools import log_traceback, logging
 
 from ayon_server.api.system import restart_server
@@ -13,7 +13,9 @@ from ayon_server.auth.session import Session
 from ayon_server.background.background_worker import BackgroundWorker
 from ayon_server.config import ayonconfig
 from ayon_server.entities import UserEntity
+from ayon_server.events.waiters import enroll_waiters
 from ayon_server.lib.redis import Redis
+from ayon_server.metrics.system import Metric
 from ayon_server.utils import get_nickname, json_dumps, json_loads, obscure
 
 ALWAYS_SUBSCRIBE = [
@@ -23,6 +25,15 @@ ALWAYS_SUBSCRIBE = [
 
 
 class Client:
+    """Websocket client connection.
+
+    Messages are not written to the socket directly. They are put to
+    a bounded outbound queue, which is drained by a per-client writer
+    task, so a slow client does not delay delivery to the others.
+    What happens when the queue is full is controlled by
+    `websocket_slow_consumer_policy` setting.
+    """
+
     id: str
     sock: WebSocket
     topics: list[str] = []
@@ -37,6 +48,16 @@ class Client:
         self.sock: WebSocket = sock
         self.created_at = time.time()
 
+        # key: (enqueued_at, payload)
+        # key is an event id for coalescable messages, sequence number otherwise
+        self.queue: OrderedDict[str | int, tuple[float, str]] = OrderedDict()
+        self.queue_event = asyncio.Event()
+        self.sequence = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+        self.writer = asyncio.create_task(self._writer())
+
     @property
     def user_name(self) -> str | None:
         if self.user is None:
@@ -50,6 +71,14 @@ class Client:
             return True
         return self.user.data.get("isGuest", False)
 
+    @property
+    def lag(self) -> float:
+        """Age of the oldest message waiting in the queue (seconds)"""
+        if not self.queue:
+            return self.last_lag
+        enqueued_at, _ = next(iter(self.queue.values()))
+        return time.monotonic() - enqueued_at
+
     async def authorize(
         self,
         access_token: str,
@@ -65,15 +94,83 @@ class Client:
             return True
         return False
 
-    async def send(self, message: dict[str, Any], auth_only: bool = True):
+    def send(
+        self,
+        message: dict[str, Any] | str,
+        auth_only: bool = True,
+        coalesce_key: str | None = None,
+    ) -> None:
+        """Queue a message to be sent to the client.
+
+        Message may be provided either as a dict or already serialized
+        to JSON, which allows sending the same payload to many clients.
+
+        When coalesce_key is set (and the policy allows it), the message
+        replaces a queued message with the same key, keeping its position
+        in the queue.
+        """
         if (not self.authorized) and auth_only:
             return None
         if not self.is_valid:
             return None
+        if not isinstance(message, str):
+            message = json_dumps(message)
+
+        policy = ayonconfig.websocket_slow_consumer_policy
+        now = time.monotonic()
+
+        if policy == "coalesce" and coalesce_key is not None:
+            if coalesce_key in self.queue:
+                enqueued_at, _ = self.queue[coalesce_key]
+                self.queue[coalesce_key] = (enqueued_at, message)
+                self.coalesced += 1
+                return None
+            key: str | int = coalesce_key
+        else:
+            self.sequence += 1
+            key = self.sequence
+
+        if len(self.queue) >= ayonconfig.websocket_queue_size:
+            if policy == "disconnect":
+                logging.warning(
+                    f"Websocket client {self.user_name or self.id} "
+                    f"is too slow ({self.lag:.1f}s behind). Disconnecting"
+                )
+                self.close()
+                return None
+            self.queue.popitem(last=False)
+            self.dropped += 1
+
+        self.queue[key] = (now, message)
+        self.queue_event.set()
+
+    async def _writer(self) -> None:
         try:
-            await self.sock.send_text(json_dumps(message))
-        except WebSocketDisconnect:
+            while not self.disconnected:
+                if not self.queue:
+                    self.queue_event.clear()
+                    await self.queue_event.wait()
+                    continue
+                _, (enqueued_at, message) = self.queue.popitem(last=False)
+                await self.sock.send_text(message)
+                self.last_lag = time.monotonic() - enqueued_at
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # WebSocketDisconnect, RuntimeError or a transport specific
+            # error when the connection is already closed
+            logging.debug(f"Websocket client {self.id} disconnected: {e}")
+        finally:
             self.disconnected = True
+            self.queue.clear()
+            with suppress(Exception):
+                await asyncio.wait_for(self.sock.close(code=1000), timeout=1)
+
+    def close(self) -> None:
+        """Stop the writer and close the connection"""
+        self.disconnected = True
+        if not self.writer.done():
+            self.writer.cancel()
 
     async def receive(self):
         data = await self.sock.receive_text()
@@ -97,10 +194,99 @@ class Client:
         return True
 
 
+class TopicTrie:
+    """Prefix tree of topic subscriptions.
+
+    Each node holds ids of clients subscribed to the prefix
+    leading to the node. Wildcard subscription (`*`) is stored
+    in the root node, since it matches every topic.
+    """
+
+    def __init__(self) -> None:
+        self.children: dict[str, TopicTrie] = {}
+        self.subscribers: set[str] = set()
+
+    def add(self, prefix: str, client_id: str) -> None:
+        node = self
+        for char in "" if prefix == "*" else prefix:
+            node = node.children.setdefault(char, TopicTrie())
+        node.subscribers.add(client_id)
+
+    def remove(self, prefix: str, client_id: str) -> None:
+        path: list[tuple[TopicTrie, str]] = []
+        node = self
+        for char in "" if prefix == "*" else prefix:
+            if char not in node.children:
+                return
+            path.append((node, char))
+            node = node.children[char]
+        node.subscribers.discard(client_id)
+
+        # prune empty branches
+        for parent, char in reversed(path):
+            child = parent.children[char]
+            if child.subscribers or child.children:
+                break
+            del parent.children[char]
+
+    def match(self, topic: str) -> set[str]:
+        """Return ids of clients subscribed to any prefix of the topic"""
+        result = set(self.subscribers)
+        node: TopicTrie | None = self
+        for char in topic:
+            assert node is not None
+            node = node.children.get(char)
+            if node is None:
+                break
+            result.update(node.subscribers)
+        return result
+
+
+class FanoutMetrics:
+    """Websocket fan-out instrumentation"""
+
+    def __init__(self) -> None:
+        self.messages: int = 0
+        self.deliveries: int = 0
+        self.latency_total: float = 0.0
+        self.latency_max: float = 0.0
+
+    def record(self, latency: float, deliveries: int) -> None:
+        self.messages += 1
+        self.deliveries += deliveries
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def metrics(self) -> list[Metric]:
+        """Return collected metrics.
+
+        Maximum latency is reset on every call,
+        so it represents the maximum since the last scrape.
+        """
+        result = [
+            Metric("ws_messages_total", self.messages),
+            Metric("ws_deliveries_total", self.deliveries),
+            Metric("ws_fanout_seconds_total", round(self.latency_total, 6)),
+            Metric("ws_fanout_seconds_max", round(self.latency_max, 6)),
+        ]
+        self.latency_max = 0.0
+        return result
+
+
 class Messaging(BackgroundWorker):
     def initialize(self):
         self.clients: dict[str, Client] = {}
 
+        # Subscription indexes of authorized clients
+        self.topic_index = TopicTrie()
+        self.project_index: dict[str | None, set[str]] = {}
+        self.user_index: dict[str, set[str]] = {}
+        self.fanout_metrics = FanoutMetrics()
+
+        # Messages dropped and coalesced by clients which are gone
+        self.dropped = 0
+        self.coalesced = 0
+
     async def join(self, websocket: WebSocket):
         if not self.is_running:
             await websocket.close()
@@ -110,17 +296,150 @@ class Messaging(BackgroundWorker):
         self.clients[client.id] = client
         return client
 
-    async def purge(self):
-        to_rm = []
+    async def authorize(
+        self,
+        client: Client,
+        access_token: str,
+        topics: list[str],
+        project: str | None = None,
+    ) -> bool:
+        """Authorize the client and index its subscriptions"""
+        self.unindex(client)
+        result = await client.authorize(access_token, topics, project)
+        # If re-authorization fails, the original subscriptions are kept
+        self.index(client)
+        return result
+
+    def index(self, client: Client) -> None:
+        if not client.authorized:
+            return
+        for topic in client.topics:
+            self.topic_index.add(topic, client.id)
+        self.project_index.setdefault(client.project_name, set()).add(client.id)
+        if client.user_name:
+            self.user_index.setdefault(client.user_name, set()).add(client.id)
+
+    def unindex(self, client: Client) -> None:
+        if not client.authorized:
+            return
+        for topic in client.topics:
+            self.topic_index.remove(topic, client.id)
+        if (bucket := self.project_index.get(client.project_name)) is not None:
+            bucket.discard(client.id)
+            if not bucket:
+                del self.project_index[client.project_name]
+        if client.user_name and (bucket := self.user_index.get(client.user_name)):
+            bucket.discard(client.id)
+            if not bucket:
+                del self.user_index[client.user_name]
+
+    def remove(self, client_id: str) -> None:
+        """Remove a client and its subscriptions"""
+        if (client := self.clients.pop(client_id, None)) is not None:
+            self.unindex(client)
+            client.close()
+            self.dropped += client.dropped
+            self.coalesced += client.coalesced
+
+    def purge(self) -> None:
         for client_id, client in list(self.clients.items()):
             if not client.is_valid:
-                if not client.disconnected:
-                    with suppress(RuntimeError):
-                        await client.sock.close(code=1000)
-                to_rm.append(client_id)
-        for client_id in to_rm:
-            with suppress(KeyError):
-                del self.clients[client_id]
+                self.remove(client_id)
+
+    def get_recipients(self, message: dict[str, Any]) -> list[Client]:
+        """Return clients the message should be delivered to"""
+
+        candidates = self.topic_index.match(message["topic"])
+        if not candidates:
+            return []
+
+        recipients = message.get("recipients", None)
+        if isinstance(recipients, list):
+            user_clients: set[str] = set()
+            for user_name in recipients:
+                user_clients.update(self.user_index.get(user_name, ()))
+            candidates &= user_clients
+
+        project_name = message.get("project", None)
+        if project_name and message.get("topic") != "inbox.message":
+            # Clients subscribed to the project or not bound to a specific project
+            candidates &= self.project_index.get(project_name, set()) | (
+                self.project_index.get(None, set())
+            )
+
+        result = []
+        for client_id in candidates:
+            if (client := self.clients.get(client_id)) is None:
+                continue
+            if project_name and client.user and (not client.user.is_manager):
+                access_groups = client.user.data.get("accessGroups", {})
+                if project_name not in access_groups:
+                    continue
+            result.append(client)
+        return result
+
+    def fan_out(self, message: dict[str, Any]) -> None:
+        """Queue the message for all subscribed clients.
+
+        Each payload variant is serialized only once and the same
+        string is sent to all its recipients. Sending itself is done
+        by the clients' writer tasks, so this never blocks.
+        """
+
+        start_time = time.monotonic()
+        recipients = self.get_recipients(message)
+
+        # Progress updates of the same event may replace each other
+        coalesce_key: str | None = None
+        if message.get("status") == "in_progress" and message.get("id"):
+            coalesce_key = str(message["id"])
+
+        regular_payload: str | None = None
+        guest_payload: str | None = None
+
+        for client in recipients:
+            if client.is_guest and message.get("user") != client.user_name:
+                if guest_payload is None:
+                    m = {k: v for k, v in message.items() if k != "recipients"}
+                    if m.get("user"):
+                        m["user"] = get_nickname(m["user"])
+                    if message["topic"].startswith("log"):
+                        m["description"] = obscure(m["description"])
+                    guest_payload = json_dumps(m)
+                client.send(guest_payload, coalesce_key=coalesce_key)
+            else:
+                if regular_payload is None:
+                    regular_payload = json_dumps(
+                        {k: v for k, v in message.items() if k != "recipients"}
+                    )
+                client.send(regular_payload, coalesce_key=coalesce_key)
+
+        self.fanout_metrics.record(time.monotonic() - start_time, len(recipients))
+
+    def get_metrics(self) -> list[Metric]:
+        """Return websocket metrics.
+
+        Client queues are reported as aggregates. Connections come
+        and go, so per-connection series would grow without bounds.
+        """
+        queued = 0
+        max_lag = 0.0
+        dropped = self.dropped
+        coalesced = self.coalesced
+        for client in self.clients.values():
+            queued += len(client.queue)
+            max_lag = max(max_lag, client.lag)
+            dropped += client.dropped
+            coalesced += client.coalesced
+
+        return [
+            Metric("ws_clients", len(self.clients)),
+            *self.fanout_metrics.metrics(),
+            Metric("ws_queued_messages", queued),
+            Metric("ws_client_lag_seconds_max", round(max_lag, 6)),
+            Metric("ws_dropped_total", dropped),
+            Metric("ws_coalesced_total", coalesced),
+        ]
 
     async def run(self) -> None:
         self.pubsub = await Redis.pubsub()
@@ -143,50 +462,23 @@ class Messaging(BackgroundWorker):
                 else:
                     message = json_loads(raw_message["data"])
 
-                # TODO: much much smarter logic here
-                for _client_id, client in self.clients.items():
-                    project_name = message.get("project", None)
-                    if (
-                        client.project_name is not None
-                        and message.get("topic") != "inbox.message"
-                    ):
-                        if project_name and project_name != client.project_name:
-                            continue
-
-                    if project_name and client.user and (not client.user.is_manager):
-                        access_groups = client.user.data.get("accessGroups", {})
-                        if project_name not in access_groups:
-                            continue
-
-                    recipients = message.get("recipients", None)
-                    if isinstance(recipients, list):
-                        if client.user_name not in recipients:
-                            continue
-
-                    for topic in client.topics:
-                        if topic == "*" or message["topic"].startswith(topic):
-                            if (
-                                client.is_guest
-                                and message.get("user") != client.user_name
-                            ):
-                                m = copy.deepcopy(message)
-                                if m.get("user"):
-                                    m["user"] = get_nickname(m["user"])
-                                if message["topic"].startswith("log"):
-                                    m["description"] = obscure(m["description"])
-                                await client.send(m)
-                            else:
-                                m = copy.deepcopy(message)
-                                m.pop("recipients", None)
-                                await client.send(m)
+                self.fan_out(message)
+                enroll_waiters.notify(message)
 
                 if message["topic"] == "server.restart_requested":
                     restart_server()
 
-                await self.purge()
+                self.purge()
 
             except Exception:
                 log_traceback(handlers=None)
                 await asyncio.sleep(0.5)
 
         logging.warning("Stopping redis2ws")
+
+    async def finalize(self) -> None:
+        for client_id in list(self.clients):
+            self.remove(client_id)
+
+
+messaging = Messaging()
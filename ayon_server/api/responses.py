@@ -25,6 +25,17 @@ class EmptyResponse(Response):
         super().__init__(status_code=status_code, **kwargs)
 
 
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    """Check whether the If-None-Match header matches the ETag"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 class ResponseFactory:
     @classmethod
     def error(cls, code: int = 500, detail: str | None = None) -> dict[str, Any]:
@@ -15,7 +15,7 @@ from nxtools import log_to_file, log_traceback, logging, slugify
 
 from ayon_server.addons import AddonLibrary
 from ayon_server.api.frontend import init_frontend
-from ayon_server.api.messaging import Messaging
+from ayon_server.api.messaging import messaging
 from ayon_server.api.metadata import app_meta, tags_meta
 from ayon_server.api.postgres_exceptions import (
     IntegrityConstraintViolationError,
@@ -30,6 +30,7 @@ from ayon_server.config import ayonconfig
 from ayon_server.events import EventStream
 from ayon_server.exceptions import AyonException
 from ayon_server.graphql import router as graphql_router
+from ayon_server.helpers.settings_snapshot import invalidate_settings_snapshots
 from ayon_server.initialize import ayon_init
 from ayon_server.lib.postgres import Postgres
 from ayon_server.utils import parse_access_token
@@ -246,8 +247,6 @@ def explorer() -> fastapi.responses.HTMLResponse:
 # Websocket
 #
 
-messaging = Messaging()
-
 
 @app.websocket("/ws")
 async def ws_endpoint(websocket: WebSocket) -> None:
@@ -261,16 +260,14 @@ async def ws_endpoint(websocket: WebSocket) -> None:
                 continue
 
             if message["topic"] == "auth":
-                await client.authorize(
+                await messaging.authorize(
+                    client,
                     message.get("token"),
                     topics=message.get("subscribe", []),
                     project=message.get("project"),
                 )
     except WebSocketDisconnect:
-        try:
-            del messaging.clients[client.id]
-        except KeyError:
-            pass
+        messaging.remove(client.id)
 
 
 #
@@ -384,6 +381,10 @@ async def startup_event() -> None:
     await ayon_init()
     await load_access_groups()
 
+    # Addon code (settings models, defaults) may have changed since the
+    # snapshots of resolved settings were created
+    await invalidate_settings_snapshots()
+
     # Start background tasks
 
     background_workers.start()
@@ -1,6 +1,7 @@
 __all__ = ["Session"]
 
 import time
+from collections import OrderedDict
 from typing import Any, AsyncGenerator
 
 from fastapi import Request
@@ -13,6 +14,22 @@ from ayon_server.lib.redis import Redis
 from ayon_server.types import OPModel
 from ayon_server.utils import create_hash, json_dumps, json_loads
 
+# Channel used to notify other server processes about changed sessions
+INVALIDATION_CHANNEL = f"{ayonconfig.redis_channel}:sessions"
+
+# KEYS: [session]
+# ARGV: [expected value, new value]
+# Replaces the session only if it has not changed since it was read.
+# Does nothing (returns 0) when the session was deleted or updated meanwhile.
+
+COMPARE_AND_SET_SCRIPT = """
+if redis.call("GET", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("SET", KEYS[1], ARGV[2])
+return 1
+"""
+
 
 class SessionModel(OPModel):
     user: UserEntity.model.main_model  # type: ignore
@@ -39,6 +56,70 @@ def is_local_ip(ip: str) -> bool:
     )
 
 
+class SessionCache:
+    """Bounded in-process LRU cache of parsed sessions.
+
+    Entries are invalidated when a session is updated or deleted
+    by any server process (see INVALIDATION_CHANNEL). As a safety net,
+    entries are also dropped after `session_cache_ttl` seconds.
+
+    Extending session lifetime does not write to Redis immediately.
+    New last_used values are collected in `touched` and written back
+    periodically by the session cache worker.
+    """
+
+    def __init__(self) -> None:
+        self.id = create_hash()
+        self.data: OrderedDict[str, tuple[float, SessionModel]] = OrderedDict()
+        self.touched: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> SessionModel | None:
+        item = self.data.get(token)
+        if item is None:
+            self.misses += 1
+            return None
+        cached_at, session = item
+        if time.monotonic() - cached_at > ayonconfig.session_cache_ttl:
+            del self.data[token]
+            self.misses += 1
+            return None
+        self.data.move_to_end(token)
+        self.hits += 1
+        return session
+
+    def put(self, token: str, session: SessionModel) -> None:
+        if ayonconfig.session_cache_size <= 0:
+            return
+        self.data[token] = (time.monotonic(), session)
+        self.data.move_to_end(token)
+        while len(self.data) > ayonconfig.session_cache_size:
+            self.data.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        self.data.pop(token, None)
+
+    def touch(self, token: str, last_used: float) -> None:
+        self.touched[token] = last_used
+
+    async def publish_invalidation(self, token: str) -> None:
+        self.invalidate(token)
+        await Redis.publish(
+            json_dumps({"token": token, "origin": self.id}),
+            channel=INVALIDATION_CHANNEL,
+        )
+
+    def handle_invalidation(self, message: dict[str, Any]) -> None:
+        if message.get("origin") == self.id:
+            return
+        if token := message.get("token"):
+            self.invalidate(token)
+
+
+session_cache = SessionCache()
+
+
 class Session:
     ns = "session"
 
@@ -56,15 +137,24 @@ class Session:
         If it's not expired, update the last_used field and extend
         its lifetime.
         """
-        data = await Redis.get(cls.ns, token)
-        if not data:
-            return None
+        session = session_cache.get(token)
+        if session is None or cls.is_expired(session):
+            # Cached session may be considered expired, while its lifetime
+            # was extended by another process. Redis is the source of truth.
+            data = await Redis.get(cls.ns, token)
+            if not data:
+                session_cache.invalidate(token)
+                return None
 
-        session = SessionModel(**json_loads(data))
+            session = SessionModel(**json_loads(data))
+            if (last_used := session_cache.touched.get(token)) is not None:
+                session.last_used = max(session.last_used, last_used)
 
-        if cls.is_expired(session):
-            await cls.delete(token, "Session expired")
-            return None
+            if cls.is_expired(session):
+                await cls.delete(token, "Session expired")
+                return None
+
+            session_cache.put(token, session)
 
         if request:
             if (
@@ -73,7 +163,7 @@ class Session:
             ):
                 session.client_info = get_client_info(request)
                 session.last_used = time.time()
-                await Redis.set(cls.ns, token, session.json())
+                await cls.store(session)
             elif not ayonconfig.disable_check_session_ip:
                 real_ip = get_real_ip(request)
                 if not is_local_ip(real_ip):
@@ -85,15 +175,13 @@ class Session:
         # extend normal tokens validity, but not service tokens.
         # they should be validated against db forcefully every 10 minutes or so
 
-        # Extend the session lifetime only if it's in its second half
-        # (save update requests).
-        # So it doesn't make sense to call the parameter last_used is it?
-        # Whatever. Fix later.
+        # Extend the session lifetime only if it's in its second half.
+        # The new value is written to Redis lazily by the session cache worker.
 
         if not session.is_service:
             if time.time() - session.created > ayonconfig.session_ttl / 2:
                 session.last_used = time.time()
-                await Redis.set(cls.ns, token, json_dumps(session.dict()))
+                session_cache.touch(token, session.last_used)
 
         return session
 
@@ -121,6 +209,7 @@ class Session:
         )
         event_summary = client_info.dict() if client_info else {}
         await Redis.set(cls.ns, token, session.json())
+        session_cache.put(token, session)
         if not user.is_service:
             await EventStream.dispatch(
                 "auth.login",
@@ -149,7 +238,44 @@ class Session:
         if client_info is not None:
             session.client_info = client_info
         session.last_used = time.time()
-        await Redis.set(cls.ns, token, session.json())
+        await cls.store(session)
+
+    @classmethod
+    async def store(cls, session: SessionModel) -> None:
+        """Save the session and notify other processes it has changed"""
+        session_cache.touched.pop(session.token, None)
+        await Redis.set(cls.ns, session.token, session.json())
+        await session_cache.publish_invalidation(session.token)
+        session_cache.put(session.token, session)
+
+    @classmethod
+    async def flush_touched(cls) -> int:
+        """Write back last_used of sessions extended since the last flush.
+
+        Sessions are replaced only if they did not change since they
+        were read, so a session deleted (logged out) or stored by another
+        request in the meantime is never overwritten with a stale copy.
+
+        Returns the number of updated sessions.
+        """
+        touched = session_cache.touched
+        session_cache.touched = {}
+        count = 0
+        for token, last_used in touched.items():
+            data = await Redis.get(cls.ns, token)
+            if not data:
+                continue
+            session = SessionModel(**json_loads(data))
+            if session.last_used >= last_used:
+                continue
+            session.last_used = last_used
+            count += await Redis.eval(
+                COMPARE_AND_SET_SCRIPT,
+                [(cls.ns, token)],
+                data,
+                session.json(),
+            )
+        return count
 
     @classmethod
     async def delete(cls, token: str, message: str = "User logged out") -> None:
@@ -163,6 +289,8 @@ class Session:
                     user=session.user.name,
                 )
         await Redis.delete(cls.ns, token)
+        session_cache.touched.pop(token, None)
+        await session_cache.publish_invalidation(token)
 
     @classmethod
     async def list(
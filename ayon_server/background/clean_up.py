@@ -6,9 +6,12 @@ from nxtools import log_traceback, logging
 
 from ayon_server.background.background_worker import BackgroundWorker
 from ayon_server.config import ayonconfig
+from ayon_server.helpers.hierarchy import check_hierarchy
 from ayon_server.helpers.project_files import delete_unused_files
 from ayon_server.helpers.project_list import get_project_list
+from ayon_server.helpers.version_list import check_version_list
 from ayon_server.lib.postgres import Postgres
+from ayon_server.thumbnails import release_thumbnail_payloads
 
 
 async def clear_thumbnails(project_name: str) -> None:
@@ -17,7 +20,8 @@ async def clear_thumbnails(project_name: str) -> None:
     Locate thumbnails not referenced by any folder, version or workfile
     and delete them.
 
-    Delete only thumbnails older than 24 hours.
+    Delete only thumbnails older than 24 hours. Stored payloads
+    no longer referenced by any thumbnail are deleted as well.
     """
 
     query = f"""
@@ -30,9 +34,23 @@ async def clear_thumbnails(project_name: str) -> None:
             UNION
             SELECT thumbnail_id FROM project_{project_name}.workfiles
         )
+        RETURNING hash
     """
 
-    await Postgres.execute(query)
+    res = await Postgres.fetch(query)
+    await release_thumbnail_payloads(project_name, [row["hash"] for row in res])
+
+
+async def repair_hierarchy(project_name: str) -> None:
+    """Fix folder paths the hierarchy trigger failed to maintain."""
+
+    await check_hierarchy(project_name, repair=True)
+
+
+async def repair_version_list(project_name: str) -> None:
+    """Fix product version lists the version_list trigger failed to maintain."""
+
+    await check_version_list(project_name, repair=True)
 
 
 async def clear_actions() -> None:
@@ -52,6 +70,38 @@ async def clear_actions() -> None:
     await Postgres.execute(query)
 
 
+async def clear_enroll_subscriptions() -> None:
+    """Purge enroll subscriptions no service has used for a week.
+
+    Their pending work is deleted with them. Should a service
+    enroll again, the subscription is re-created.
+    """
+    query = """
+        DELETE FROM enroll_subscriptions
+        WHERE last_used_at < now() - interval '7 days'
+    """
+    await Postgres.execute(query)
+
+
+async def clear_enroll_pending() -> None:
+    """Purge pending enroll work which is never going to be processed.
+
+    The trigger drops a source event when its target event fails
+    for the last time. This catches source events left behind
+    when a subscription is used with a lower `max_retries`.
+    """
+    query = """
+        DELETE FROM enroll_pending p
+        USING enroll_subscriptions s, events t
+        WHERE p.subscription_id = s.id
+        AND t.depends_on = p.source_id
+        AND t.topic = s.target_topic
+        AND t.status = 'failed'
+        AND t.retries > s.max_retries
+    """
+    await Postgres.execute(query)
+
+
 async def clear_logs() -> None:
     """Purge old logs."""
 
@@ -159,8 +209,14 @@ class AyonCleanUp(BackgroundWorker):
             log_traceback("Clean-up: Error getting project list")
         else:
             # For each project, clean up thumbnails and unused files
+            # and verify the folder hierarchy and version lists
             for project in projects:
-                for prj_func in (clear_thumbnails, delete_unused_files):
+                for prj_func in (
+                    clear_thumbnails,
+                    delete_unused_files,
+                    repair_hierarchy,
+                    repair_version_list,
+                ):
                     try:
                         await prj_func(project.name)
                     except Exception:
@@ -170,7 +226,13 @@ class AyonCleanUp(BackgroundWorker):
 
         # This clears not project-specific items (events)
 
-        for func in (clear_actions, clear_logs, clear_events):
+        for func in (
+            clear_actions,
+            clear_enroll_subscriptions,
+            clear_enroll_pending,
+            clear_logs,
+            clear_events,
+        ):
             try:
                 await func()
             except Exception:
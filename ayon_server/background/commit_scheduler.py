@@ -0,0 +1,32 @@
+import asyncio
+
+from nxtools import log_traceback
+
+from ayon_server.background.background_worker import BackgroundWorker
+from ayon_server.config import ayonconfig
+from ayon_server.helpers.commit_scheduler import (
+    flush_pending_commits,
+    get_pending_commits,
+)
+
+
+class CommitScheduler(BackgroundWorker):
+    """Process deferred folder commits of projects, which are due.
+
+    The queue is shared by all server processes and flushing is safe
+    to run concurrently, so every process runs the scheduler.
+    """
+
+    async def run(self):
+        while True:
+            window = ayonconfig.commit_debounce_window
+            # When deferring is disabled, just drain leftovers occasionally
+            await asyncio.sleep(max(window / 2, 0.1) if window > 0 else 5)
+            try:
+                for pending in await get_pending_commits(due_only=True):
+                    await flush_pending_commits(pending.project_name)
+            except Exception:
+                log_traceback("Unable to commit pending folder changes")
+
+
+commit_scheduler = CommitScheduler()
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from nxtools import log_traceback, logging
+
+from ayon_server.auth.session import INVALIDATION_CHANNEL, Session, session_cache
+from ayon_server.background.background_worker import BackgroundWorker
+from ayon_server.config import ayonconfig
+from ayon_server.lib.redis import Redis
+from ayon_server.utils import json_loads
+
+
+class SessionCacheWorker(BackgroundWorker):
+    """Keep the in-process session cache consistent.
+
+    Listens to session invalidation messages from other server
+    processes and periodically writes back extended session lifetimes.
+    """
+
+    async def run(self):
+        pubsub = await Redis.pubsub()
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        last_flush = time.time()
+
+        while True:
+            try:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=1,
+                )
+                if message is not None:
+                    session_cache.handle_invalidation(json_loads(message["data"]))
+                    continue
+
+                if time.time() - last_flush > ayonconfig.session_touch_interval:
+                    last_flush = time.time()
+                    if count := await Session.flush_touched():
+                        logging.debug(f"Extended lifetime of {count} sessions")
+
+            except Exception:
+                log_traceback(handlers=None)
+                await asyncio.sleep(0.5)
+
+    async def finalize(self):
+        # Do not lose extended lifetimes on shutdown
+        try:
+            await Session.flush_touched()
+        except Exception:
+            log_traceback(handlers=None)
+
+
+session_cache_worker = SessionCacheWorker()
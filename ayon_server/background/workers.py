@@ -2,8 +2,10 @@ from ayon_server.installer import background_installer
 
 from .background_worker import BackgroundWorker
 from .clean_up import clean_up
+from .commit_scheduler import commit_scheduler
 from .log_collector import log_collector
 from .metrics_collector import metrics_collector
+from .session_cache import session_cache_worker
 
 
 class BackgroundWorkers:
@@ -13,6 +15,8 @@ class BackgroundWorkers:
             log_collector,
             metrics_collector,
             clean_up,
+            session_cache_worker,
+            commit_scheduler,
         ]
 
     def start(self):
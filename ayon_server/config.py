@@ -1,6 +1,7 @@
 """Server configuration object"""
 
 import os
+from typing import Literal
 
 from aiocache import caches
 from pydantic import BaseModel, Field
@@ -108,6 +109,24 @@ class AyonConfig(BaseModel):
         description="Session lifetime in seconds",
     )
 
+    session_cache_size: int = Field(
+        default=1000,
+        description="Maximum number of sessions cached in each server process. "
+        "Set to 0 to disable the cache.",
+    )
+
+    session_cache_ttl: int = Field(
+        default=60,
+        description="Maximum time in seconds a cached session is used "
+        "without reading it from Redis again",
+    )
+
+    session_touch_interval: int = Field(
+        default=30,
+        description="Interval in seconds in which extended session "
+        "lifetimes are written back to Redis",
+    )
+
     disable_check_session_ip: bool = Field(
         default=False,
         description="Skip checking session IP match real IP",
@@ -183,6 +202,59 @@ class AyonConfig(BaseModel):
         example=90,
     )
 
+    event_update_coalescing_window: float = Field(
+        default=0,
+        description="Interval in seconds over which progress updates of "
+        "an event are merged before they are stored and published. "
+        "Set to 0 to disable coalescing.",
+        example=0.5,
+    )
+
+    commit_debounce_window: float = Field(
+        default=0,
+        description="Folder commits (inherited attributes rebuild, folder "
+        "list cache update) are deferred until no folders of the project "
+        "changed for this number of seconds. Set to 0 to commit immediately.",
+        example=1,
+    )
+
+    commit_debounce_max_delay: float = Field(
+        default=10,
+        description="Maximum time in seconds a deferred folder commit waits "
+        "when folders of the project keep changing",
+    )
+
+    settings_validation_workers: int = Field(
+        default=4,
+        description="Number of worker threads used to validate addon settings "
+        "when resolving settings of a whole bundle",
+    )
+
+    graphql_cache_size: int = Field(
+        default=500,
+        description="Maximum number of parsed and validated GraphQL documents "
+        "cached in each server process. Set to 0 to disable the cache.",
+    )
+
+    thumbnail_storage: Literal["filesystem", "database"] = Field(
+        default="filesystem",
+        description="Where thumbnail payloads are stored. 'filesystem' stores "
+        "them in the project data directory, addressed by their content hash. "
+        "'database' keeps them in the thumbnails table.",
+    )
+
+    thumbnail_cache_size: int = Field(
+        default=64 * 1024 * 1024,
+        description="Size (in bytes) of the in-process cache of thumbnail "
+        "payloads. Set to 0 to disable the cache.",
+    )
+
+    thumbnail_rendition_workers: int = Field(
+        default=2,
+        description="Number of worker processes rendering downscaled "
+        "thumbnail renditions",
+    )
+
     ynput_cloud_api_url: str | None = Field(
         "https://im.ynput.cloud",
         description="YnputConnect URL",
@@ -214,6 +286,25 @@ class AyonConfig(BaseModel):
         description="Send saturated metrics to Ynput Cloud",
     )
 
+    websocket_queue_size: int = Field(
+        default=1000,
+        description="Maximum number of messages waiting to be sent "
+        "to a single websocket client",
+    )
+
+    websocket_slow_consumer_policy: Literal[
+        "drop_oldest",
+        "coalesce",
+        "disconnect",
+    ] = Field(
+        default="coalesce",
+        description="What to do when a websocket client does not keep up "
+        "and its queue is full. 'drop_oldest' discards the oldest queued "
+        "message, 'coalesce' keeps only the latest progress update of each "
+        "event (and drops the oldest message when that is not enough), "
+        "'disconnect' closes the connection.",
+    )
+
     email_from: str = Field("noreply@ynput.cloud", description="Email sender address")
     email_smtp_host: str | None = Field(None, description="SMTP server hostname")
     email_smtp_port: int | None = Field(None, description="SMTP server port")
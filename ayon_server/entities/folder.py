@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterable
 
 from nxtools import logging
 
@@ -11,7 +11,12 @@ from ayon_server.exceptions import (
     ForbiddenException,
     NotFoundException,
 )
-from ayon_server.helpers.hierarchy_cache import rebuild_hierarchy_cache
+from ayon_server.helpers.commit_scheduler import (
+    ensure_committed,
+    is_commit_deferred,
+    schedule_folder_commit,
+)
+from ayon_server.helpers.hierarchy_cache import update_hierarchy_cache
 from ayon_server.helpers.inherited_attributes import rebuild_inherited_attributes
 from ayon_server.lib.postgres import Connection, Postgres
 from ayon_server.types import ProjectLevelEntityType
@@ -40,6 +45,11 @@ class FolderEntity(ProjectLevelEntity):
         if EntityID.parse(entity_id) is None:
             raise ValueError(f"Invalid {cls.entity_type} ID specified")
 
+        if transaction is None:
+            # Inherited attributes of recently changed folders
+            # may not be committed yet
+            await ensure_committed(project_name)
+
         query = f"""
             SELECT
                 f.id as id,
@@ -174,18 +184,46 @@ class FolderEntity(ProjectLevelEntity):
                 )
             )
 
-    async def commit(self, transaction: Connection | None = None) -> None:
-        """Refresh hierarchy materialized view on folder save."""
+    async def commit(
+        self,
+        transaction: Connection | None = None,
+        folder_ids: Iterable[str] | None = None,
+    ) -> None:
+        """Rebuild exported attributes and hierarchy cache on folder save.
+
+        Folder paths (the hierarchy table) are maintained by a database
+        trigger, so there is no need to refresh them here.
+
+        Exported attributes are rebuilt only for the subtrees of
+        `folder_ids` (folders changed in the transaction). When not
+        provided, only the subtree of this folder is rebuilt.
+
+        When deferred commits are enabled, the folders are only queued
+        and the work is done later by the commit scheduler.
+        """
+
+        if folder_ids is None:
+            folder_ids = [self.id]
+
+        if is_commit_deferred():
+            await schedule_folder_commit(
+                self.project_name,
+                folder_ids,
+                transaction=transaction,
+            )
+            return
 
         async def _commit(conn):
-            await conn.execute(
-                f"""
-                REFRESH MATERIALIZED VIEW CONCURRENTLY
-                project_{self.project_name}.hierarchy
-                """
+            await rebuild_inherited_attributes(
+                self.project_name,
+                transaction=conn,
+                folder_ids=folder_ids,
+            )
+            await update_hierarchy_cache(
+                self.project_name,
+                folder_ids,
+                transaction=conn,
             )
-            await rebuild_inherited_attributes(self.project_name, transaction=conn)
-            await rebuild_hierarchy_cache(self.project_name, transaction=conn)
 
         if transaction is not None:
             await _commit(transaction)
@@ -202,6 +240,24 @@ class FolderEntity(ProjectLevelEntity):
             return await self._delete(transaction, **kwargs)
 
     async def _delete(self, transaction: Connection, **kwargs) -> bool:
+        # Subfolders are deleted along with the folder (on delete cascade),
+        # so we need to collect their ids to remove them from the cache
+        subtree_ids = [
+            row["id"]
+            for row in await transaction.fetch(
+                f"""
+                WITH RECURSIVE subtree AS (
+                    SELECT id FROM project_{self.project_name}.folders
+                    WHERE id = $1
+                    UNION
+                    SELECT f.id FROM project_{self.project_name}.folders f
+                    INNER JOIN subtree s ON f.parent_id = s.id
+                ) SELECT id FROM subtree
+                """,
+                self.id,
+            )
+        ]
+
         if kwargs.get("force", False):
             logging.info(f"Force deleting folder and all its children. {self.path}")
             await transaction.execute(
@@ -218,7 +274,11 @@ class FolderEntity(ProjectLevelEntity):
 
         res = await super().delete(transaction=transaction, **kwargs)
         if res:
-            await rebuild_hierarchy_cache(self.project_name, transaction=transaction)
+            await update_hierarchy_cache(
+                self.project_name,
+                subtree_ids,
+                transaction=transaction,
+            )
         return res
 
     async def get_versions(self, transaction: Connection | None = None) -> list[str]:
@@ -202,8 +202,9 @@ class ProjectEntity(TopLevelEntity):
             "statuses": statuses,
             "tags": tags,
         }
-        cls.original_attributes = project_data[0]["attrib"]
-        return cls.from_record(payload=payload)
+        project = cls.from_record(payload=payload)
+        project.original_attributes = project_data[0]["attrib"]
+        return project
 
     #
     # Save
@@ -244,14 +245,29 @@ class ProjectEntity(TopLevelEntity):
 
             fields["updated_at"] = datetime.now()
 
+            # The attributes may have changed since the project was loaded.
+            # Lock the row and patch the exported attributes against
+            # the attributes being replaced.
+            res = await transaction.fetch(
+                "SELECT attrib FROM public.projects WHERE name = $1 FOR UPDATE",
+                project_name,
+            )
+            original_attributes = res[0]["attrib"] if res else {}
+
             await transaction.execute(
                 *SQLTool.update(
                     "public.projects", f"WHERE name='{project_name}'", **fields
                 )
             )
 
-            if self.original_attributes != fields["attrib"]:
-                await rebuild_inherited_attributes(self.name, fields["attrib"])
+            if original_attributes != fields["attrib"]:
+                await rebuild_inherited_attributes(
+                    self.name,
+                    fields["attrib"],
+                    transaction=transaction,
+                    original_pattr=original_attributes,
+                )
+            self.original_attributes = fields["attrib"]
 
         else:
             # Create a project record
@@ -6,6 +6,8 @@ from ayon_server.access.utils import ensure_entity_access
 from ayon_server.entities.core import ProjectLevelEntity, attribute_library
 from ayon_server.entities.models import ModelSet
 from ayon_server.exceptions import AyonException, NotFoundException
+from ayon_server.helpers.commit_scheduler import ensure_committed
+from ayon_server.helpers.hierarchy_cache import update_hierarchy_cache
 from ayon_server.lib.postgres import Connection, Postgres
 from ayon_server.types import ProjectLevelEntityType
 from ayon_server.utils import EntityID
@@ -32,6 +34,11 @@ class TaskEntity(ProjectLevelEntity):
         if EntityID.parse(entity_id) is None:
             raise ValueError(f"Invalid {cls.entity_type} ID specified")
 
+        if transaction is None:
+            # Inherited attributes of recently changed folders
+            # may not be committed yet
+            await ensure_committed(project_name)
+
         query = f"""
             SELECT
                 t.id as id,
@@ -97,6 +104,37 @@ class TaskEntity(ProjectLevelEntity):
 
         await super().save(transaction=transaction)
 
+    async def pre_save(self, insert: bool, transaction: Connection) -> None:
+        """Refresh task names of the task folder in the folder list cache"""
+        folder_ids = {self.folder_id}
+        if not insert:
+            # The task may be moved from another folder
+            res = await transaction.fetch(
+                f"""
+                SELECT folder_id FROM project_{self.project_name}.tasks
+                WHERE id = $1
+                """,
+                self.id,
+            )
+            folder_ids.update(str(row["folder_id"]) for row in res)
+        await update_hierarchy_cache(
+            self.project_name,
+            folder_ids,
+            transaction=transaction,
+            descendants=False,
+        )
+
+    async def delete(self, transaction: Connection | None = None, **kwargs) -> bool:
+        deleted = await super().delete(transaction=transaction, **kwargs)
+        if deleted:
+            await update_hierarchy_cache(
+                self.project_name,
+                [self.folder_id],
+                transaction=transaction,
+                descendants=False,
+            )
+        return deleted
+
     async def ensure_create_access(self, user, **kwargs) -> None:
         if user.is_manager:
             return
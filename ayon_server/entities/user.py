@@ -6,6 +6,7 @@ from typing import Any
 from nxtools import logging
 
 from ayon_server.access.access_groups import AccessGroups
+from ayon_server.access.folder_access import FolderAccessSet
 from ayon_server.access.permissions import Permissions
 from ayon_server.auth.utils import (
     create_password,
@@ -32,10 +33,14 @@ class UserEntity(TopLevelEntity):
     model = ModelSet("user", attribute_library["user"], has_id=False)
     was_active: bool = False
 
-    # Cache for path access lists
+    # Cache for folder access sets
     # the structure is as follows:
-    # project_name[access_type]: [path1, path2, ...]
-    path_access_cache: dict[str, dict[AccessType, list[str]]] | None = None
+    # project_name[access_type]: FolderAccessSet
+    path_access_cache: dict[str, dict[AccessType, FolderAccessSet]] | None = None
+
+    # Cache of entities the user was confirmed to have access to
+    # (project_name, entity_type, access_type): {entity_id, ...}
+    entity_access_cache: dict[tuple[str, str, AccessType], set[str]] | None = None
 
     #
     # Load
@@ -44,23 +44,6 @@ class VersionEntity(ProjectLevelEntity):
                 self.task_id,
             )
 
-    async def commit(self, transaction=None) -> None:
-        """Refresh hierarchy materialized view on folder save."""
-
-        async def _commit(conn):
-            await conn.execute(
-                f"""
-                REFRESH MATERIALIZED VIEW CONCURRENTLY
-                project_{self.project_name}.version_list
-                """
-            )
-
-        if transaction:
-            await _commit(transaction)
-        else:
-            async with Postgres.acquire() as conn, conn.transaction():
-                await _commit(conn)
-
     async def ensure_create_access(self, user, **kwargs) -> None:
         if user.is_manager:
             return
@@ -54,6 +54,7 @@ async def update_event(
     progress: float | None = None,
     store: bool = True,
     retries: int | None = None,
+    coalesce: bool = False,
 ) -> bool:
     return await EventStream.update(
         event_id=event_id,
@@ -67,4 +68,5 @@ async def update_event(
         progress=progress,
         store=store,
         retries=retries,
+        coalesce=coalesce,
     )
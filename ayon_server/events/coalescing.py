@@ -0,0 +1,123 @@
+"""Coalescing of high-frequency event progress updates.
+
+Services may report progress of long running jobs many times per second.
+Instead of writing every such update to the database and publishing it,
+progress updates of an event are merged over a short window:
+
+- The first update of an event is executed immediately and opens a window.
+- Subsequent progress updates within the window are merged (the latest
+  value of each field wins) and executed once the window closes, which
+  opens another window. So subscribers see at most one update per window.
+- Status transitions (any status other than `in_progress`) are never
+  delayed. They are merged with the pending state and executed immediately,
+  after any update which is already in flight.
+
+Coalescing happens within a single server process, but updates of the
+same event may be handled by different processes. A delayed update is
+therefore called with `delayed=True` and must not overwrite the event
+if it has already reached a final status (for example, set by another
+process). A delayed update that fails is retried in the next window,
+up to MAX_FLUSH_ATTEMPTS times.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from nxtools import log_traceback
+
+from ayon_server.config import ayonconfig
+
+UpdateFunction = Callable[..., Awaitable[bool]]
+
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class UpdateCoalescer:
+    def __init__(self) -> None:
+        # event_id: merged arguments of the delayed update
+        self.pending: dict[str, dict[str, Any]] = {}
+        # event_id: lock serializing updates of the event while its window is open
+        self.windows: dict[str, asyncio.Lock] = {}
+        # keep references to the window tasks, so they are not garbage collected
+        self.tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def window(self) -> float:
+        return ayonconfig.event_update_coalescing_window
+
+    def is_active(self, event_id: str) -> bool:
+        return event_id in self.windows
+
+    async def submit(
+        self,
+        event_id: str,
+        update: UpdateFunction,
+        coalesce: bool = True,
+        **kwargs: Any,
+    ) -> bool:
+        """Execute or delay the update of the event.
+
+        `update` is called with the event id and the (merged) arguments.
+        Returns the result of the update or True if the update was delayed.
+        Delayed updates are best effort: failures are logged and retried,
+        but not reported to the caller.
+        """
+
+        status = kwargs.get("status")
+        if coalesce and status in (None, "in_progress"):
+            if event_id in self.windows:
+                merged = self.pending.setdefault(event_id, {})
+                merged.update({k: v for k, v in kwargs.items() if v is not None})
+                return True
+
+            # No window is open. Execute the update now and open a new one
+            lock = asyncio.Lock()
+            self.windows[event_id] = lock
+            async with lock:
+                task = asyncio.create_task(self._run_window(event_id, update))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+                return await update(event_id, **kwargs)
+
+        # Status transition or an update which must not be delayed.
+        # Merge it with the pending state and execute immediately.
+
+        merged = self.pending.pop(event_id, {})
+        merged.update({k: v for k, v in kwargs.items() if v is not None})
+        if (window_lock := self.windows.get(event_id)) is None:
+            return await update(event_id, **merged)
+        async with window_lock:
+            return await update(event_id, **merged)
+
+    async def _run_window(self, event_id: str, update: UpdateFunction) -> None:
+        lock = self.windows[event_id]
+        attempts = 0
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                async with lock:
+                    merged = self.pending.pop(event_id, None)
+                    if merged is None:
+                        return
+                    try:
+                        await update(event_id, delayed=True, **merged)
+                    except Exception:
+                        attempts += 1
+                        if attempts >= MAX_FLUSH_ATTEMPTS:
+                            log_traceback(
+                                f"Unable to flush update of event {event_id}. "
+                                "Giving up."
+                            )
+                            continue
+                        log_traceback(f"Unable to flush update of event {event_id}")
+                        # Retry in the next window. Newer values take precedence
+                        merged.update(self.pending.get(event_id, {}))
+                        self.pending[event_id] = merged
+                    else:
+                        attempts = 0
+        finally:
+            self.windows.pop(event_id, None)
+            self.pending.pop(event_id, None)
+
+
+update_coalescer = UpdateCoalescer()
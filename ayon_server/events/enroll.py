@@ -1,6 +1,10 @@
+import time
+
+from nxtools import logging
+
 from ayon_server.events.eventstream import EventStream
 from ayon_server.exceptions import ConstraintViolationException
-from ayon_server.lib.postgres import Postgres
+from ayon_server.lib.postgres import Connection, Postgres
 from ayon_server.sqlfilter import Filter, build_filter
 from ayon_server.types import Field, OPModel
 from ayon_server.utils import hash_data
@@ -15,6 +19,103 @@ class EnrollResponseModel(OPModel):
     status: str = Field("pending")
 
 
+# (source_topics, is_pattern, target_topic, max_retries):
+#     (subscription_id, last_touch)
+_subscriptions: dict[tuple[tuple[str, ...], bool, str, int], tuple[int, float]] = {}
+
+# Interval in seconds in which the subscription usage timestamp is updated
+SUBSCRIPTION_TOUCH_INTERVAL = 600
+
+
+async def get_enroll_subscription(
+    source_topic: str | list[str],
+    target_topic: str,
+    max_retries: int = 3,
+) -> int:
+    """Return an id of the enroll subscription, create it if needed.
+
+    When a subscription is created, pending source events
+    (finished events without a finished target event) are collected.
+    From then on, they are maintained by the database trigger,
+    which uses `max_retries` to drop source events whose target
+    event will not be retried.
+    """
+
+    is_pattern = isinstance(source_topic, str)
+    source_topics = (source_topic,) if isinstance(source_topic, str) else source_topic
+    key = (tuple(sorted(source_topics)), is_pattern, target_topic, max_retries)
+
+    if (cached := _subscriptions.get(key)) is not None:
+        subscription_id, last_touch = cached
+        if time.time() - last_touch < SUBSCRIPTION_TOUCH_INTERVAL:
+            return subscription_id
+
+        res = await Postgres.fetch(
+            """
+            UPDATE enroll_subscriptions SET last_used_at = NOW()
+            WHERE id = $1 RETURNING id
+            """,
+            subscription_id,
+        )
+        if res:
+            _subscriptions[key] = (subscription_id, time.time())
+            return subscription_id
+
+    res = await Postgres.fetch(
+        """
+        INSERT INTO enroll_subscriptions
+            (source_topics, is_pattern, target_topic, max_retries)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (source_topics, is_pattern, target_topic)
+        DO UPDATE SET last_used_at = NOW(), max_retries = EXCLUDED.max_retries
+        RETURNING id, (xmax = 0) AS created
+        """,
+        list(key[0]),
+        is_pattern,
+        target_topic,
+        max_retries,
+    )
+    subscription_id = res[0]["id"]
+
+    if res[0]["created"]:
+        # The subscription is committed at this point, so every source event
+        # finished from now on is queued by the trigger. Collect the older ones.
+        topic_cond = "topic LIKE $2" if is_pattern else "topic = ANY($2)"
+        start_time = time.monotonic()
+        status = await Postgres.execute(
+            f"""
+            INSERT INTO enroll_pending (subscription_id, source_id, created_at)
+            SELECT $1, e.id, e.created_at
+            FROM events e
+            WHERE {topic_cond.replace("topic", "e.topic")}
+            AND e.status = 'finished'
+            AND NOT EXISTS (
+                SELECT 1 FROM events t
+                WHERE t.depends_on = e.id
+                AND t.topic = $3
+                AND (
+                    t.status = 'finished'
+                    OR (t.status = 'failed' AND t.retries > $4)
+                )
+            )
+            ON CONFLICT DO NOTHING
+            """,
+            subscription_id,
+            source_topic,
+            target_topic,
+            max_retries,
+            timeout=3600,
+        )
+        logging.info(
+            f"Created enroll subscription {source_topic} -> {target_topic}: "
+            f"{status.split()[-1]} pending events collected "
+            f"in {time.monotonic() - start_time:.2f}s"
+        )
+
+    _subscriptions[key] = (subscription_id, time.time())
+    return subscription_id
+
+
 async def enroll_job(
     source_topic: str | list[str],
     target_topic: str,
@@ -26,6 +127,13 @@ async def enroll_job(
     filter: Filter | None = None,
     max_retries: int = 3,
 ) -> EnrollResponseModel | None:
+    """Claim the oldest unprocessed source event and create its target event.
+
+    Candidates are read from the pending work table of the subscription
+    and locked for the duration of the claim. Concurrent workers skip
+    locked candidates, so two workers never race on the same source event.
+    Sequential enrollment waits for the lock instead, to preserve the order.
+    """
     if description is None:
         description = f"Convert from {source_topic} to {target_topic}"
 
@@ -35,60 +143,89 @@ async def enroll_job(
     if user_name is None:
         sender = "server"
 
+    subscription_id = await get_enroll_subscription(
+        source_topic,
+        target_topic,
+        max_retries,
+    )
+
     filter_query = build_filter(filter, table_prefix="source_events") or "TRUE"
 
     # Iterate thru unprocessed source events starting
     # by the oldest one
 
-    if isinstance(source_topic, str):
-        topic_cond = "topic LIKE $1"
-    else:
-        topic_cond = "topic = ANY($1)"
-
     query = f"""
-        WITH excluded_events AS (
-            SELECT depends_on
-            FROM events
-            WHERE topic = $2
-            AND (
-                status = 'finished'
-                OR (status = 'failed' AND retries > $3)
-            )
-        ),
-        source_events AS (
-            SELECT *
-            FROM events
-            WHERE {topic_cond}
-            AND status = 'finished'
-            AND id NOT IN (SELECT depends_on FROM excluded_events)
-        )
-
         SELECT
-            source_events.id AS source_id,
+            p.source_id AS source_id,
             target_events.status AS target_status,
             target_events.sender AS target_sender,
             target_events.retries AS target_retries,
             target_events.hash AS target_hash,
-            target_events.retries AS target_retries,
             target_events.id AS target_id
         FROM
-            source_events
+            enroll_pending p
+        INNER JOIN events AS source_events
+        ON source_events.id = p.source_id
         LEFT JOIN events AS target_events
         ON
-            target_events.depends_on = source_events.id
+            target_events.depends_on = p.source_id
             AND target_events.topic = $2
         WHERE
-            {filter_query}
+            p.subscription_id = $1
+            AND source_events.status = 'finished'
+            AND (
+                target_events.id IS NULL
+                OR NOT (
+                    target_events.status = 'finished'
+                    OR (target_events.status = 'failed' AND target_events.retries > $3)
+                )
+            )
+            AND {filter_query}
         ORDER BY
-            source_events.created_at ASC
+            p.created_at ASC
         LIMIT 1000  -- Pool of 1000 events should be enough
+        FOR UPDATE OF p {"" if sequential else "SKIP LOCKED"}
+    """
+
+    async with Postgres.acquire() as conn, conn.transaction():
+        return await _claim(
+            conn,
+            query,
+            subscription_id,
+            target_topic,
+            sender=sender,
+            user_name=user_name,
+            description=description,
+            sequential=sequential,
+            max_retries=max_retries,
+        )
+
+
+async def _claim(
+    conn: Connection,
+    query: str,
+    subscription_id: int,
+    target_topic: str,
+    *,
+    sender: str,
+    user_name: str | None,
+    description: str,
+    sequential: bool,
+    max_retries: int,
+) -> EnrollResponseModel | None:
+    """Walk locked candidates and create or reuse a target event.
+
+    Target events are created and updated outside the claiming
+    transaction, so they are visible to other workers before
+    the candidates are unlocked.
     """
 
     async for row in Postgres.iterate(
         query,
-        source_topic,
+        subscription_id,
         target_topic,
         max_retries,
+        transaction=conn,
     ):
         # Check if target event already exists
         if row["target_status"] is not None:
@@ -1,14 +1,17 @@
+import asyncio
 from datetime import datetime
 from typing import Any, Awaitable, Callable, Type
 
 from nxtools import logging
 
+from ayon_server.config import ayonconfig
 from ayon_server.exceptions import ConstraintViolationException, NotFoundException
 from ayon_server.lib.postgres import Postgres
 from ayon_server.lib.redis import Redis
 from ayon_server.utils import SQLTool, json_dumps
 
 from .base import EventModel, EventStatus, create_id
+from .coalescing import update_coalescer
 
 HandlerType = Callable[[EventModel], Awaitable[None]]
 
@@ -108,29 +111,7 @@ class EventStream:
                     "Event with same hash already exists",
                 ) from e
 
-        depends_on = (
-            str(event.depends_on).replace("-", "") if event.depends_on else None
-        )
-        await Redis.publish(
-            json_dumps(
-                {
-                    "id": str(event.id).replace("-", ""),
-                    "topic": event.topic,
-                    "project": event.project,
-                    "user": event.user,
-                    "dependsOn": depends_on,
-                    "description": event.description,
-                    "summary": event.summary,
-                    "status": event.status,
-                    "progress": progress,
-                    "sender": sender,
-                    "store": store,  # useful to allow querying details
-                    "recipients": recipients,
-                    "createdAt": event.created_at,
-                    "updatedAt": event.updated_at,
-                }
-            )
-        )
+        await Redis.publish(cls._message(event, progress, store, recipients))
 
         handlers = cls.hooks.get(event.topic, [])
         for handler in handlers:
@@ -141,6 +122,151 @@ class EventStream:
 
         return event.id
 
+    @classmethod
+    def _message(
+        cls,
+        event: EventModel,
+        progress: float,
+        store: bool,
+        recipients: list[str] | None,
+    ) -> str:
+        """Serialize a newly dispatched event for the websocket subscribers"""
+        depends_on = (
+            str(event.depends_on).replace("-", "") if event.depends_on else None
+        )
+        return json_dumps(
+            {
+                "id": str(event.id).replace("-", ""),
+                "topic": event.topic,
+                "project": event.project,
+                "user": event.user,
+                "dependsOn": depends_on,
+                "description": event.description,
+                "summary": event.summary,
+                "status": event.status,
+                "progress": progress,
+                "sender": event.sender,
+                "store": store,  # useful to allow querying details
+                "recipients": recipients,
+                "createdAt": event.created_at,
+                "updatedAt": event.updated_at,
+            }
+        )
+
+    @classmethod
+    async def dispatch_many(
+        cls,
+        events: list[dict[str, Any]],
+        *,
+        sender: str | None = None,
+        user: str | None = None,
+        hook_concurrency: int = 8,
+    ) -> list[str]:
+        """Dispatch multiple events at once.
+
+        Each item contains keyword arguments of `dispatch` (including
+        the topic). `sender` and `user` are used for items which don't
+        specify them.
+
+        Stored events are inserted in batches using multi-row inserts,
+        all events are published in a single Redis pipeline and hooks
+        run with bounded concurrency.
+
+        Unlike `dispatch`, events with an already existing hash are
+        skipped instead of raising an exception.
+
+        Returns the list of dispatched event ids.
+        """
+
+        dispatched: list[tuple[EventModel, float, bool, list[str] | None]] = []
+        to_store: list[EventModel] = []
+
+        for item in events:
+            finished = item.get("finished", True)
+            store = item.get("store", True)
+            event_id = create_id()
+            event = EventModel(
+                id=event_id,
+                hash=item.get("hash") or event_id,
+                sender=item.get("sender", sender),
+                topic=item["topic"],
+                project=item.get("project"),
+                user=item.get("user", user),
+                depends_on=item.get("depends_on"),
+                status="finished" if finished else "pending",
+                description=item.get("description") or "",
+                summary=item.get("summary") or {},
+                payload=item.get("payload") or {},
+                retries=0,
+            )
+            progress = 100 if finished else 0.0
+            dispatched.append((event, progress, store, item.get("recipients")))
+            if store:
+                to_store.append(event)
+
+        skipped: set[str] = set()
+        for i in range(0, len(to_store), 1000):
+            batch = to_store[i : i + 1000]
+            try:
+                res = await Postgres.fetch(
+                    """
+                    INSERT INTO events (
+                        id, hash, sender, topic, project_name, user_name,
+                        depends_on, status, description, summary, payload
+                    )
+                    SELECT * FROM unnest(
+                        $1::UUID[], $2::VARCHAR[], $3::VARCHAR[], $4::VARCHAR[],
+                        $5::VARCHAR[], $6::VARCHAR[], $7::UUID[], $8::VARCHAR[],
+                        $9::TEXT[], $10::JSONB[], $11::JSONB[]
+                    )
+                    ON CONFLICT DO NOTHING
+                    RETURNING id
+                    """,
+                    [e.id for e in batch],
+                    [e.hash for e in batch],
+                    [e.sender for e in batch],
+                    [e.topic for e in batch],
+                    [e.project for e in batch],
+                    [e.user for e in batch],
+                    [e.depends_on for e in batch],
+                    [e.status for e in batch],
+                    [e.description for e in batch],
+                    [e.summary for e in batch],
+                    [e.payload for e in batch],
+                )
+            except Postgres.ForeignKeyViolationError as e:
+                raise ConstraintViolationException(
+                    "Event depends on non-existing event",
+                ) from e
+
+            inserted = {str(row["id"]).replace("-", "") for row in res}
+            skipped.update(e.id for e in batch if e.id not in inserted)
+
+        if skipped:
+            logging.debug(f"Skipped {len(skipped)} events with duplicate hash")
+            dispatched = [d for d in dispatched if d[0].id not in skipped]
+
+        await Redis.publish_many([cls._message(*d) for d in dispatched])
+
+        semaphore = asyncio.Semaphore(hook_concurrency)
+
+        async def run_hook(handler: HandlerType, event: EventModel) -> None:
+            async with semaphore:
+                try:
+                    await handler(event)
+                except Exception as e:
+                    logging.debug(f"Error in event handler: {e}")
+
+        await asyncio.gather(
+            *[
+                run_hook(handler, event)
+                for event, *_ in dispatched
+                for handler in cls.hooks.get(event.topic, [])
+            ]
+        )
+
+        return [event.id for event, *_ in dispatched]
+
     @classmethod
     async def update(
         cls,
@@ -157,7 +283,79 @@ class EventStream:
         store: bool = True,
         retries: int | None = None,
         recipients: list[str] | None = None,
+        coalesce: bool = False,
+    ) -> bool:
+        """Update the event and notify subscribers.
+
+        coalesce:
+            merge progress updates of the event arriving within
+            `event_update_coalescing_window` and store/publish only
+            the latest state. Status transitions are never delayed.
+            Returns True if the update was delayed.
+        """
+
+        if ayonconfig.event_update_coalescing_window > 0 and (
+            coalesce or update_coalescer.is_active(event_id)
+        ):
+            # Updates of events with an open window must go through
+            # the coalescer as well, so they are not overwritten
+            # by a delayed update
+            return await update_coalescer.submit(
+                event_id,
+                cls._update,
+                coalesce=coalesce,
+                sender=sender,
+                project=project,
+                user=user,
+                status=status,
+                description=description,
+                summary=summary,
+                payload=payload,
+                progress=progress,
+                store=store,
+                retries=retries,
+                recipients=recipients,
+            )
+
+        return await cls._update(
+            event_id,
+            sender=sender,
+            project=project,
+            user=user,
+            status=status,
+            description=description,
+            summary=summary,
+            payload=payload,
+            progress=progress,
+            store=store,
+            retries=retries,
+            recipients=recipients,
+        )
+
+    @classmethod
+    async def _update(
+        cls,
+        event_id: str,
+        *,
+        sender: str | None = None,
+        project: str | None = None,
+        user: str | None = None,
+        status: EventStatus | None = None,
+        description: str | None = None,
+        summary: dict[str, Any] | None = None,
+        payload: dict[str, Any] | None = None,
+        progress: float | None = None,
+        store: bool = True,
+        retries: int | None = None,
+        recipients: list[str] | None = None,
+        delayed: bool = False,
     ) -> bool:
+        """Store and publish the update.
+
+        Delayed (coalesced) updates are applied only to events
+        which have not reached a final status yet, so they never
+        overwrite a status transition executed in the meantime.
+        """
         new_data: dict[str, Any] = {"updated_at": datetime.now()}
 
         if sender is not None:
@@ -177,8 +375,17 @@ class EventStream:
         if user is not None:
             new_data["user_name"] = user
 
+        # Delayed updates must not overwrite a final status
+        status_condition = (
+            " AND status IN ('pending', 'in_progress')" if delayed else ""
+        )
+
         if store:
-            query = SQLTool.update("events", f"WHERE id = '{event_id}'", **new_data)
+            query = SQLTool.update(
+                "events",
+                f"WHERE id = '{event_id}'{status_condition}",
+                **new_data,
+            )
 
             query[0] = (
                 query[0]
@@ -199,7 +406,7 @@ class EventStream:
             )
 
         else:
-            query = ["SELECT * FROM events WHERE id=$1", event_id]
+            query = [f"SELECT * FROM events WHERE id = $1{status_condition}", event_id]
 
         result = await Postgres.fetch(*query)
         for row in result:
@@ -0,0 +1,93 @@
+"""Registry of enroll requests waiting for new jobs.
+
+Long-polling enroll requests register a waiter for their source topics.
+Every message published by the event stream is passed to `notify`
+(by the messaging worker, which already receives all of them in every
+server process), and waiters whose job may have become available are
+woken up to query the database again.
+"""
+
+import asyncio
+import re
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+def _compile(source_topic: str | list[str]) -> re.Pattern[str]:
+    """Convert a source topic specification to a regular expression.
+
+    A single topic is a LIKE pattern, a list of topics is matched exactly
+    (the same way enroll_job treats them).
+    """
+    if isinstance(source_topic, str):
+        parts = []
+        for char in source_topic:
+            if char == "%":
+                parts.append(".*")
+            elif char == "_":
+                parts.append(".")
+            else:
+                parts.append(re.escape(char))
+        return re.compile("".join(parts))
+    return re.compile("|".join(re.escape(topic) for topic in source_topic))
+
+
+class Waiter:
+    def __init__(self, source_topic: str | list[str], target_topic: str) -> None:
+        self.source_pattern = _compile(source_topic)
+        self.target_topic = target_topic
+        self.event = asyncio.Event()
+
+    def matches(self, message: dict[str, Any]) -> bool:
+        topic = message.get("topic")
+        status = message.get("status")
+        if not isinstance(topic, str):
+            return False
+        if status == "finished" and self.source_pattern.fullmatch(topic):
+            # A new source event is ready
+            return True
+        if topic == self.target_topic and status in ("failed", "restarted"):
+            # A job may be retried
+            return True
+        return False
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until notified. Return False on timeout"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class EnrollWaiters:
+    def __init__(self) -> None:
+        self.waiters: set[Waiter] = set()
+
+    @contextmanager
+    def watch(
+        self,
+        source_topic: str | list[str],
+        target_topic: str,
+    ) -> Iterator[Waiter]:
+        """Register a waiter for the duration of the context.
+
+        Clear the waiter's event before querying the database,
+        so no notification between the query and the wait is lost.
+        """
+        waiter = Waiter(source_topic, target_topic)
+        self.waiters.add(waiter)
+        try:
+            yield waiter
+        finally:
+            self.waiters.discard(waiter)
+
+    def notify(self, message: dict[str, Any]) -> None:
+        if not self.waiters:
+            return
+        for waiter in self.waiters:
+            if waiter.matches(message):
+                waiter.event.set()
+
+
+enroll_waiters = EnrollWaiters()
@@ -11,6 +11,11 @@ from strawberry.types import ExecutionContext
 
 from ayon_server.api.dependencies import CurrentUser
 from ayon_server.exceptions import AyonException
+from ayon_server.graphql.cache import (
+    PersistedQueryRouter,
+    PersistedQuerySchema,
+    QueryCacheExtension,
+)
 from ayon_server.graphql.connections import (
     EventsConnection,
     InboxConnection,
@@ -154,7 +159,7 @@ class Query:
         ]
 
 
-class AyonSchema(strawberry.Schema):
+class AyonSchema(PersistedQuerySchema):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -181,8 +186,8 @@ class AyonSchema(strawberry.Schema):
             logging.error(f"GraphQL: {fname}:{line_no} ({path}) {message}")
 
 
-router: GraphQLRouter[Any, Any] = GraphQLRouter(
-    schema=AyonSchema(query=Query),
+router: GraphQLRouter[Any, Any] = PersistedQueryRouter(
+    schema=AyonSchema(query=Query, extensions=[QueryCacheExtension]),
     graphiql=False,
     context_getter=graphql_get_context,
 )
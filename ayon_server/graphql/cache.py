@@ -0,0 +1,268 @@
+"""Persisted queries and caches of parsed GraphQL documents.
+
+Clients (pipeline tools in particular) send the same documents over
+and over. Parsing and validating a large document is a significant
+part of the request time, so the results are cached in each server
+process, keyed by the document itself:
+
+- parsed documents (AST)
+- validation results
+- selected fields of each resolver (see FieldInfo)
+
+Persisted queries follow the automatic persisted queries protocol:
+a client sends `extensions.persistedQuery.sha256Hash` along with the
+query to register it, and subsequently only the hash. Registered
+documents are stored in Redis, so they are shared between the server
+processes. If the hash is not known, the request fails with
+`PersistedQueryNotFound` and the client is expected to send the full
+query again.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Iterator, Mapping, TypeVar
+
+import strawberry
+from graphql import DocumentNode, GraphQLError, parse, validate
+from strawberry.extensions import SchemaExtension
+from strawberry.fastapi import GraphQLRouter
+from strawberry.types import ExecutionResult
+
+from ayon_server.config import ayonconfig
+from ayon_server.lib.redis import Redis
+from ayon_server.utils import hash_data, json_loads
+
+PERSISTED_QUERY_NS = "graphql-persisted"
+PERSISTED_QUERY_TTL = 3600 * 24 * 30
+
+# Persisted query hash is passed from the HTTP layer to the schema
+# as the first line of the query (a GraphQL comment)
+PERSISTED_QUERY_MARKER = "# persisted-query "
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class QueryCache(Generic[K, V]):
+    """Bounded in-process LRU cache with hit/miss counters"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.data: OrderedDict[K, V] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> V | None:
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        if ayonconfig.graphql_cache_size <= 0:
+            return
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > ayonconfig.graphql_cache_size:
+            self.data.popitem(last=False)
+
+
+parse_cache: QueryCache[str, DocumentNode] = QueryCache("parse")
+# Only successful validations are cached. Documents which failed
+# validation are validated again, so errors are never shared.
+validation_cache: QueryCache[str, bool] = QueryCache("validation")
+field_cache: QueryCache[tuple[str, str, tuple[str, ...]], list[str]] = QueryCache(
+    "fields"
+)
+persisted_query_cache: QueryCache[str, str] = QueryCache("persisted")
+
+graphql_caches: list[QueryCache[Any, Any]] = [
+    parse_cache,
+    validation_cache,
+    field_cache,
+    persisted_query_cache,
+]
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+#
+# Persisted queries
+#
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, message: str, code: str) -> None:
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def mark_persisted_query(data: Any) -> Any:
+    """Pass the persisted query hash of the request to the schema.
+
+    Returns the request data with the hash prepended to the query
+    as a comment, so it survives the request parsing.
+    """
+    if not isinstance(data, dict):
+        return data
+    extensions = data.get("extensions")
+    if isinstance(extensions, str):
+        try:
+            extensions = json_loads(extensions)
+        except Exception:
+            return data
+    if not isinstance(extensions, dict):
+        return data
+    persisted = extensions.get("persistedQuery")
+    if not isinstance(persisted, dict):
+        return data
+    if not (sha256_hash := persisted.get("sha256Hash")):
+        return data
+    query = data.get("query") or ""
+    return {**data, "query": f"{PERSISTED_QUERY_MARKER}{sha256_hash}\n{query}"}
+
+
+async def resolve_persisted_query(query: str) -> str:
+    """Return the query with the persisted query marker resolved.
+
+    If the query contains only the hash, the registered document
+    is returned. If it contains the document as well, the document
+    is registered.
+
+    Raises PersistedQueryError if the document is not registered
+    or it does not match the hash.
+    """
+    if not query.startswith(PERSISTED_QUERY_MARKER):
+        return query
+
+    header, _, document = query.partition("\n")
+    sha256_hash = header.removeprefix(PERSISTED_QUERY_MARKER).strip()
+
+    if document.strip():
+        if query_hash(document) != sha256_hash:
+            raise PersistedQueryError(
+                "provided sha does not match query",
+                "PERSISTED_QUERY_HASH_MISMATCH",
+            )
+        if persisted_query_cache.get(sha256_hash) is None:
+            await Redis.set(
+                PERSISTED_QUERY_NS,
+                sha256_hash,
+                document,
+                ttl=PERSISTED_QUERY_TTL,
+            )
+            persisted_query_cache.put(sha256_hash, document)
+        return document
+
+    if (cached := persisted_query_cache.get(sha256_hash)) is not None:
+        return cached
+
+    stored = await Redis.get(PERSISTED_QUERY_NS, sha256_hash)
+    if stored is None:
+        raise PersistedQueryError(
+            "PersistedQueryNotFound",
+            "PERSISTED_QUERY_NOT_FOUND",
+        )
+    document = stored.decode("utf-8") if isinstance(stored, bytes) else stored
+    persisted_query_cache.put(sha256_hash, document)
+    return document
+
+
+class PersistedQuerySchema(strawberry.Schema):
+    """Schema resolving persisted queries before the query is parsed"""
+
+    async def execute(self, query: str | None, *args, **kwargs) -> ExecutionResult:
+        if query:
+            try:
+                query = await resolve_persisted_query(query)
+            except PersistedQueryError as e:
+                error = GraphQLError(e.message, extensions={"code": e.code})
+                return ExecutionResult(data=None, errors=[error])
+        return await super().execute(query, *args, **kwargs)
+
+
+class PersistedQueryRouter(GraphQLRouter[Any, Any]):
+    """Router passing the persisted query hash of requests to the schema.
+
+    Strawberry drops the request extensions when it parses the request,
+    so the hash is added to the query while the request body (or the
+    query parameters of a GET request) is decoded.
+    """
+
+    def parse_json(self, data: str | bytes) -> Any:
+        return mark_persisted_query(super().parse_json(data))
+
+    def parse_query_params(
+        self,
+        params: Mapping[str, str | list[str] | None],
+    ) -> dict[str, Any]:
+        return mark_persisted_query(super().parse_query_params(params))
+
+
+#
+# Schema extension
+#
+
+
+class QueryCacheExtension(SchemaExtension):
+    """Reuse parsed and validated documents of repeated queries.
+
+    Also stores a key of the document in the context, which is used
+    to cache selected fields of resolvers (see FieldInfo).
+    """
+
+    def on_operation(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        query = execution_context.query or ""
+        document_key = query_hash(query)
+        # A document may contain several operations selecting
+        # different fields under the same path
+        if operation_name := execution_context.operation_name:
+            document_key = f"{document_key}:{operation_name}"
+        # Selected fields depend on variables when directives are used
+        if "@include" in query or "@skip" in query:
+            variables = execution_context.variables or {}
+            document_key = hash_data([document_key, variables])
+        if isinstance(execution_context.context, dict):
+            execution_context.context["document_key"] = document_key
+        yield
+
+    def on_parse(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        query = execution_context.query
+        if query:
+            document = parse_cache.get(query)
+            if document is None:
+                # Let syntax errors be handled by the schema
+                try:
+                    document = parse(query)
+                except GraphQLError:
+                    yield
+                    return
+                parse_cache.put(query, document)
+            execution_context.graphql_document = document
+        yield
+
+    def on_validate(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        query = execution_context.query
+        document = execution_context.graphql_document
+        if query and document is not None:
+            if validation_cache.get(query):
+                errors: list[GraphQLError] = []
+            else:
+                errors = validate(
+                    execution_context.schema._schema,
+                    document,
+                    execution_context.validation_rules,
+                )
+                if not errors:
+                    validation_cache.put(query, True)
+            execution_context.errors = errors
+        yield
@@ -7,6 +7,7 @@ need for access control.
 from typing import Any, NewType
 
 from ayon_server.exceptions import AyonException
+from ayon_server.helpers.commit_scheduler import ensure_committed
 from ayon_server.lib.postgres import Postgres
 from ayon_server.utils import SQLTool
 
@@ -29,6 +30,7 @@ async def folder_loader(keys: list[KeyType]) -> list[dict[str, Any] | None]:
 
     result_dict: dict[KeyType, Any] = {k: None for k in keys}
     project_name = get_project_name(keys)
+    await ensure_committed(project_name)
 
     query = f"""
         SELECT
@@ -101,6 +103,7 @@ async def task_loader(keys: list[KeyType]) -> list[dict[str, Any] | None]:
 
     result_dict = {k: None for k in keys}
     project_name = get_project_name(keys)
+    await ensure_committed(project_name)
 
     query = f"""
         SELECT
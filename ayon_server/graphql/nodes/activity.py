@@ -182,8 +182,9 @@ def activity_from_record(
     project_name is populated from the record.
     """
 
-    record = dict(record)
-    record.pop("cursor", None)
+    record = {
+        k: v for k, v in record.items() if k != "cursor" and not k.startswith("cursor_")
+    }
 
     project_name = record.pop("project_name", project_name)
     assert project_name, "project_name is required"
@@ -143,4 +143,6 @@ async def get_activities(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
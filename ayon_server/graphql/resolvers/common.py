@@ -4,13 +4,20 @@ from typing import Annotated, Any, Callable, Generator, TypeVar
 import strawberry
 from strawberry.arguments import StrawberryArgumentAnnotation
 
-from ayon_server.access.utils import folder_access_list
+from ayon_server.access.folder_access import FolderAccessSet
+from ayon_server.access.utils import folder_access_set
 from ayon_server.exceptions import ForbiddenException
+from ayon_server.graphql.cache import field_cache
 from ayon_server.graphql.types import Info, PageInfo
+from ayon_server.helpers.keyset import (
+    DEFAULT_PAGE_SIZE,
+    encode_cursor,
+)
+from ayon_server.helpers.keyset import (
+    create_pagination as create_pagination,
+)
 from ayon_server.lib.postgres import Postgres
 
-DEFAULT_PAGE_SIZE = 100
-
 
 @strawberry.enum
 class HasLinksFilter(Enum):
@@ -46,6 +53,16 @@ ARGIds = Annotated[list[str] | None, argdesc("List of ids to be returned")]
 ARGHasLinks = Annotated[HasLinksFilter | None, argdesc("Filter by links presence")]
 
 
+def _path_key(path: Any) -> str:
+    # Response path of the field without list indices
+    keys = []
+    while path is not None:
+        if not isinstance(path.key, int):
+            keys.append(str(path.key))
+        path = path.prev
+    return ".".join(reversed(keys))
+
+
 class FieldInfo:
     """Info object parser.
 
@@ -64,6 +81,21 @@ class FieldInfo:
             self.roots = []
         else:
             self.roots = roots
+        self.fields: list[str] = []
+
+        # Selected fields of a resolver only depend on the document
+        # (see QueryCacheExtension), so they are parsed only once
+        # for repeated queries
+        cache_key = None
+        if isinstance(info.context, dict) and "document_key" in info.context:
+            cache_key = (
+                info.context["document_key"],
+                _path_key(info.path),
+                tuple(self.roots),
+            )
+            if (fields := field_cache.get(cache_key)) is not None:
+                self.fields = fields
+                return
 
         def parse_fields(
             fields: list[Any],
@@ -76,16 +108,20 @@ class FieldInfo:
                 yield fname
                 yield from parse_fields(field.selections, fname)
 
-        self.fields: list[str] = []
+        seen: set[str] = set()
         for field in parse_fields(info.selected_fields):
             for root in self.roots:
                 if field.startswith(root + "."):
                     field = field.removeprefix(root + ".")
                     break
-            if field in self.fields:
+            if field in seen:
                 continue
+            seen.add(field)
             self.fields.append(field)
 
+        if cache_key is not None:
+            field_cache.put(cache_key, self.fields)
+
     def __iter__(self):
         return self.fields.__iter__()
 
@@ -106,63 +142,26 @@ class FieldInfo:
         return False
 
 
-async def create_folder_access_list(root, info) -> list[str] | None:
+async def create_folder_access_set(root, info) -> FolderAccessSet | None:
     user = info.context["user"]
     project_name = root.project_name
     if root.__class__.__name__ != "ProjectNode":
         return None
-    return await folder_access_list(user, project_name)
-
-
-def create_pagination(
-    order_by: list[str],
-    first: int | None = None,
-    after: str | None = None,
-    last: int | None = None,
-    before: str | None = None,
-    need_cursor: bool = True,
-) -> tuple[str, list[str], str]:
-    """
-    Create pagination query and arguments.
-    returns a tuple of
-      - pagination query (ORDER BY... part of the query)
-      - additional conditions (WHERE... part of the query)
-      - cursor (to add to SELECT... part of the query)
-    """
-    pagination = ""
-    sql_conditions = []
+    return await folder_access_set(user, project_name)
 
-    assert order_by, "Order by must not be empty"
 
-    cursor: str  # put to SELECT clause (should be 'SOMETHING as cursor')
-
-    if len(order_by) == 1 or not need_cursor:
-        cursor = f"{order_by[0]}"
-    else:
-        ccols = [f"{col}::text" for col in order_by]
-        cursor = f"({'||'.join(ccols)})"
-
-    if not (last or first):
-        first = 100
-
-    if after:
-        curval = after
-
-    elif before:
-        curval = before
-
-    if first:
-        pagination += f"ORDER BY cursor ASC LIMIT {first}"
-        if after:
-            sql_conditions.append(f"{cursor} > '{curval}'")
-    elif last:
-        pagination += f"ORDER BY cursor DESC LIMIT {last}"
-        if before:
-            sql_conditions.append(f"{cursor} < '{curval}'")
-    return pagination, sql_conditions, f"{cursor} AS cursor"
+R = TypeVar("R")
 
 
-R = TypeVar("R")
+def _record_cursor(record) -> str | None:
+    if "cursor_0" in record:
+        values = []
+        i = 0
+        while (key := f"cursor_{i}") in record:
+            values.append(record[key])
+            i += 1
+        return encode_cursor(values)
+    return record.get("cursor")
 
 
 async def resolve(
@@ -174,8 +173,16 @@ async def resolve(
     first: int | None = None,
     last: int | None = None,
     context: dict[str, Any] | None = None,
+    after: str | None = None,
+    before: str | None = None,
 ) -> R:
-    """Return a connection object from a query."""
+    """Return a connection object from a query.
+
+    The query may return one row more than requested (see
+    `create_pagination`), which is used to detect further pages.
+    Pass `after` and `before` arguments to report previous
+    (or next, when paginating backwards) pages.
+    """
 
     if first is not None:
         count = first
@@ -185,38 +192,31 @@ async def resolve(
         count = first = DEFAULT_PAGE_SIZE
 
     edges: list[Any] = []
+    row_count = 0
     async for record in Postgres.iterate(query):
+        row_count += 1
+        if count and row_count > count:
+            break
         try:
             node = node_type.from_record(project_name, record, context=context)
         except ForbiddenException:
             continue
-        cursor = record["cursor"]
-        edges.append(edge_type(node=node, cursor=cursor))
-        if count and count == len(edges):
-            break
+        edges.append(edge_type(node=node, cursor=_record_cursor(record)))
 
-    has_next_page = False
-    has_previous_page = False
-    start_cursor = None
-    end_cursor = None
+    has_more = bool(count) and row_count > count
 
     if first:
-        has_next_page = len(edges) >= first
-        has_previous_page = False  # TODO
-        start_cursor = edges[0].cursor if edges else None
-        end_cursor = edges[-1].cursor if edges else None
-    elif last:
-        has_next_page = False  # TODO
-        has_previous_page = len(edges) >= last
-        start_cursor = edges[0].cursor if edges else None
-        end_cursor = edges[-1].cursor if edges else None
-        # edges.reverse()
+        has_next_page = has_more
+        has_previous_page = bool(after)
+    else:
+        has_next_page = bool(before)
+        has_previous_page = has_more
 
     page_info = PageInfo(
         has_next_page=has_next_page,
         has_previous_page=has_previous_page,
-        start_cursor=start_cursor,
-        end_cursor=end_cursor,
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
     )
 
     return connection_type(edges=edges, page_info=page_info)
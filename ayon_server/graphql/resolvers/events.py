@@ -146,4 +146,6 @@ async def get_events(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
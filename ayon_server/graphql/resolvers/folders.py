@@ -14,13 +14,14 @@ from ayon_server.graphql.resolvers.common import (
     AtrributeFilterInput,
     FieldInfo,
     argdesc,
-    create_folder_access_list,
+    create_folder_access_set,
     create_pagination,
     get_has_links_conds,
     resolve,
     sortdesc,
 )
 from ayon_server.graphql.types import Info
+from ayon_server.helpers.commit_scheduler import ensure_committed
 from ayon_server.types import (
     validate_name,
     validate_name_list,
@@ -94,6 +95,7 @@ async def get_folders(
 
     project_name = root.project_name
     fields = FieldInfo(info, ["folders.edges.node", "folder"])
+    await ensure_committed(project_name)
 
     #
     # SQL
@@ -139,12 +141,10 @@ async def get_folders(
         or fields.has_any("path", "parents")
     )
 
-    access_list = await create_folder_access_list(root, info)
+    access_set = await create_folder_access_set(root, info)
 
-    if access_list is not None:
-        sql_conditions.append(
-            f"hierarchy.path like ANY ('{{ {','.join(access_list)} }}')"
-        )
+    if access_set is not None:
+        sql_conditions.append(access_set.sql_condition("hierarchy.path"))
         use_hierarchy = True
 
     # We need to use children-join
@@ -381,6 +381,8 @@ async def get_folders(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from ayon_server.access.utils import folder_access_list
+from ayon_server.access.utils import folder_access_set
 from ayon_server.graphql.connections import ProductsConnection
 from ayon_server.graphql.edges import ProductEdge
 from ayon_server.graphql.nodes.product import ProductNode
@@ -19,6 +19,7 @@ from ayon_server.graphql.resolvers.common import (
     sortdesc,
 )
 from ayon_server.graphql.types import Info
+from ayon_server.helpers.commit_scheduler import ensure_committed
 from ayon_server.types import validate_name_list, validate_status_list
 from ayon_server.utils import SQLTool
 
@@ -65,6 +66,7 @@ async def get_products(
 
     project_name = root.project_name
     fields = FieldInfo(info, ["products.edges.node", "product"])
+    await ensure_committed(project_name)
 
     #
     # SQL
@@ -144,22 +146,20 @@ async def get_products(
         # TODO: sanitize
         sql_conditions.append(f"'/' || hierarchy.path ~ '{path_ex}'")
 
-    access_list = None
+    access_set = None
     if root.__class__.__name__ == "ProjectNode":
         # Selecting products directly from the project node,
         # so we need to check access rights
         user = info.context["user"]
-        access_list = await folder_access_list(user, project_name)
-        if access_list is not None:
-            sql_conditions.append(
-                f"hierarchy.path like ANY ('{{ {','.join(access_list)} }}')"
-            )
+        access_set = await folder_access_set(user, project_name)
+        if access_set is not None:
+            sql_conditions.append(access_set.sql_condition("hierarchy.path"))
 
     #
     # Join with folders if parent folder is requested
     #
 
-    if "folder" in fields or (access_list is not None) or (path_ex is not None):
+    if "folder" in fields or (access_set is not None) or (path_ex is not None):
         sql_columns.extend(
             [
                 "folders.id AS _folder_id",
@@ -216,7 +216,7 @@ async def get_products(
             or field.endswith("folder.parents")
             or (path_ex is not None)
             for field in fields
-        ) or (access_list is not None):
+        ) or (access_set is not None):
             sql_columns.append("hierarchy.path AS _folder_path")
             sql_joins.append(
                 f"""
@@ -292,6 +292,8 @@ async def get_products(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
@@ -94,6 +94,8 @@ async def get_projects(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
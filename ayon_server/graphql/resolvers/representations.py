@@ -11,7 +11,7 @@ from ayon_server.graphql.resolvers.common import (
     ARGIds,
     ARGLast,
     argdesc,
-    create_folder_access_list,
+    create_folder_access_set,
     create_pagination,
     get_has_links_conds,
     resolve,
@@ -106,11 +106,9 @@ async def get_representations(
     # ACL
     #
 
-    access_list = await create_folder_access_list(root, info)
-    if access_list is not None:
-        sql_conditions.append(
-            f"hierarchy.path like ANY ('{{ {','.join(access_list)} }}')"
-        )
+    access_set = await create_folder_access_set(root, info)
+    if access_set is not None:
+        sql_conditions.append(access_set.sql_condition("hierarchy.path"))
 
         sql_joins.extend(
             [
@@ -160,6 +158,8 @@ async def get_representations(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
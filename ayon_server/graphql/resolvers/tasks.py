@@ -14,13 +14,14 @@ from ayon_server.graphql.resolvers.common import (
     AtrributeFilterInput,
     FieldInfo,
     argdesc,
-    create_folder_access_list,
+    create_folder_access_set,
     create_pagination,
     get_has_links_conds,
     resolve,
     sortdesc,
 )
 from ayon_server.graphql.types import Info
+from ayon_server.helpers.commit_scheduler import ensure_committed
 from ayon_server.types import validate_name_list, validate_status_list
 from ayon_server.utils import SQLTool
 
@@ -77,6 +78,7 @@ async def get_tasks(
 
     project_name = root.project_name
     fields = FieldInfo(info, ["tasks.edges.node", "task"])
+    await ensure_committed(project_name)
 
     use_folder_query = False
 
@@ -216,11 +218,9 @@ async def get_tasks(
     if has_links is not None:
         sql_conditions.extend(get_has_links_conds(project_name, "tasks.id", has_links))
 
-    access_list = await create_folder_access_list(root, info)
-    if access_list is not None:
-        sql_conditions.append(
-            f"hierarchy.path like ANY ('{{ {','.join(access_list)} }}')"
-        )
+    access_set = await create_folder_access_set(root, info)
+    if access_set is not None:
+        sql_conditions.append(access_set.sql_condition("hierarchy.path"))
 
     if attributes:
         for attribute_input in attributes:
@@ -249,7 +249,7 @@ async def get_tasks(
     else:
         sql_columns.append("'{}'::JSONB as parent_folder_attrib")
 
-    if "folder" in fields or (access_list is not None) or use_folder_query:
+    if "folder" in fields or (access_set is not None) or use_folder_query:
         sql_columns.extend(
             [
                 "folders.id AS _folder_id",
@@ -279,7 +279,7 @@ async def get_tasks(
                 field.endswith("folder.path") or field.endswith("folder.parents")
                 for field in fields
             )
-            or (access_list is not None)
+            or (access_set is not None)
             or use_folder_query
         ):
             sql_columns.append("hierarchy.path AS _folder_path")
@@ -375,6 +375,8 @@ async def get_tasks(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
@@ -120,6 +120,8 @@ async def get_users(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
@@ -12,7 +12,7 @@ from ayon_server.graphql.resolvers.common import (
     ARGLast,
     FieldInfo,
     argdesc,
-    create_folder_access_list,
+    create_folder_access_set,
     create_pagination,
     get_has_links_conds,
     resolve,
@@ -191,11 +191,9 @@ async def get_versions(
             get_has_links_conds(project_name, "versions.id", has_links)
         )
 
-    access_list = await create_folder_access_list(root, info)
-    if access_list is not None:
-        sql_conditions.append(
-            f"hierarchy.path like ANY ('{{ {','.join(access_list)} }}')"
-        )
+    access_set = await create_folder_access_set(root, info)
+    if access_set is not None:
+        sql_conditions.append(access_set.sql_condition("hierarchy.path"))
 
         sql_joins.extend(
             [
@@ -268,6 +266,8 @@ async def get_versions(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
@@ -12,7 +12,7 @@ from ayon_server.graphql.resolvers.common import (
     ARGLast,
     FieldInfo,
     argdesc,
-    create_folder_access_list,
+    create_folder_access_set,
     create_pagination,
     get_has_links_conds,
     resolve,
@@ -119,11 +119,9 @@ async def get_workfiles(
         validate_name_list(tags)
         sql_conditions.append(f"tags @> {SQLTool.array(tags, curly=True)}")
 
-    access_list = await create_folder_access_list(root, info)
-    if access_list is not None:
-        sql_conditions.append(
-            f"hierarchy.path like ANY ('{{ {','.join(access_list)} }}')"
-        )
+    access_set = await create_folder_access_set(root, info)
+    if access_set is not None:
+        sql_conditions.append(access_set.sql_condition("hierarchy.path"))
 
         sql_joins.extend(
             [
@@ -190,6 +188,8 @@ async def get_workfiles(
         first,
         last,
         context=info.context,
+        after=after,
+        before=before,
     )
 
 
@@ -0,0 +1,160 @@
+"""Deferred commit of folder changes.
+
+Committing a folder change (rebuilding inherited attributes of its
+subtree and patching the folder list cache) is much more expensive than
+the change itself. When a client creates or updates many folders using
+separate requests, the same work is repeated for every request.
+
+When `commit_debounce_window` is set, folder commits are not executed
+immediately. Changed folders are queued in the public.pending_commits
+table (in the same transaction as the change, so the queue is never
+ahead or behind the data) and the commit scheduler worker processes
+the queue of a project once no new changes arrived for the debounce
+window (or when the oldest change waits longer than
+`commit_debounce_max_delay`).
+
+Readers of the derived data call `ensure_committed` before reading,
+which processes pending changes of the project immediately, so clients
+always read their own writes - regardless of the server process
+handling the request.
+"""
+
+import time
+from datetime import datetime
+from typing import Iterable
+
+from nxtools import logging
+
+from ayon_server.config import ayonconfig
+from ayon_server.helpers.hierarchy_cache import update_hierarchy_cache
+from ayon_server.helpers.inherited_attributes import rebuild_inherited_attributes
+from ayon_server.lib.postgres import Connection, Postgres
+from ayon_server.types import Field, OPModel
+
+
+class PendingCommitsModel(OPModel):
+    project_name: str = Field(..., title="Project name")
+    folder_count: int = Field(..., title="Number of changed folders")
+    oldest_change: datetime = Field(..., title="Time of the oldest pending change")
+    latest_change: datetime = Field(..., title="Time of the latest pending change")
+
+
+def is_commit_deferred() -> bool:
+    return ayonconfig.commit_debounce_window > 0
+
+
+async def schedule_folder_commit(
+    project_name: str,
+    folder_ids: Iterable[str],
+    transaction: Connection | None = None,
+) -> None:
+    """Queue folders changed in the transaction for the deferred commit"""
+
+    ids = list(folder_ids)
+    if not ids:
+        return
+
+    conn = transaction or Postgres
+    await conn.execute(
+        """
+        INSERT INTO pending_commits (project_name, folder_id)
+        SELECT $1, UNNEST($2::UUID[])
+        ON CONFLICT (project_name, folder_id)
+        DO UPDATE SET queued_at = NOW()
+        """,
+        project_name,
+        ids,
+    )
+
+
+async def flush_pending_commits(project_name: str) -> int:
+    """Commit all queued folder changes of the project.
+
+    The queue entries are removed in the same transaction the commit
+    runs in, so they are restored if the commit fails and concurrent
+    flushes never process the same change twice.
+
+    Returns the number of committed folders.
+    """
+
+    start_time = time.monotonic()
+    async with Postgres.acquire() as conn, conn.transaction():
+        res = await conn.fetch(
+            """
+            DELETE FROM pending_commits WHERE project_name = $1
+            RETURNING folder_id
+            """,
+            project_name,
+        )
+        folder_ids = [str(row["folder_id"]) for row in res]
+        if not folder_ids:
+            return 0
+
+        await rebuild_inherited_attributes(
+            project_name,
+            transaction=conn,
+            folder_ids=folder_ids,
+        )
+        await update_hierarchy_cache(
+            project_name,
+            folder_ids,
+            transaction=conn,
+        )
+
+    elapsed_time = time.monotonic() - start_time
+    logging.debug(
+        f"Committed {len(folder_ids)} changed folders "
+        f"in {project_name} in {elapsed_time:.2f} s"
+    )
+    return len(folder_ids)
+
+
+async def ensure_committed(project_name: str) -> None:
+    """Commit pending changes of the project before reading derived data"""
+
+    if not is_commit_deferred():
+        return
+
+    res = await Postgres.fetch(
+        "SELECT 1 FROM pending_commits WHERE project_name = $1 LIMIT 1",
+        project_name,
+    )
+    if res:
+        await flush_pending_commits(project_name)
+
+
+async def get_pending_commits(
+    due_only: bool = False,
+) -> list[PendingCommitsModel]:
+    """Return a summary of pending changes per project.
+
+    When `due_only` is set, return only projects, which are ready
+    to be committed (quiet for the debounce window or waiting longer
+    than the maximum delay).
+    """
+
+    condition = ""
+    if due_only:
+        condition = """
+            HAVING max(queued_at) < NOW() - make_interval(secs => $1)
+            OR min(first_queued_at) < NOW() - make_interval(secs => $2)
+        """
+    query = f"""
+        SELECT
+            project_name,
+            count(*) AS folder_count,
+            min(first_queued_at) AS oldest_change,
+            max(queued_at) AS latest_change
+        FROM pending_commits
+        GROUP BY project_name
+        {condition}
+        ORDER BY min(first_queued_at)
+    """
+    args: list[float] = []
+    if due_only:
+        args = [
+            ayonconfig.commit_debounce_window,
+            ayonconfig.commit_debounce_max_delay,
+        ]
+
+    return [PendingCommitsModel(**row) async for row in Postgres.iterate(query, *args)]
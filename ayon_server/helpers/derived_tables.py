@@ -0,0 +1,113 @@
+"""Consistency checks of trigger-maintained tables.
+
+Some project tables (hierarchy, version_list) are derived from other
+tables and maintained incrementally by triggers. The functions here
+compare such a table with the query defining its content and optionally
+repair the differences. They scan the whole project, so they are not
+meant to be used in the request path - they are a safety net for the
+periodic clean-up and maintenance scripts.
+"""
+
+import time
+
+from nxtools import logging
+
+from ayon_server.lib.postgres import Connection, Postgres
+
+
+async def _check_in_transaction(
+    project_name: str,
+    table: str,
+    key: str,
+    columns: list[str],
+    query: str,
+    repair: bool,
+    conn: Connection,
+) -> int:
+    # Returns rows whose stored values are wrong or missing and stored
+    # rows without a source row (key is NULL in the expected rows then)
+
+    differs = " OR ".join(f"e.{col} IS DISTINCT FROM s.{col}" for col in columns)
+    mismatched = await conn.fetch(
+        f"""
+        WITH expected AS ({query})
+        SELECT
+            COALESCE(e.{key}, s.{key}) AS key,
+            e.{key} IS NULL AS orphaned,
+            {", ".join(f"e.{col} AS {col}" for col in columns)}
+        FROM expected e
+        FULL OUTER JOIN project_{project_name}.{table} s
+        ON e.{key} = s.{key}
+        WHERE e.{key} IS NULL OR s.{key} IS NULL OR {differs}
+        """
+    )
+    if not mismatched or not repair:
+        return len(mismatched)
+
+    to_upsert = [
+        (row["key"], *(row[col] for col in columns))
+        for row in mismatched
+        if not row["orphaned"]
+    ]
+    to_delete = [row["key"] for row in mismatched if row["orphaned"]]
+
+    if to_upsert:
+        placeholders = ", ".join(f"${i + 1}" for i in range(len(columns) + 1))
+        await conn.executemany(
+            f"""
+            INSERT INTO project_{project_name}.{table}
+                ({key}, {", ".join(columns)})
+            VALUES ({placeholders})
+            ON CONFLICT ({key}) DO UPDATE
+            SET {", ".join(f"{col} = EXCLUDED.{col}" for col in columns)}
+            """,
+            to_upsert,
+        )
+
+    if to_delete:
+        await conn.execute(
+            f"DELETE FROM project_{project_name}.{table} WHERE {key} = ANY($1)",
+            to_delete,
+        )
+
+    return len(mismatched)
+
+
+async def check_derived_table(
+    project_name: str,
+    table: str,
+    key: str,
+    columns: list[str],
+    query: str,
+    repair: bool = False,
+    transaction: Connection | None = None,
+) -> int:
+    """Verify a trigger-maintained project table matches its defining query.
+
+    `query` selects the expected content of the table: the `key` column
+    and the value `columns`, named as in the table.
+
+    Returns the number of inconsistent rows found. When `repair` is set,
+    the inconsistent rows are fixed.
+    """
+
+    start_time = time.monotonic()
+
+    if transaction is None:
+        async with Postgres.acquire() as conn, conn.transaction():
+            count = await _check_in_transaction(
+                project_name, table, key, columns, query, repair, conn
+            )
+    else:
+        count = await _check_in_transaction(
+            project_name, table, key, columns, query, repair, transaction
+        )
+
+    elapsed_time = time.monotonic() - start_time
+    if count:
+        logging.warning(
+            f"Found {count} inconsistent {table} rows in {project_name}"
+            f"{' (repaired)' if repair else ''}"
+        )
+    logging.debug(f"Checked {table} of {project_name} in {elapsed_time:.2f} s")
+    return count
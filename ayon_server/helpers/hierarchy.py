@@ -0,0 +1,40 @@
+from ayon_server.helpers.derived_tables import check_derived_table
+from ayon_server.lib.postgres import Connection
+
+
+async def check_hierarchy(
+    project_name: str,
+    repair: bool = False,
+    transaction: Connection | None = None,
+) -> int:
+    """Verify the hierarchy table of the project is consistent with folders.
+
+    The hierarchy table is maintained incrementally by a trigger on the
+    folders table. This walks the whole project tree (see check_derived_table).
+
+    Returns the number of inconsistent rows found. When `repair` is set,
+    the inconsistent rows are fixed.
+    """
+
+    query = f"""
+        WITH RECURSIVE paths AS (
+            SELECT id, name::VARCHAR AS path
+            FROM project_{project_name}.folders
+            WHERE parent_id IS NULL
+            UNION ALL
+            SELECT f.id, p.path || '/' || f.name
+            FROM project_{project_name}.folders f
+            INNER JOIN paths p ON f.parent_id = p.id
+        )
+        SELECT id, path FROM paths
+    """
+
+    return await check_derived_table(
+        project_name,
+        "hierarchy",
+        "id",
+        ["path"],
+        query,
+        repair=repair,
+        transaction=transaction,
+    )
@@ -1,19 +1,126 @@
+"""Per-folder cache of the project folder list.
+
+The cache is stored in Redis as a hash (folder_id -> serialized
+FolderListItem) along with a version counter. Full rebuild is only
+needed when the cache is missing (expired or never built). Folder
+and task changes patch only the affected items and bump the version,
+which is used as a validator by the folder list endpoint.
+
+Patches are applied once the transaction of the change is committed,
+so they never contain uncommitted (possibly rolled back) data. They do
+not extend the cache lifetime, so any stale item is dropped when
+the cache expires at the latest.
+
+Folders of each patch are also recorded in a journal along with
+a serial number. A rebuild reads the serial before it reads
+the database and once the new cache is swapped in, it patches
+the folders changed since then again, so patches landing during
+the rebuild are not lost.
+
+Readers load the items along with the version they belong to
+(see load_hierarchy_cache), so a response never mixes items
+of different versions.
+"""
+
+import datetime
 import time
-from typing import Any
+from typing import Any, Iterable
 
 from nxtools import logging
 
+from ayon_server.exceptions import AyonException
 from ayon_server.lib.postgres import Connection, Postgres
 from ayon_server.lib.redis import Redis
-from ayon_server.utils import json_dumps
+from ayon_server.types import OPModel
+from ayon_server.utils import create_uuid, json_loads
 
+CACHE_NS = "project.folder-list"
+VERSION_NS = "project.folder-list-version"
+SERIAL_NS = "project.folder-list-serial"
+JOURNAL_NS = "project.folder-list-journal"
+CACHE_TTL = 3600
 
-async def rebuild_hierarchy_cache(
-    project_name: str,
-    transaction: Connection | None = None,
-) -> list[dict[str, Any]]:
-    start_time = time.monotonic()
-    query = f"""
+# KEYS: [hash, version, serial, journal]
+# ARGV: [ttl, number of journaled folders, folder1, ...,
+#        number of items to set, field1, value1, ..., fields to delete...]
+# Journals the folders and patches the cache. Does not change TTL
+# of the cache. Returns the new version or nil when the cache
+# is not built.
+
+PATCH_SCRIPT = """
+local serial = redis.call("INCR", KEYS[3])
+redis.call("EXPIRE", KEYS[3], ARGV[1])
+local n = tonumber(ARGV[2])
+for i = 3, 2 + n do
+    redis.call("ZADD", KEYS[4], serial, ARGV[i])
+end
+redis.call("EXPIRE", KEYS[4], ARGV[1])
+if redis.call("EXISTS", KEYS[2]) == 0 then
+    return nil
+end
+local pos = 3 + n
+local m = tonumber(ARGV[pos])
+for i = 0, m - 1 do
+    redis.call("HSET", KEYS[1], ARGV[pos + 1 + 2 * i], ARGV[pos + 2 + 2 * i])
+end
+for i = pos + 1 + 2 * m, #ARGV do
+    redis.call("HDEL", KEYS[1], ARGV[i])
+end
+return redis.call("INCR", KEYS[2])
+"""
+
+# KEYS: [temporary hash, hash, version, journal]
+# ARGV: [ttl, version, serial read before the rebuild]
+# Atomically replaces the hash with the freshly built one.
+# Returns folders patched since the serial was read.
+
+SWAP_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    redis.call("RENAME", KEYS[1], KEYS[2])
+    redis.call("EXPIRE", KEYS[2], ARGV[1])
+else
+    redis.call("DEL", KEYS[2])
+end
+redis.call("SET", KEYS[3], ARGV[2], "EX", ARGV[1])
+return redis.call("ZRANGEBYSCORE", KEYS[4], "(" .. ARGV[3], "+inf")
+"""
+
+# KEYS: [hash, version]
+# Returns [version, field1, value1, ...] or nil when the cache is not built
+
+SNAPSHOT_SCRIPT = """
+local version = redis.call("GET", KEYS[2])
+if not version then
+    return nil
+end
+local result = redis.call("HGETALL", KEYS[1])
+table.insert(result, 1, version)
+return result
+"""
+
+# Number of attempts to read a consistent snapshot of the cache
+SNAPSHOT_ATTEMPTS = 3
+
+
+class FolderListItem(OPModel):
+    id: str
+    path: str
+    parent_id: str | None = None
+    parents: list[str]
+    name: str
+    label: str | None = None
+    folder_type: str
+    has_tasks: bool = False
+    has_children: bool = False
+    task_names: list[str] | None
+    status: str
+    attrib: dict[str, Any] | None = None
+    own_attrib: list[str] | None = None
+    updated_at: datetime.datetime
+
+
+def _folder_query(project_name: str, condition: str = "") -> str:
+    return f"""
         SELECT
             f.id,
             f.parent_id,
@@ -24,11 +131,18 @@ async def rebuild_hierarchy_cache(
             f.attrib,
             f.updated_at,
             ea.attrib as all_attrib,
-            ea.path as path,
+            h.path as path,
+            EXISTS(
+                SELECT 1 FROM project_{project_name}.folders c
+                WHERE c.parent_id = f.id
+            ) AS has_children,
             COUNT (tasks.id) AS task_count,
             array_agg(tasks.name) AS task_names
         FROM
             project_{project_name}.folders f
+        INNER JOIN
+            project_{project_name}.hierarchy h
+        ON f.id = h.id
         INNER JOIN
             project_{project_name}.exported_attributes ea
         ON f.id = ea.folder_id
@@ -36,36 +150,276 @@ async def rebuild_hierarchy_cache(
             project_{project_name}.tasks AS tasks
         ON
             tasks.folder_id = f.id
-        GROUP BY f.id, ea.attrib, ea.path
+        {condition}
+        GROUP BY f.id, ea.attrib, h.path
     """
 
-    result = []
-    ids_with_children = set()
+
+def _serialize(row: dict[str, Any]) -> str:
+    """Convert a DB row to a JSON serialized FolderListItem"""
+    item = FolderListItem(
+        id=row["id"],
+        path=row["path"],
+        parent_id=row["parent_id"],
+        parents=row["path"].strip("/").split("/")[:-1],
+        name=row["name"],
+        label=row["label"],
+        folder_type=row["folder_type"],
+        has_tasks=row["task_count"] > 0,
+        has_children=row["has_children"],
+        task_names=row["task_names"] if row["task_names"] != [None] else [],
+        status=row["status"],
+        attrib=row["all_attrib"],
+        own_attrib=list(row["attrib"].keys()),
+        updated_at=row["updated_at"],
+    )
+    return item.json(by_alias=True, exclude_unset=True)
+
+
+async def rebuild_hierarchy_cache(
+    project_name: str,
+    transaction: Connection | None = None,
+) -> int:
+    """Build the folder list cache of the project from scratch.
+
+    Returns the new cache version.
+    """
+    start_time = time.monotonic()
+    tmp_key = f"{project_name}-{create_uuid()}"
+
+    # Folders patched after this point may be missing in the snapshot
+    serial = int(await Redis.get(SERIAL_NS, project_name) or 0)
+
+    count = 0
+    buff: dict[str, str] = {}
+    query = _folder_query(project_name)
     async for row in Postgres.iterate(query, transaction=transaction):
-        result.append(
-            {
-                "id": row["id"],
-                "path": row["path"],
-                "parent_id": row["parent_id"],
-                "parents": row["path"].strip("/").split("/")[:-1],
-                "name": row["name"],
-                "label": row["label"],
-                "folder_type": row["folder_type"],
-                "has_tasks": row["task_count"] > 0,
-                "task_names": row["task_names"] if row["task_names"] != [None] else [],
-                "status": row["status"],
-                "attrib": row["all_attrib"],
-                "own_attrib": list(row["attrib"].keys()),
-                "updated_at": row["updated_at"],
-            }
+        buff[row["id"]] = _serialize(row)
+        count += 1
+        if len(buff) >= 1000:
+            await Redis.hset(CACHE_NS, tmp_key, buff)
+            buff = {}
+    if buff:
+        await Redis.hset(CACHE_NS, tmp_key, buff)
+
+    # Start from a time based version, so validators issued for
+    # a previous (expired) cache are never reused
+    version = time.time_ns() // 1000
+
+    changed = await Redis.eval(
+        SWAP_SCRIPT,
+        [
+            (CACHE_NS, tmp_key),
+            (CACHE_NS, project_name),
+            (VERSION_NS, project_name),
+            (JOURNAL_NS, project_name),
+        ],
+        CACHE_TTL,
+        version,
+        serial,
+    )
+    elapsed_time = time.monotonic() - start_time
+    logging.debug(
+        f"Rebuilt hierarchy cache for {project_name} "
+        f"({count} folders) in {elapsed_time:.2f} s"
+    )
+
+    if changed:
+        folder_ids = {folder_id.decode("ascii") for folder_id in changed}
+        version = await _patch_hierarchy_cache(project_name, folder_ids) or version
+    return version
+
+
+class PendingPatches:
+    """Folders changed in a transaction, patched once it is committed"""
+
+    def __init__(self) -> None:
+        # (project name, refresh descendants) -> folder ids
+        self.folders: dict[tuple[str, bool], set[str]] = {}
+
+    async def __call__(self) -> None:
+        for (project_name, descendants), folder_ids in self.folders.items():
+            await _patch_hierarchy_cache(project_name, folder_ids, descendants)
+
+
+async def update_hierarchy_cache(
+    project_name: str,
+    folder_ids: Iterable[str],
+    transaction: Connection | None = None,
+    descendants: bool = True,
+) -> None:
+    """Patch the folder list cache after the given folders have changed.
+
+    Refreshes the given folders, their descendants (paths and inherited
+    attributes may have changed) and their current and former parents
+    (`has_children` may have changed). Folders which no longer exist
+    are removed from the cache. Set `descendants` to False when only
+    the folders themselves changed (e.g. their tasks).
+
+    Deleted subfolders are not found by crawling the database,
+    so ids of all deleted folders must be provided.
+
+    When a transaction is provided, the cache is patched once
+    the transaction is committed. Patches of the same transaction
+    are merged.
+    """
+    ids = set(folder_ids)
+    if not ids:
+        return
+
+    if transaction is None or not transaction.is_in_transaction():
+        await _patch_hierarchy_cache(project_name, ids, descendants)
+        return
+
+    pending = Postgres.after_commit(transaction, CACHE_NS, PendingPatches())
+    pending.folders.setdefault((project_name, descendants), set()).update(ids)
+
+
+async def _patch_hierarchy_cache(
+    project_name: str,
+    folder_ids: set[str],
+    descendants: bool = True,
+) -> int | None:
+    """Patch the cache from the committed data.
+
+    When the cache is not built, the folders are only journaled
+    (a rebuild may be in progress). Returns the new cache version.
+    """
+    ids = list(folder_ids)
+    keys = [
+        (CACHE_NS, project_name),
+        (VERSION_NS, project_name),
+        (SERIAL_NS, project_name),
+        (JOURNAL_NS, project_name),
+    ]
+
+    if await Redis.get(VERSION_NS, project_name) is None:
+        await Redis.eval(PATCH_SCRIPT, keys, CACHE_TTL, len(ids), *ids, 0)
+        return None
+
+    start_time = time.monotonic()
+
+    # Former parents, in case the folders were moved or deleted
+    parent_ids: set[str] = set()
+    for cached in await Redis.hmget(CACHE_NS, project_name, ids):
+        if cached is None:
+            continue
+        if parent_id := json_loads(cached.decode("utf-8")).get("parentId"):
+            parent_ids.add(parent_id)
+
+    if descendants:
+        subtree = f"""
+            WITH RECURSIVE subtree AS (
+                SELECT id, parent_id FROM project_{project_name}.folders
+                WHERE id = ANY($1)
+                UNION
+                SELECT c.id, c.parent_id FROM project_{project_name}.folders c
+                INNER JOIN subtree s ON c.parent_id = s.id
+            )
+            SELECT id FROM subtree
+            UNION
+            SELECT parent_id FROM subtree WHERE parent_id IS NOT NULL
+        """
+    else:
+        subtree = "SELECT unnest($1::UUID[])"
+
+    condition = f"""
+        WHERE f.id IN (
+            {subtree}
+            UNION
+            SELECT unnest($2::UUID[])
         )
-        if row["parent_id"] is not None:
-            ids_with_children.add(row["parent_id"])
+    """
 
-    for folder in result:
-        folder["has_children"] = folder["id"] in ids_with_children
+    to_set: dict[str, str] = {}
+    query = _folder_query(project_name, condition)
+    async for row in Postgres.iterate(query, ids, list(parent_ids)):
+        to_set[row["id"]] = _serialize(row)
+
+    to_delete = [
+        folder_id for folder_id in ids + list(parent_ids) if folder_id not in to_set
+    ]
+
+    args: list[Any] = [len(ids), *ids, len(to_set)]
+    for folder_id, value in to_set.items():
+        args.extend((folder_id, value))
+    args.extend(to_delete)
+
+    version = await Redis.eval(PATCH_SCRIPT, keys, CACHE_TTL, *args)
 
-    await Redis.set("project.folders", project_name, json_dumps(result), 3600)
     elapsed_time = time.monotonic() - start_time
-    logging.debug(f"Rebuilt hierarchy cache for {project_name} in {elapsed_time:.2f} s")
-    return result
+    logging.debug(
+        f"Patched hierarchy cache for {project_name}: "
+        f"{len(to_set)} updated, {len(to_delete)} removed "
+        f"in {elapsed_time:.2f} s (version {version})"
+    )
+    return None if version is None else int(version)
+
+
+async def get_hierarchy_cache_version(project_name: str) -> int | None:
+    """Return the current version of the folder list cache.
+
+    Returns None if the cache is not built.
+    """
+    version = await Redis.get(VERSION_NS, project_name)
+    return None if version is None else int(version)
+
+
+async def _project_has_folders(project_name: str) -> bool:
+    query = f"SELECT EXISTS (SELECT 1 FROM project_{project_name}.folders) AS e"
+    res = await Postgres.fetch(query)
+    return bool(res and res[0]["e"])
+
+
+async def _read_cache(
+    project_name: str,
+    atomic: bool,
+) -> tuple[Any, dict[str, bytes]]:
+    """Read the cache version and items.
+
+    Returns (None, {}) when the cache does not exist or it was modified
+    while being read. Unless `atomic` is set, items are read in batches
+    (not blocking Redis) and the version is checked again afterwards.
+    """
+    keys = [(CACHE_NS, project_name), (VERSION_NS, project_name)]
+    if atomic:
+        snapshot = await Redis.eval(SNAPSHOT_SCRIPT, keys)
+        if not snapshot:
+            return None, {}
+        fields = [f.decode("ascii") for f in snapshot[1::2]]
+        return snapshot[0], dict(zip(fields, snapshot[2::2]))
+
+    version = await Redis.get(VERSION_NS, project_name)
+    if version is None:
+        return None, {}
+    items: dict[str, bytes] = {}
+    async for folder_id, value in Redis.hscan(CACHE_NS, project_name):
+        items[folder_id] = value
+    if await Redis.get(VERSION_NS, project_name) != version:
+        # Patched during the scan. The items are a mix of two versions
+        return None, {}
+    return version, items
+
+
+async def load_hierarchy_cache(project_name: str) -> tuple[int, list[bytes]]:
+    """Return the version of the folder list cache and its items.
+
+    Items (serialized FolderListItems) are a consistent snapshot
+    of the returned version, ordered by folder id, so the same version
+    always yields the same output. Builds the cache if it does not
+    exist or its items were evicted.
+    """
+    for attempt in range(SNAPSHOT_ATTEMPTS):
+        # Fall back to an atomic read when the cache keeps changing
+        version, items = await _read_cache(project_name, atomic=attempt > 0)
+        if version is None:
+            if await Redis.get(VERSION_NS, project_name) is None:
+                await rebuild_hierarchy_cache(project_name)
+            continue
+        if not items and await _project_has_folders(project_name):
+            # The hash expired or was evicted while the version survived
+            await rebuild_hierarchy_cache(project_name)
+            continue
+        return int(version), [items[folder_id] for folder_id in sorted(items)]
+
+    raise AyonException(f"Unable to load the folder list of {project_name}")
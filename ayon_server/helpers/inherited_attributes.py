@@ -1,26 +1,92 @@
 import time
-from typing import Any
+from typing import Any, Iterable, NamedTuple
 
 from nxtools import logging
 
 from ayon_server.entities.core import attribute_library
-from ayon_server.lib.postgres import Postgres
+from ayon_server.lib.postgres import Connection, Postgres
+
+
+class RebuildStats(NamedTuple):
+    """Result of an inherited attributes rebuild."""
+
+    crawled: int = 0  # number of folders visited
+    updated: int = 0  # number of exported_attributes rows written
+    elapsed: float = 0.0  # seconds
+
+
+def _filter_project_attrib(project_attrib: dict[str, Any]) -> dict[str, Any]:
+    """Filter out non-inheritable folder attributes"""
+    result = project_attrib.copy()
+    for attr_type in attribute_library["folder"]:
+        if attr_type["name"] not in result:
+            continue
+        if not attr_type.get("inherit", True):
+            del result[attr_type["name"]]
+    return result
+
+
+def _is_inheritable(name: str) -> bool:
+    for attr_type in attribute_library["folder"]:
+        if attr_type["name"] == name:
+            return attr_type.get("inherit", True)
+    return True
 
 
 async def _rebuild_in_transaction(
-    project_name: str, project_attrib: dict[str, Any], conn
-):
-    st_crawl = await conn.prepare(
-        f"""
-        SELECT h.id, h.path, f.attrib as own, e.attrib as exported
-        FROM project_{project_name}.hierarchy h
-        INNER JOIN project_{project_name}.folders f
-        ON h.id = f.id
-        LEFT JOIN project_{project_name}.exported_attributes e
-        ON h.id = e.folder_id
-        ORDER BY h.path ASC
-        """
-    )
+    project_name: str,
+    project_attrib: dict[str, Any],
+    conn: Connection,
+    folder_ids: list[str] | None = None,
+) -> tuple[int, int]:
+    """Recompute exported attributes of the project or the given subtrees.
+
+    When folder_ids are provided, only the folders and their descendants
+    are visited and the subtree roots inherit the already exported
+    attributes of their parents.
+
+    Returns a tuple of (crawled, updated) row counts.
+    """
+
+    if folder_ids is None:
+        st_crawl = await conn.prepare(
+            f"""
+            SELECT
+                h.id, h.path, f.parent_id,
+                f.attrib as own, e.attrib as exported, e.path as exported_path
+            FROM project_{project_name}.hierarchy h
+            INNER JOIN project_{project_name}.folders f
+            ON h.id = f.id
+            LEFT JOIN project_{project_name}.exported_attributes e
+            ON h.id = e.folder_id
+            ORDER BY h.path ASC
+            """
+        )
+        args: tuple[Any, ...] = ()
+    else:
+        st_crawl = await conn.prepare(
+            f"""
+            WITH RECURSIVE subtree AS (
+                SELECT id FROM project_{project_name}.folders
+                WHERE id = ANY($1)
+                UNION
+                SELECT f.id FROM project_{project_name}.folders f
+                INNER JOIN subtree s ON f.parent_id = s.id
+            )
+            SELECT
+                h.id, h.path, f.parent_id,
+                f.attrib as own, e.attrib as exported, e.path as exported_path
+            FROM subtree s
+            INNER JOIN project_{project_name}.hierarchy h
+            ON h.id = s.id
+            INNER JOIN project_{project_name}.folders f
+            ON h.id = f.id
+            LEFT JOIN project_{project_name}.exported_attributes e
+            ON h.id = e.folder_id
+            ORDER BY h.path ASC
+            """
+        )
+        args = (folder_ids,)
 
     st_upsert = await conn.prepare(
         f"""
@@ -33,26 +99,53 @@ async def _rebuild_in_transaction(
          """
     )
 
-    # path: attrib_set cache to use when returning from child to parent
-    caching: dict[tuple[str, ...], dict[str, Any]] = {}
+    # folder_id: attrib_set cache of already visited parents.
+    # Rows are ordered by path, so a parent is always visited before
+    # its children.
+    caching: dict[str, dict[str, Any]] = {}
 
-    current_attrib_set: dict[str, Any] = {}
-    buff: list[tuple[str, str, dict[str, Any]]] = []
+    if folder_ids is not None:
+        # Seed the cache with the exported attributes of the subtree roots' parents
+        async for record in Postgres.iterate(
+            f"""
+            SELECT e.folder_id, e.attrib
+            FROM project_{project_name}.exported_attributes e
+            INNER JOIN project_{project_name}.folders f
+            ON e.folder_id = f.parent_id
+            WHERE f.id = ANY($1)
+            """,
+            folder_ids,
+            transaction=conn,
+        ):
+            caching[record["folder_id"]] = record["attrib"]
 
-    async for record in st_crawl.cursor():
-        path_elements = tuple(record["path"].split("/"))
-        if len(path_elements) == 1:
-            current_attrib_set = project_attrib.copy()
+    crawled = 0
+    updated = 0
+    buff: list[tuple[str, str, dict[str, Any]]] = []
 
-        elif path_elements[:-1] in caching:
-            current_attrib_set = caching[path_elements[:-1]]
+    async for record in st_crawl.cursor(*args):
+        crawled += 1
+        parent_id = record["parent_id"]
+        if parent_id is None:
+            current_attrib_set = project_attrib
+        elif parent_id in caching:
+            current_attrib_set = caching[parent_id]
+        else:
+            # This shouldn't happen. Parent was not exported yet.
+            logging.warning(
+                f"Unable to resolve inherited attributes of {record['path']}"
+            )
+            current_attrib_set = project_attrib
 
         new_attrib_set = current_attrib_set.copy()
         new_attrib_set.update(record["own"])
 
-        caching[path_elements] = new_attrib_set
+        caching[record["id"]] = new_attrib_set
 
-        if record["exported"] != new_attrib_set:
+        if (
+            record["exported"] != new_attrib_set
+            or record["exported_path"] != record["path"]
+        ):
             buff.append(
                 (
                     record["id"],
@@ -63,42 +156,166 @@ async def _rebuild_in_transaction(
 
         if len(buff) > 100:
             await st_upsert.executemany(buff)
+            updated += len(buff)
             buff = []
 
-        current_attrib_set = new_attrib_set
-
     if buff:
         await st_upsert.executemany(buff)
+        updated += len(buff)
+
+    return crawled, updated
+
+
+async def _patch_project_attrib_in_transaction(
+    project_name: str,
+    changes: dict[str, Any],
+    conn: Connection,
+) -> tuple[int, int]:
+    """Propagate changed project attributes to exported attributes.
+
+    For each changed attribute, only folders that inherit it
+    (i.e. neither they nor their ancestors override it) are updated.
+    A value of None removes the attribute.
+
+    Returns a tuple of (crawled, updated) row counts.
+    """
+
+    crawled = 0
+    updated = 0
+
+    for key, value in changes.items():
+        res = await conn.fetch(
+            f"""
+            WITH RECURSIVE affected AS (
+                SELECT id FROM project_{project_name}.folders
+                WHERE parent_id IS NULL AND NOT attrib ? $1::TEXT
+                UNION ALL
+                SELECT f.id FROM project_{project_name}.folders f
+                INNER JOIN affected a ON f.parent_id = a.id
+                WHERE NOT f.attrib ? $1::TEXT
+            ),
+            patched AS (
+                UPDATE project_{project_name}.exported_attributes e
+                SET attrib = CASE
+                    WHEN $2::JSONB IS NULL THEN e.attrib - $1::TEXT
+                    ELSE jsonb_set(e.attrib, ARRAY[$1::TEXT], $2::JSONB)
+                END
+                FROM affected a
+                WHERE e.folder_id = a.id
+                AND e.attrib -> $1::TEXT IS DISTINCT FROM $2::JSONB
+                RETURNING e.folder_id
+            )
+            SELECT
+                (SELECT count(*) FROM affected) AS crawled,
+                (SELECT count(*) FROM patched) AS updated
+            """,
+            key,
+            value,
+        )
+        crawled += res[0]["crawled"]
+        updated += res[0]["updated"]
+
+    return crawled, updated
 
 
 async def rebuild_inherited_attributes(
-    project_name: str, pattr: dict[str, Any] | None = None, transaction=None
-):
-    """Rebuild inherited attributes for all objects in the project."""
+    project_name: str,
+    pattr: dict[str, Any] | None = None,
+    transaction: Connection | None = None,
+    *,
+    folder_ids: Iterable[str] | None = None,
+    original_pattr: dict[str, Any] | None = None,
+) -> RebuildStats:
+    """Rebuild inherited attributes of folders in the project.
+
+    By default, all folders in the project are crawled. The rebuild
+    may be limited by providing:
+
+    - `folder_ids`: folders which were created, moved or had their
+      own attributes changed. Only these folders and their descendants
+      are recomputed.
+    - `original_pattr` along with `pattr`: the project attributes before
+      the change. Only the changed attributes are propagated and only
+      to the folders which inherit them. Both must be read in the same
+      transaction, which is then passed as `transaction`.
+
+    Returns the number of crawled and updated rows and the time it took.
+    """
     start = time.monotonic()
-    logging.debug("Rebuilding inherited attributes for", project_name)
 
-    if pattr is None:
-        project_attrib = {}
-        res = await Postgres.fetch(
-            "SELECT attrib FROM projects WHERE name = $1", project_name
+    ids = list(folder_ids) if folder_ids is not None else None
+    if ids is not None and not ids:
+        return RebuildStats()
+
+    async def _rebuild(conn: Connection) -> tuple[int, int]:
+        # Serialize rebuilds of the project, so a concurrent rebuild
+        # does not export attributes computed from a stale parent
+        await conn.execute(
+            "SELECT pg_advisory_xact_lock(hashtextextended($1, 0))",
+            f"project_{project_name}.exported_attributes",
         )
-        project_attrib.update(res[0]["attrib"])
-    else:
-        project_attrib = pattr.copy()
 
-    # Filter out non-inheritable and non-folder attributes
-    for attr_type in attribute_library["folder"]:
-        if attr_type["name"] not in project_attrib:
-            continue
-        if not attr_type.get("inherit", True):
-            del project_attrib[attr_type["name"]]
+        if pattr is None:
+            res = await conn.fetch(
+                "SELECT attrib FROM projects WHERE name = $1", project_name
+            )
+            project_attrib = _filter_project_attrib(res[0]["attrib"])
+        else:
+            project_attrib = _filter_project_attrib(pattr)
+
+        if original_pattr is None or ids is not None:
+            return await _rebuild_in_transaction(
+                project_name,
+                project_attrib,
+                conn,
+                folder_ids=ids,
+            )
+
+        original_attrib = _filter_project_attrib(original_pattr)
+        changes = {
+            key: project_attrib.get(key)
+            for key in set(project_attrib) | set(original_attrib)
+            if project_attrib.get(key) != original_attrib.get(key)
+            and _is_inheritable(key)
+        }
+        crawled, updated = await _patch_project_attrib_in_transaction(
+            project_name, changes, conn
+        )
+
+        # Folders without exported attributes cannot be patched.
+        # Export them in full.
+        missing = [
+            str(row["id"])
+            for row in await conn.fetch(
+                f"""
+                SELECT f.id FROM project_{project_name}.folders f
+                LEFT JOIN project_{project_name}.exported_attributes e
+                ON f.id = e.folder_id
+                WHERE e.folder_id IS NULL
+                """
+            )
+        ]
+        if missing:
+            subtree_crawled, subtree_updated = await _rebuild_in_transaction(
+                project_name,
+                project_attrib,
+                conn,
+                folder_ids=missing,
+            )
+            crawled += subtree_crawled
+            updated += subtree_updated
+        return crawled, updated
 
     if (transaction is None) or transaction == Postgres:
         async with Postgres.acquire() as conn, conn.transaction():
-            await _rebuild_in_transaction(project_name, project_attrib, conn)
+            crawled, updated = await _rebuild(conn)
     else:
-        await _rebuild_in_transaction(project_name, project_attrib, transaction)
+        crawled, updated = await _rebuild(transaction)
 
     elapsed = time.monotonic() - start
-    logging.debug(f"Rebuilt inherited attributes for {project_name} in {elapsed:.2f}s")
+    scope = "all folders" if ids is None else f"{len(ids)} subtrees"
+    logging.debug(
+        f"Rebuilt inherited attributes of {scope} in {project_name}: "
+        f"{updated} of {crawled} rows updated in {elapsed:.2f}s"
+    )
+    return RebuildStats(crawled=crawled, updated=updated, elapsed=elapsed)
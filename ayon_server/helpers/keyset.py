@@ -0,0 +1,162 @@
+"""Keyset pagination helpers.
+
+Pages are selected using conditions on the values of the sort columns
+of the last row of the previous page (keyset pagination), so every
+page is served by the same index scan regardless of its depth.
+The values are passed to the client as opaque cursors.
+
+These helpers only build SQL, so they do not depend on the GraphQL
+schema (which requires the attribute library to be loaded).
+"""
+
+import base64
+from datetime import datetime
+from typing import Any
+
+from ayon_server.utils import json_dumps, json_loads
+
+DEFAULT_PAGE_SIZE = 100
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """Encode values of the sort columns to an opaque cursor"""
+    payload = [
+        {"ts": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json_dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any] | None:
+    """Decode a cursor created by encode_cursor.
+
+    Returns None if the cursor is not valid for the given number
+    of sort columns.
+    """
+    try:
+        payload = json_loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        return None
+    if not isinstance(payload, list) or len(payload) != length:
+        return None
+    return [
+        datetime.fromisoformat(value["ts"]) if isinstance(value, dict) else value
+        for value in payload
+    ]
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime):
+        return f"'{value.isoformat()}'::timestamptz"
+    value = str(value).replace("'", "''")
+    return f"'{value}'"
+
+
+def _keyset_expanded(columns: list[str], values: list[Any], descending: bool) -> str:
+    # Lexicographic comparison with explicit handling of NULLs
+    # (NULLs sort last in ascending and first in descending order)
+    column, value = columns[0], values[0]
+    is_last = len(columns) == 1
+
+    if value is None:
+        following = f"{column} IS NOT NULL" if descending else "FALSE"
+        equal = f"{column} IS NULL"
+    else:
+        literal = _sql_literal(value)
+        if descending:
+            following = f"{column} < {literal}"
+        elif is_last:
+            following = f"{column} > {literal}"
+        else:
+            following = f"({column} > {literal} OR {column} IS NULL)"
+        equal = f"{column} = {literal}"
+
+    if is_last:
+        return following
+    rest = _keyset_expanded(columns[1:], values[1:], descending)
+    return f"({following} OR ({equal} AND {rest}))"
+
+
+def keyset_condition(columns: list[str], values: list[Any], descending: bool) -> str:
+    """Return a condition matching rows following the cursor values.
+
+    The last column must be unique and not nullable (creation order,
+    name...), other columns may contain NULLs.
+
+    When the cursor does not contain NULLs, a row-value comparison
+    is used, so the condition can be served by an index matching
+    the sort order.
+    """
+    if None in values:
+        return _keyset_expanded(columns, values, descending)
+
+    literals = [_sql_literal(value) for value in values]
+    if len(columns) == 1:
+        return f"{columns[0]} {'<' if descending else '>'} {literals[0]}"
+
+    conditions = [
+        f"({', '.join(columns)}) {'<' if descending else '>'} ({', '.join(literals)})"
+    ]
+    if not descending:
+        # Row-value comparison with a NULL is NULL, but NULLs
+        # sort last in ascending order
+        for i, column in enumerate(columns[:-1]):
+            prefix = [f"{c} = {lit}" for c, lit in zip(columns[:i], literals[:i])]
+            conditions.append(" AND ".join([*prefix, f"{column} IS NULL"]))
+    return f"({' OR '.join(conditions)})"
+
+
+def create_pagination(
+    order_by: list[str],
+    first: int | None = None,
+    after: str | None = None,
+    last: int | None = None,
+    before: str | None = None,
+    need_cursor: bool = True,
+) -> tuple[str, list[str], str]:
+    """
+    Create pagination query and arguments.
+    returns a tuple of
+      - pagination query (ORDER BY... part of the query)
+      - additional conditions (WHERE... part of the query)
+      - cursor columns (to add to SELECT... part of the query)
+
+    Pagination uses keyset conditions on the sort columns, so every page
+    is served using the same index, regardless of its depth. Cursors
+    are opaque encoded values of all sort columns. One row more than
+    requested is fetched, so `resolve` can tell whether there are more
+    pages.
+    """
+    pagination = ""
+    sql_conditions = []
+
+    assert order_by, "Order by must not be empty"
+
+    if need_cursor:
+        cursor = ", ".join(f"{col} AS cursor_{i}" for i, col in enumerate(order_by))
+    else:
+        cursor = "NULL AS cursor"
+
+    if not (last or first):
+        first = DEFAULT_PAGE_SIZE
+
+    descending = not first
+    direction = "DESC" if descending else "ASC"
+    pagination = "ORDER BY " + ", ".join(f"{col} {direction}" for col in order_by)
+    pagination += f" LIMIT {(first or last or 0) + 1}"
+
+    curval = after if first else before
+    if curval:
+        values = decode_cursor(curval, len(order_by))
+        if values is None:
+            if len(order_by) > 1:
+                raise ValueError("Invalid cursor")
+            # Cursors created by older versions were raw column values
+            values = [curval]
+        sql_conditions.append(keyset_condition(order_by, values, descending))
+
+    return pagination, sql_conditions, cursor
@@ -0,0 +1,231 @@
+"""Resolve settings of many addons at once.
+
+Resolving settings addon by addon (`BaseServerAddon.get_project_settings`
+and friends) costs several database round trips per addon. When settings
+of a whole bundle are requested, overrides of all its addons are loaded
+using a single query per scope (studio, project, project-site, site)
+and addons are then resolved concurrently.
+
+Applying overrides and validating the resulting models is CPU heavy,
+so it runs in a worker pool to keep the event loop responsive.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from ayon_server.addons.addon import BaseServerAddon
+from ayon_server.config import ayonconfig
+from ayon_server.exceptions import NotFoundException
+from ayon_server.lib.postgres import Postgres
+from ayon_server.settings import BaseSettingsModel, apply_overrides
+
+T = TypeVar("T")
+
+AddonKey = tuple[str, str]
+
+# Methods addons may (but should not) override to customize settings
+# resolution. Such addons are resolved using their own methods.
+RESOLUTION_METHODS = [
+    "get_studio_overrides",
+    "get_project_overrides",
+    "get_project_site_overrides",
+    "get_studio_settings",
+    "get_project_settings",
+    "get_project_site_settings",
+    "get_site_settings",
+]
+
+_executor: ThreadPoolExecutor | None = None
+
+
+async def run_in_settings_pool(func: Callable[..., T], *args: Any) -> T:
+    """Run a CPU-bound settings function in the worker pool"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, ayonconfig.settings_validation_workers),
+            thread_name_prefix="settings",
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
+
+
+class PrefetchedOverrides:
+    def __init__(self) -> None:
+        self.studio: dict[AddonKey, dict[str, Any]] = {}
+        self.project: dict[AddonKey, dict[str, Any]] = {}
+        self.project_site: dict[AddonKey, dict[str, Any]] = {}
+        self.site: dict[AddonKey, dict[str, Any]] = {}
+
+
+async def _fetch_scope(
+    query: str,
+    addons: list[AddonKey],
+    *args: Any,
+) -> dict[AddonKey, dict[str, Any]]:
+    names = sorted({name for name, _ in addons})
+    wanted = set(addons)
+    result: dict[AddonKey, dict[str, Any]] = {}
+    async for row in Postgres.iterate(query, names, *args):
+        key = (row["addon_name"], row["addon_version"])
+        if key in wanted:
+            result[key] = dict(row["data"])
+    return result
+
+
+async def prefetch_overrides(
+    addons: list[AddonKey],
+    variant: str = "production",
+    project_name: str | None = None,
+    user_name: str | None = None,
+    site_id: str | None = None,
+) -> PrefetchedOverrides:
+    """Load overrides of all given addons for the requested scopes"""
+
+    overrides = PrefetchedOverrides()
+    if not addons:
+        return overrides
+
+    overrides.studio = await _fetch_scope(
+        """
+        SELECT addon_name, addon_version, data FROM settings
+        WHERE addon_name = ANY($1) AND variant = $2
+        """,
+        addons,
+        variant,
+    )
+
+    if project_name:
+        try:
+            overrides.project = await _fetch_scope(
+                f"""
+                SELECT addon_name, addon_version, data
+                FROM project_{project_name}.settings
+                WHERE addon_name = ANY($1) AND variant = $2
+                """,
+                addons,
+                variant,
+            )
+        except Postgres.UndefinedTableError:
+            raise NotFoundException(f"Project {project_name} does not exists") from None
+
+    if site_id and user_name:
+        overrides.site = await _fetch_scope(
+            """
+            SELECT addon_name, addon_version, data FROM site_settings
+            WHERE addon_name = ANY($1) AND site_id = $2 AND user_name = $3
+            """,
+            addons,
+            site_id,
+            user_name,
+        )
+
+        if project_name:
+            overrides.project_site = await _fetch_scope(
+                f"""
+                SELECT addon_name, addon_version, data
+                FROM project_{project_name}.project_site_settings
+                WHERE addon_name = ANY($1) AND site_id = $2 AND user_name = $3
+                """,
+                addons,
+                site_id,
+                user_name,
+            )
+
+    return overrides
+
+
+def _uses_default_resolution(addon: BaseServerAddon) -> bool:
+    return all(
+        getattr(type(addon), method) is getattr(BaseServerAddon, method)
+        for method in RESOLUTION_METHODS
+    )
+
+
+def _apply_layers(
+    settings: BaseSettingsModel,
+    studio: dict[str, Any] | None,
+    project: dict[str, Any] | None,
+    project_site: dict[str, Any] | None,
+) -> BaseSettingsModel:
+    """Apply the override layers in order and set the override flags"""
+    flags: list[str] = []
+    for layer, flag in (
+        (studio, "_has_studio_overrides"),
+        (project, "_has_project_overrides"),
+        (project_site, "_has_site_overrides"),
+    ):
+        if layer:
+            settings = apply_overrides(settings, layer)
+            flags.append(flag)
+    for flag in flags:
+        setattr(settings, flag, True)
+    return settings
+
+
+async def _resolve_with_addon_methods(
+    addon: BaseServerAddon,
+    variant: str,
+    project_name: str | None,
+    user_name: str | None,
+    site_id: str | None,
+) -> tuple[BaseSettingsModel | None, dict[str, Any] | None]:
+    site_settings = None
+    if site_id and user_name:
+        site_settings = await addon.get_site_settings(user_name, site_id)
+        if project_name:
+            settings = await addon.get_project_site_settings(
+                project_name, user_name, site_id, variant
+            )
+            return settings, site_settings
+    if project_name:
+        settings = await addon.get_project_settings(project_name, variant)
+    else:
+        settings = await addon.get_studio_settings(variant)
+    return settings, site_settings
+
+
+async def resolve_addon_settings(
+    addon: BaseServerAddon,
+    overrides: PrefetchedOverrides,
+    variant: str = "production",
+    project_name: str | None = None,
+    user_name: str | None = None,
+    site_id: str | None = None,
+) -> tuple[BaseSettingsModel | None, dict[str, Any] | None]:
+    """Return the addon settings and its site settings using prefetched overrides.
+
+    The result is the same as of `get_studio_settings`, `get_project_settings`
+    or `get_project_site_settings` (depending on the requested scope)
+    and `get_site_settings` (None if site_id is not set).
+    """
+
+    if not _uses_default_resolution(addon):
+        return await _resolve_with_addon_methods(
+            addon, variant, project_name, user_name, site_id
+        )
+
+    key = (addon.definition.name, addon.version)
+
+    site_settings = None
+    if site_id and user_name:
+        site_model = addon.get_site_settings_model()
+        site_data = overrides.site.get(key)
+        if site_model is not None and site_data is not None:
+            site_settings = await run_in_settings_pool(
+                lambda: site_model(**site_data).dict()
+            )
+
+    settings = await addon.get_default_settings()
+    if settings is None:
+        return None, site_settings
+
+    settings = await run_in_settings_pool(
+        _apply_layers,
+        settings,
+        overrides.studio.get(key),
+        overrides.project.get(key) if project_name else None,
+        overrides.project_site.get(key) if project_name and site_id else None,
+    )
+    return settings, site_settings
@@ -0,0 +1,55 @@
+"""Precomputed snapshots of resolved addon settings.
+
+Resolving settings of all addons in a bundle is expensive (several
+queries and a full validation of the settings tree per addon), while
+the result changes rarely. Serialized results are stored in Redis
+under a key derived from everything they depend on: the bundle and its
+addons, variant, project, site and the global settings revision.
+
+The settings revision (public.settings_revision) is bumped by database
+triggers on every write to any settings overrides table, so snapshots
+are implicitly invalidated by all override writes, regardless of the
+code path performing them.
+
+Each snapshot carries an ETag computed from its content.
+"""
+
+from ayon_server.lib.postgres import Postgres
+from ayon_server.lib.redis import Redis
+from ayon_server.utils import hash_data
+
+SNAPSHOT_NS = "settings-snapshot"
+SNAPSHOT_TTL = 3600
+
+# ETag (sha256 hex digest) is stored as a prefix of the payload,
+# so the snapshot may be loaded using a single request.
+ETAG_LENGTH = 64
+
+
+async def get_settings_snapshot(key: str) -> tuple[str, str] | None:
+    """Return (etag, serialized payload) of the snapshot if it exists"""
+    data = await Redis.get(SNAPSHOT_NS, key)
+    if data is None:
+        return None
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return data[:ETAG_LENGTH], data[ETAG_LENGTH:]
+
+
+async def set_settings_snapshot(key: str, payload: str) -> str:
+    """Store the serialized settings and return their ETag"""
+    etag = hash_data(payload)
+    await Redis.set(SNAPSHOT_NS, key, etag + payload, ttl=SNAPSHOT_TTL)
+    return etag
+
+
+async def invalidate_settings_snapshots() -> None:
+    """Invalidate all snapshots.
+
+    This is done automatically when settings overrides are changed,
+    but it is needed when settings change for a different reason
+    (e.g. addon code providing the defaults is updated).
+    """
+    await Postgres.execute(
+        "UPDATE settings_revision SET revision = revision + 1 WHERE id = 1"
+    )
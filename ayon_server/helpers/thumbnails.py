@@ -70,6 +70,52 @@ async def process_thumbnail(
     return normalized_bytes
 
 
+def render_renditions(
+    image_bytes: bytes,
+    widths: list[int],
+    formats: list[str],
+) -> dict[tuple[int, str], bytes]:
+    """Render downscaled copies of an image in the given widths and formats.
+
+    Unlike `process_thumbnail`, this is a plain blocking function,
+    which is meant to run in a process pool (see ayon_server.thumbnails),
+    so the image is decoded only once for all renditions.
+    Images are never upscaled: renditions wider than the original
+    keep the original size, but are still converted to the format.
+
+    Returns a dict of (width, format) to the encoded image.
+    """
+
+    result: dict[tuple[int, str], bytes] = {}
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        original_width, original_height = img.size
+
+        for width in widths:
+            if width < original_width:
+                height = max(1, round(width * original_height / original_width))
+                resized = img.resize((width, height), Image.LANCZOS)  # type: ignore
+            else:
+                resized = img
+
+            for target_format in formats:
+                img_byte_arr = io.BytesIO()
+                if target_format == "JPEG":
+                    resized.convert("RGB").save(
+                        img_byte_arr,
+                        format="JPEG",
+                        optimize=True,
+                        quality=85,
+                    )
+                else:
+                    resized.save(img_byte_arr, format=target_format, quality=80)
+                result[(width, target_format)] = img_byte_arr.getvalue()
+
+    return result
+
+
 @functools.cache
 def get_fake_thumbnail() -> bytes:
     base64_string = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="  # noqa
@@ -0,0 +1,37 @@
+from ayon_server.helpers.derived_tables import check_derived_table
+from ayon_server.lib.postgres import Connection
+
+
+async def check_version_list(
+    project_name: str,
+    repair: bool = False,
+    transaction: Connection | None = None,
+) -> int:
+    """Verify the version_list table of the project is consistent with versions.
+
+    The version_list table is maintained incrementally by a trigger on the
+    versions table. This aggregates all versions of the project
+    (see check_derived_table).
+
+    Returns the number of inconsistent rows found. When `repair` is set,
+    the inconsistent rows are fixed.
+    """
+
+    query = f"""
+        SELECT
+            product_id,
+            array_agg(id ORDER BY version) AS ids,
+            array_agg(version ORDER BY version) AS versions
+        FROM project_{project_name}.versions
+        GROUP BY product_id
+    """
+
+    return await check_derived_table(
+        project_name,
+        "version_list",
+        "product_id",
+        ["ids", "versions"],
+        query,
+        repair=repair,
+        transaction=transaction,
+    )
@@ -1,11 +1,20 @@
 import asyncio
 from contextlib import asynccontextmanager
-from typing import TYPE_CHECKING, Any, AsyncGenerator
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Hashable,
+    TypeVar,
+)
 
 import asyncpg
 import asyncpg.pool
 import asyncpg.transaction
 from asyncpg.pool import PoolConnectionProxy
+from nxtools import log_traceback
 
 from ayon_server.config import ayonconfig
 from ayon_server.exceptions import AyonException, ServiceUnavailableException
@@ -16,6 +25,8 @@ if TYPE_CHECKING:
 else:
     Connection = PoolConnectionProxy
 
+Callback = TypeVar("Callback", bound=Callable[[], Awaitable[None]])
+
 
 class Postgres:
     """Postgres database connection.
@@ -30,6 +41,9 @@ class Postgres:
     UniqueViolationError = asyncpg.exceptions.UniqueViolationError
     UndefinedTableError = asyncpg.exceptions.UndefinedTableError
 
+    # Callbacks registered using `after_commit` (connection id -> key -> callback)
+    _after_commit: dict[int, dict[Hashable, Callable[[], Awaitable[None]]]] = {}
+
     @classmethod
     @asynccontextmanager
     async def acquire(
@@ -51,8 +65,35 @@ class Postgres:
         try:
             yield connection_proxy
         finally:
+            callbacks = cls._after_commit.pop(id(connection_proxy), {})
             await cls.pool.release(connection_proxy)
 
+        # Not reached when the block raised (the transaction was rolled back)
+        for callback in callbacks.values():
+            try:
+                await callback()
+            except Exception:
+                log_traceback("Post-commit callback failed")
+
+    @classmethod
+    def after_commit(
+        cls, conn: Connection, key: Hashable, callback: Callback
+    ) -> Callback:
+        """Run the callback once the transaction of the connection is committed.
+
+        Callbacks run after the connection acquired using `acquire`
+        is released, so they see the committed data and do not hold
+        the connection. They are dropped when the transaction is
+        rolled back. When the connection is not in a transaction,
+        the callback must be awaited by the caller instead.
+
+        Only one callback is registered per key. Returns the callback
+        already registered under the key, if any, so the callers
+        may merge their work.
+        """
+        callbacks = cls._after_commit.setdefault(id(conn), {})
+        return callbacks.setdefault(key, callback)  # type: ignore[return-value]
+
     @classmethod
     async def init_connection(cls, conn) -> None:
         """Set up the connection pool"""
@@ -1,4 +1,4 @@
-from typing import Any, Awaitable, Union
+from typing import Any, AsyncGenerator, Awaitable, Union
 
 from redis import asyncio as aioredis
 from redis.asyncio.client import PubSub
@@ -92,6 +92,66 @@ class Redis:
             await cls.connect()
         await cls.redis_pool.expire(f"{cls.prefix}{namespace}-{key}", ttl)
 
+    @classmethod
+    async def hset(cls, namespace: str, key: str, mapping: dict[str, Any]) -> None:
+        """Set multiple fields of a hash"""
+        if not cls.connected:
+            await cls.connect()
+        result = cls.redis_pool.hset(f"{cls.prefix}{namespace}-{key}", mapping=mapping)
+        if isinstance(result, Awaitable):
+            await result
+
+    @classmethod
+    async def hmget(cls, namespace: str, key: str, fields: list[str]) -> list[Any]:
+        """Get values of the given hash fields (None for missing fields)"""
+        if not cls.connected:
+            await cls.connect()
+        if not fields:
+            return []
+        result = cls.redis_pool.hmget(f"{cls.prefix}{namespace}-{key}", fields)
+        if isinstance(result, Awaitable):
+            return await result
+        return result
+
+    @classmethod
+    async def hscan(
+        cls,
+        namespace: str,
+        key: str,
+        count: int = 1000,
+    ) -> AsyncGenerator[tuple[str, Any], None]:
+        """Iterate over fields of a hash and yield [field, value] tuples
+
+        Fields are fetched from redis in batches of `count` items,
+        so the whole hash is never loaded at once.
+        """
+        if not cls.connected:
+            await cls.connect()
+        async for field, value in cls.redis_pool.hscan_iter(
+            f"{cls.prefix}{namespace}-{key}", count=count
+        ):
+            yield field.decode("ascii"), value
+
+    @classmethod
+    async def eval(
+        cls,
+        script: str,
+        keys: list[tuple[str, str]],
+        *args: Any,
+    ) -> Any:
+        """Run a lua script.
+
+        Keys are provided as a list of [namespace, key] tuples
+        and passed to the script as KEYS (with the prefix applied).
+        """
+        if not cls.connected:
+            await cls.connect()
+        full_keys = [f"{cls.prefix}{namespace}-{key}" for namespace, key in keys]
+        result = cls.redis_pool.eval(script, len(full_keys), *full_keys, *args)
+        if isinstance(result, Awaitable):
+            return await result
+        return result
+
     @classmethod
     async def pubsub(cls) -> PubSub:
         """Create a Redis pubsub connection"""
@@ -108,6 +168,24 @@ class Redis:
             channel = ayonconfig.redis_channel
         await cls.redis_pool.publish(channel, message)
 
+    @classmethod
+    async def publish_many(
+        cls,
+        messages: list[str],
+        channel: str | None = None,
+    ) -> None:
+        """Publish multiple messages to a Redis channel in a single round trip"""
+        if not messages:
+            return
+        if not cls.connected:
+            await cls.connect()
+        if channel is None:
+            channel = ayonconfig.redis_channel
+        async with cls.redis_pool.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.publish(channel, message)
+            await pipe.execute()
+
     @classmethod
     async def keys(cls, namespace: str) -> list[str]:
         if not cls.connected:
@@ -0,0 +1,17 @@
+__all__ = [
+    "ThumbnailStorage",
+    "get_thumbnail_storage",
+    "lock_thumbnail_payloads",
+    "release_thumbnail_payloads",
+    "thumbnail_cache",
+    "thumbnail_hash",
+]
+
+from .cache import thumbnail_cache
+from .storage import (
+    ThumbnailStorage,
+    get_thumbnail_storage,
+    lock_thumbnail_payloads,
+    release_thumbnail_payloads,
+    thumbnail_hash,
+)
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+
+from ayon_server.config import ayonconfig
+
+
+def cache_key(content_hash: str, variant: str | None = None) -> str:
+    return f"{content_hash}.{variant}" if variant else content_hash
+
+
+class ThumbnailCache:
+    """In-process LRU cache of thumbnail payloads with a byte budget.
+
+    Payloads are keyed by their content hash (and rendition variant,
+    see `cache_key`), so cached items never become stale and they
+    do not need to be invalidated.
+    """
+
+    def __init__(self) -> None:
+        self.data: OrderedDict[str, bytes] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> bytes | None:
+        payload = self.data.get(key)
+        if payload is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, key: str, payload: bytes) -> None:
+        budget = ayonconfig.thumbnail_cache_size
+        if len(payload) > budget // 4 or key in self.data:
+            # Do not let a single payload evict a large part of the cache
+            return
+        self.data[key] = payload
+        self.size += len(payload)
+        while self.size > budget:
+            _, evicted = self.data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def discard(self, key: str) -> None:
+        if (payload := self.data.pop(key, None)) is not None:
+            self.size -= len(payload)
+
+
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,94 @@
+"""Move thumbnail payloads from the database to the thumbnail storage.
+
+Thumbnails created before the storage was introduced (or with
+`thumbnail_storage` set to `database`) keep their payload in the `data`
+column of project_X.thumbnails. This tool copies them (and renders
+their renditions) to the configured storage in batches and clears
+the column.
+
+Usage (in the server container):
+
+    python -m ayon_server.thumbnails.migrate [--project NAME] [--batch-size N]
+
+The tool may be interrupted and started again. The freed space is
+returned to the operating system only after `VACUUM FULL` of the
+thumbnails tables.
+"""
+
+import argparse
+import asyncio
+
+from nxtools import logging
+
+from ayon_server.helpers.project_list import get_project_list
+from ayon_server.initialize import ayon_init
+from ayon_server.lib.postgres import Postgres
+from ayon_server.thumbnails.processing import create_thumbnail_renditions
+from ayon_server.thumbnails.storage import (
+    get_thumbnail_storage,
+    lock_thumbnail_payloads,
+    thumbnail_hash,
+)
+
+
+async def migrate_project(project_name: str, batch_size: int) -> int:
+    storage = get_thumbnail_storage()
+    assert storage is not None, "Thumbnail storage is not configured"
+
+    select_query = f"""
+        SELECT id, data FROM project_{project_name}.thumbnails
+        WHERE data IS NOT NULL
+        LIMIT $1
+    """
+    update_query = f"""
+        UPDATE project_{project_name}.thumbnails
+        SET hash = $2, data = NULL
+        WHERE id = $1
+    """
+
+    count = 0
+    while True:
+        res = await Postgres.fetch(select_query, batch_size)
+        if not res:
+            break
+        updates = [(row["id"], thumbnail_hash(row["data"])) for row in res]
+        async with Postgres.acquire() as conn, conn.transaction():
+            await lock_thumbnail_payloads(conn, project_name, [h for _, h in updates])
+            for row, (_, content_hash) in zip(res, updates):
+                await storage.store(project_name, content_hash, row["data"])
+            await conn.executemany(update_query, updates)
+        for row, (_, content_hash) in zip(res, updates):
+            await create_thumbnail_renditions(project_name, content_hash, row["data"])
+        count += len(updates)
+        logging.info(f"{project_name}: moved {count} thumbnails")
+    return count
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Thumbnail storage migration")
+    parser.add_argument("--project", help="Migrate only the given project")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    await ayon_init()
+
+    if get_thumbnail_storage() is None:
+        logging.error("Thumbnails are configured to be stored in the database")
+        return
+
+    if args.project:
+        project_names = [args.project]
+    else:
+        project_names = [project.name for project in await get_project_list()]
+
+    total = 0
+    for project_name in project_names:
+        total += await migrate_project(project_name, args.batch_size)
+
+    logging.goodnews(f"Moved {total} thumbnails to the thumbnail storage")
+    if total:
+        logging.info("Run VACUUM FULL on the thumbnails tables to reclaim space")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, TypeVar
+
+from nxtools import logging
+
+from ayon_server.config import ayonconfig
+from ayon_server.helpers.thumbnails import render_renditions
+from ayon_server.thumbnails.cache import cache_key, thumbnail_cache
+from ayon_server.thumbnails.renditions import (
+    RENDITION_FORMATS,
+    RENDITION_VARIANTS,
+    RENDITION_WIDTHS,
+    rendition_variant,
+)
+from ayon_server.thumbnails.storage import get_thumbnail_storage
+
+T = TypeVar("T")
+
+_executor: ProcessPoolExecutor | None = None
+
+
+async def run_in_rendition_pool(func: Callable[..., T], *args: Any) -> T:
+    """Run a CPU-bound image function in the worker process pool.
+
+    The pool is bounded by `thumbnail_rendition_workers`, so bursts
+    of uploads queue up instead of starving the server of CPU.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, ayonconfig.thumbnail_rendition_workers),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
+
+
+async def create_thumbnail_renditions(
+    project_name: str,
+    content_hash: str,
+    payload: bytes,
+) -> None:
+    """Render all renditions of a new thumbnail and store them"""
+    storage = get_thumbnail_storage()
+    if storage is None:
+        return
+
+    # The same payload has been uploaded before.
+    # Renditions are stored in order, so the last one marks completion
+    if await storage.exists(project_name, content_hash, RENDITION_VARIANTS[-1]):
+        return
+
+    formats = {pil_format: name for name, (pil_format, _) in RENDITION_FORMATS.items()}
+    try:
+        rendered = await run_in_rendition_pool(
+            render_renditions,
+            payload,
+            list(RENDITION_WIDTHS),
+            list(formats),
+        )
+    except Exception as e:
+        logging.warning(f"Unable to render renditions of thumbnail {content_hash}: {e}")
+        return
+
+    for (width, pil_format), data in rendered.items():
+        variant = rendition_variant(width, formats[pil_format])
+        await storage.store(project_name, content_hash, data, variant)
+
+
+async def load_thumbnail_rendition(
+    project_name: str,
+    content_hash: str,
+    width: int,
+    format_name: str,
+    load_original: Callable[[], Awaitable[bytes | None]],
+) -> bytes | None:
+    """Return a rendition of a thumbnail.
+
+    Renditions missing in the storage (thumbnails uploaded before
+    renditions were introduced or kept in the database) are rendered
+    from the original on demand. Returns None if the rendition cannot
+    be created.
+    """
+    variant = rendition_variant(width, format_name)
+    key = cache_key(content_hash, variant)
+    if (payload := thumbnail_cache.get(key)) is not None:
+        return payload
+
+    storage = get_thumbnail_storage()
+    if storage is not None:
+        payload = await storage.load(project_name, content_hash, variant)
+
+    if payload is None:
+        if (original := await load_original()) is None:
+            return None
+        pil_format = RENDITION_FORMATS[format_name][0]
+        try:
+            rendered = await run_in_rendition_pool(
+                render_renditions,
+                original,
+                [width],
+                [pil_format],
+            )
+        except Exception as e:
+            logging.warning(f"Unable to render thumbnail {content_hash}: {e}")
+            return None
+        payload = rendered[(width, pil_format)]
+        if storage is not None:
+            await storage.store(project_name, content_hash, payload, variant)
+
+    thumbnail_cache.put(key, payload)
+    return payload
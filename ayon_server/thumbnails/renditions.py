@@ -0,0 +1,47 @@
+"""Downscaled renditions of thumbnails.
+
+When a thumbnail is uploaded, a fixed set of renditions (each width
+in RENDITION_WIDTHS, in each of RENDITION_FORMATS) is rendered and
+stored alongside the original, so clients showing small icons do not
+need to download (and the server does not need to resize) full size
+images. Renditions are addressed by the content hash of the original
+and a variant name, such as `150.webp`.
+"""
+
+RENDITION_WIDTHS = (64, 150, 600)
+
+# Format name: (PIL format, mime type)
+RENDITION_FORMATS: dict[str, tuple[str, str]] = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+def rendition_variant(width: int, format_name: str) -> str:
+    return f"{width}.{format_name}"
+
+
+RENDITION_VARIANTS = [
+    rendition_variant(width, format_name)
+    for width in RENDITION_WIDTHS
+    for format_name in RENDITION_FORMATS
+]
+
+
+def select_rendition_width(size: int) -> int | None:
+    """Return the smallest rendition width not smaller than the size.
+
+    Returns None if the size exceeds the largest rendition,
+    in which case the original should be used.
+    """
+    for width in RENDITION_WIDTHS:
+        if width >= size:
+            return width
+    return None
+
+
+def select_rendition_format(accept: str | None) -> str:
+    """Use WebP for clients which accept it, JPEG otherwise"""
+    if accept and "image/webp" in accept:
+        return "webp"
+    return "jpeg"
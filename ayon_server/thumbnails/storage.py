@@ -0,0 +1,210 @@
+"""Thumbnail storage backends.
+
+Thumbnail payloads are stored outside the database, keyed by the hash
+of their content. Rows of project_X.thumbnails only keep the metadata
+(mime type and the content hash). Since the content of a hash never
+changes, stored files are never overwritten and identical thumbnails
+are stored only once per project.
+
+Rows created by older versions (or with `thumbnail_storage` set to
+`database`) keep the payload in the `data` column. Those are still
+served, and they may be moved to the storage backend using
+`python -m ayon_server.thumbnails.migrate`.
+
+A stored payload is deleted when no thumbnail refers to it anymore.
+Storing a payload (and committing the row referring to it) and
+checking whether it may be deleted are serialized per hash using
+`lock_thumbnail_payloads`, so an upload reusing an existing payload
+never ends up with a deleted file.
+"""
+
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+import aiofiles
+import aiofiles.os
+
+from ayon_server.config import ayonconfig
+from ayon_server.lib.postgres import Connection, Postgres
+from ayon_server.thumbnails.cache import cache_key, thumbnail_cache
+from ayon_server.thumbnails.renditions import RENDITION_VARIANTS
+from ayon_server.utils import create_uuid
+
+
+def thumbnail_hash(payload: bytes) -> str:
+    """Return the content hash of a thumbnail payload"""
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ThumbnailStorage(ABC):
+    """Base class of thumbnail storage backends"""
+
+    @abstractmethod
+    async def load(
+        self,
+        project_name: str,
+        content_hash: str,
+        variant: str | None = None,
+    ) -> bytes | None:
+        """Return the payload or None if it is not stored.
+
+        Variant selects a rendition of the payload (see renditions.py).
+        """
+
+    @abstractmethod
+    async def store(
+        self,
+        project_name: str,
+        content_hash: str,
+        payload: bytes,
+        variant: str | None = None,
+    ):
+        """Store the payload under its content hash"""
+
+    @abstractmethod
+    async def exists(
+        self,
+        project_name: str,
+        content_hash: str,
+        variant: str | None = None,
+    ) -> bool:
+        """Check whether the payload is stored"""
+
+    @abstractmethod
+    async def delete(
+        self,
+        project_name: str,
+        content_hash: str,
+        variant: str | None = None,
+    ) -> None:
+        """Delete the payload. Deleting a missing payload is not an error"""
+
+
+class FilesystemThumbnailStorage(ThumbnailStorage):
+    """Store thumbnails as files in the project data directory"""
+
+    def get_path(
+        self,
+        project_name: str,
+        content_hash: str,
+        variant: str | None = None,
+    ) -> str:
+        assert len(content_hash) == 64, "Invalid thumbnail hash"
+        filename = f"{content_hash}.{variant}" if variant else content_hash
+        return os.path.join(
+            ayonconfig.project_data_dir,
+            project_name,
+            "thumbnails",
+            content_hash[:2],
+            filename,
+        )
+
+    async def load(
+        self,
+        project_name: str,
+        content_hash: str,
+        variant: str | None = None,
+    ) -> bytes | None:
+        path = self.get_path(project_name, content_hash, variant)
+        try:
+            async with aiofiles.open(path, "rb") as f:
+                return await f.read()
+        except FileNotFoundError:
+            return None
+
+    async def store(
+        self,
+        project_name: str,
+        content_hash: str,
+        payload: bytes,
+        variant: str | None = None,
+    ):
+        path = self.get_path(project_name, content_hash, variant)
+        if await aiofiles.os.path.exists(path):
+            return
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first, so a partially written
+        # file is never served
+        temp_path = f"{path}.{create_uuid()}.tmp"
+        async with aiofiles.open(temp_path, "wb") as f:
+            await f.write(payload)
+        await aiofiles.os.replace(temp_path, path)
+
+    async def exists(
+        self,
+        project_name: str,
+        content_hash: str,
+        variant: str | None = None,
+    ) -> bool:
+        path = self.get_path(project_name, content_hash, variant)
+        return await aiofiles.os.path.exists(path)
+
+    async def delete(
+        self,
+        project_name: str,
+        content_hash: str,
+        variant: str | None = None,
+    ) -> None:
+        path = self.get_path(project_name, content_hash, variant)
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_thumbnail_storage() -> ThumbnailStorage | None:
+    """Return the configured storage backend.
+
+    Returns None if thumbnails are stored in the database.
+    """
+    if ayonconfig.thumbnail_storage == "database":
+        return None
+    return FilesystemThumbnailStorage()
+
+
+async def lock_thumbnail_payloads(
+    conn: Connection,
+    project_name: str,
+    hashes: Iterable[str],
+) -> None:
+    """Lock the payloads of the given hashes until the transaction ends.
+
+    Hold the lock while storing a payload and committing the row which
+    refers to it, and while releasing the payload.
+    """
+    for content_hash in sorted(set(hashes)):
+        await conn.execute(
+            "SELECT pg_advisory_xact_lock(hashtextextended($1, 0))",
+            f"project_{project_name}.thumbnails.{content_hash}",
+        )
+
+
+async def release_thumbnail_payloads(
+    project_name: str,
+    hashes: Iterable[str | None],
+) -> None:
+    """Delete stored payloads no thumbnail of the project refers to.
+
+    Called after thumbnails are deleted or their payload is replaced.
+    """
+    if (storage := get_thumbnail_storage()) is None:
+        return
+    candidates = list({h for h in hashes if h})
+    if not candidates:
+        return
+    query = f"""
+        SELECT DISTINCT hash FROM project_{project_name}.thumbnails
+        WHERE hash = ANY($1)
+    """
+    async with Postgres.acquire() as conn, conn.transaction():
+        await lock_thumbnail_payloads(conn, project_name, candidates)
+        referenced = {row["hash"] for row in await conn.fetch(query, candidates)}
+        for content_hash in candidates:
+            if content_hash in referenced:
+                continue
+            for variant in [None, *RENDITION_VARIANTS]:
+                thumbnail_cache.discard(cache_key(content_hash, variant))
+                await storage.delete(project_name, content_hash, variant)
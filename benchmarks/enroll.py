@@ -0,0 +1,243 @@
+"""Job enrollment benchmark.
+
+Seeds the events table with finished source events (most of them
+already processed) and measures how long it takes concurrent workers
+to enroll for the remaining jobs.
+
+Usage (in the server container):
+
+    python -m benchmarks.enroll --events 2000000 --workers 32 --jobs 2000
+
+Use --legacy to also time the original NOT IN query for comparison.
+All benchmark events are deleted at the end unless --keep is used.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from nxtools import logging
+
+from ayon_server.events import EventStream
+from ayon_server.events.enroll import enroll_job
+from ayon_server.initialize import ayon_init
+from ayon_server.lib.postgres import Postgres
+
+SOURCE_TOPIC = "benchmark.enroll.source"
+TARGET_TOPIC = "benchmark.enroll.target"
+SENDER = "benchmark"
+BATCH_SIZE = 100_000
+
+LEGACY_QUERY = """
+    WITH excluded_events AS (
+        SELECT depends_on
+        FROM events
+        WHERE topic = $2
+        AND (
+            status = 'finished'
+            OR (status = 'failed' AND retries > $3)
+        )
+    ),
+    source_events AS (
+        SELECT *
+        FROM events
+        WHERE topic LIKE $1
+        AND status = 'finished'
+        AND id NOT IN (SELECT depends_on FROM excluded_events)
+    )
+
+    SELECT
+        source_events.id AS source_id,
+        target_events.status AS target_status
+    FROM
+        source_events
+    LEFT JOIN events AS target_events
+    ON
+        target_events.depends_on = source_events.id
+        AND target_events.topic = $2
+    ORDER BY
+        source_events.created_at ASC
+    LIMIT 1000
+"""
+
+
+def summarize(name: str, timings: list[float]) -> None:
+    if not timings:
+        logging.info(f"{name}: no samples")
+        return
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    logging.info(
+        f"{name}: {len(timings)} samples, "
+        f"p50 {p50 * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms, "
+        f"max {timings[-1] * 1000:.1f} ms"
+    )
+
+
+async def seed(num_events: int, num_pending: int) -> None:
+    """Create source events. All but the newest `num_pending` are processed"""
+
+    num_processed = num_events - num_pending
+    start_time = time.monotonic()
+
+    for offset in range(0, num_events, BATCH_SIZE):
+        count = min(BATCH_SIZE, num_events - offset)
+        await Postgres.execute(
+            """
+            WITH sources AS (
+                INSERT INTO events
+                    (id, hash, topic, sender, status, created_at, updated_at)
+                SELECT
+                    gen_random_uuid(),
+                    'benchmark-source-' || i,
+                    $1,
+                    $2,
+                    'finished',
+                    now() - interval '1 millisecond' * ($4::INTEGER - i),
+                    now()
+                FROM generate_series($3::INTEGER, $3::INTEGER + $5 - 1) AS i
+                RETURNING id, hash, created_at
+            )
+            INSERT INTO events
+                (id, hash, topic, sender, depends_on, status, created_at, updated_at)
+            SELECT
+                gen_random_uuid(),
+                'benchmark-target-' || s.hash,
+                $6,
+                $2,
+                s.id,
+                'finished',
+                s.created_at,
+                now()
+            FROM sources s
+            WHERE substring(s.hash FROM 18)::INTEGER < $7
+            """,
+            SOURCE_TOPIC,
+            SENDER,
+            offset,
+            num_events,
+            count,
+            TARGET_TOPIC,
+            num_processed,
+            timeout=3600,
+        )
+        logging.debug(f"Seeded {offset + count} of {num_events} source events")
+
+    await Postgres.execute("ANALYZE events", timeout=3600)
+    elapsed = time.monotonic() - start_time
+    logging.info(
+        f"Seeded {num_events} source events ({num_processed} processed) "
+        f"in {elapsed:.1f}s"
+    )
+
+
+async def clean_up() -> None:
+    await Postgres.execute(
+        "DELETE FROM enroll_subscriptions WHERE target_topic = $1",
+        TARGET_TOPIC,
+    )
+    for topic in (TARGET_TOPIC, SOURCE_TOPIC):
+        await Postgres.execute(
+            "DELETE FROM events WHERE topic = $1",
+            topic,
+            timeout=3600,
+        )
+    logging.info("Benchmark events deleted")
+
+
+async def worker(
+    name: str,
+    jobs: list[str],
+    timings: list[float],
+    num_jobs: int,
+) -> None:
+    """Claim and finish jobs until `num_jobs` jobs are claimed in total"""
+    while len(jobs) < num_jobs:
+        start_time = time.monotonic()
+        job = await enroll_job(
+            SOURCE_TOPIC,
+            TARGET_TOPIC,
+            sender=name,
+            user_name=SENDER,
+        )
+        timings.append(time.monotonic() - start_time)
+        if job is None:
+            return
+        jobs.append(job.depends_on)
+        await EventStream.update(job.id, status="finished")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Job enrollment benchmark")
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--pending", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--legacy", action="store_true")
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    await ayon_init()
+    await clean_up()
+    await seed(args.events, args.pending)
+
+    try:
+        if args.legacy:
+            timings: list[float] = []
+            for _ in range(5):
+                start_time = time.monotonic()
+                await Postgres.fetch(
+                    LEGACY_QUERY,
+                    SOURCE_TOPIC,
+                    TARGET_TOPIC,
+                    3,
+                    timeout=3600,
+                )
+                timings.append(time.monotonic() - start_time)
+            summarize("Legacy candidate query", timings)
+
+        # The first enroll call creates the subscription
+        # and collects pending events
+
+        start_time = time.monotonic()
+        jobs: list[str] = []
+        first_timings: list[float] = []
+        await worker(f"{SENDER}-0", jobs, first_timings, 1)
+        logging.info(
+            "Subscription created and first job claimed "
+            f"in {time.monotonic() - start_time:.2f}s"
+        )
+
+        # Concurrent workers, each with its own sender name
+
+        start_time = time.monotonic()
+        worker_timings: list[list[float]] = [[] for _ in range(args.workers)]
+        await asyncio.gather(
+            *[
+                worker(f"{SENDER}-{i + 1}", jobs, t, args.jobs)
+                for i, t in enumerate(worker_timings)
+            ],
+        )
+        elapsed = time.monotonic() - start_time
+
+        summarize("Enroll", [t for w in worker_timings for t in w])
+        logging.info(
+            f"{len(jobs)} jobs claimed by {args.workers} workers "
+            f"in {elapsed:.2f}s ({len(jobs) / elapsed:.1f} jobs/s)"
+        )
+
+        if len(set(jobs)) != len(jobs):
+            logging.error(f"{len(jobs) - len(set(jobs))} source events claimed twice")
+        else:
+            logging.goodnews("No source event was claimed twice")
+
+    finally:
+        if not args.keep:
+            await clean_up()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""Video range request benchmark.
+
+Simulates reviewers scrubbing through a video: concurrent clients
+request random byte ranges (open-ended, as browsers do, and multi-range)
+of a test file. Responses are produced by `range_requests_response`
+and sent to a discarding ASGI `send`, so the benchmark measures
+the server side only: throughput and the peak memory allocated while
+serving the requests.
+
+Usage (in the server container):
+
+    python -m benchmarks.video_ranges --size 500 --clients 64 --requests 50
+
+Use --legacy to also time reading whole ranges into memory (the way
+ranges were served before) for comparison.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from fastapi import Request, Response
+from nxtools import logging
+
+from api.files.video import MAX_CHUNK_SIZE, range_requests_response
+
+
+def summarize(name: str, timings: list[float], sent: int, peak: int) -> None:
+    timings = sorted(timings)
+    total = sum(timings)
+    p50 = statistics.median(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    logging.info(
+        f"{name}: {len(timings)} requests, "
+        f"{sent / 1024 / 1024:.0f} MB sent, "
+        f"p50 {p50 * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms, "
+        f"mean {total / len(timings) * 1000:.1f} ms, "
+        f"peak memory {peak / 1024 / 1024:.1f} MB"
+    )
+
+
+def random_range_header(file_size: int) -> str:
+    """Return a Range header a scrubbing video player might send"""
+    roll = random.random()
+    start = random.randrange(0, file_size - 1)
+    if roll < 0.7:
+        return f"bytes={start}-"
+    if roll < 0.9:
+        end = min(file_size - 1, start + random.randrange(1, MAX_CHUNK_SIZE))
+        return f"bytes={start}-{end}"
+    starts = sorted(random.sample(range(0, file_size - 1), 4))
+    return "bytes=" + ",".join(
+        f"{s}-{min(file_size - 1, s + random.randrange(1, 1024 * 512))}" for s in starts
+    )
+
+
+def make_request(range_header: str) -> Request:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": [
+            (b"range", range_header.encode("ascii")),
+            (b"user-agent", b"benchmark"),
+        ],
+    }
+    return Request(scope)
+
+
+async def legacy_response(request: Request, file_path: str) -> Response:
+    """Read the requested range into memory, as ranges were served before"""
+    response = await range_requests_response(request, file_path, "video/mp4")
+    payload = b""
+    with open(file_path, "rb") as f:
+        for _, start, end in response.parts:
+            f.seek(start)
+            payload += f.read(end - start + 1)
+    return Response(content=payload, status_code=response.status_code)
+
+
+async def run_client(
+    file_path: str,
+    file_size: int,
+    num_requests: int,
+    timings: list[float],
+    sent: list[int],
+    legacy: bool,
+) -> None:
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            sent[0] += len(message.get("body", b""))
+        # Yield to other clients, as a socket write would
+        await asyncio.sleep(0)
+
+    for _ in range(num_requests):
+        request = make_request(random_range_header(file_size))
+        start_time = time.monotonic()
+        if legacy:
+            response = await legacy_response(request, file_path)
+        else:
+            response = await range_requests_response(request, file_path, "video/mp4")
+        await response(request.scope, receive, send)
+        timings.append(time.monotonic() - start_time)
+
+
+async def run(file_path: str, args: argparse.Namespace, legacy: bool) -> None:
+    file_size = os.stat(file_path).st_size
+    timings: list[float] = []
+    sent = [0]
+
+    tracemalloc.start()
+    await asyncio.gather(
+        *[
+            run_client(file_path, file_size, args.requests, timings, sent, legacy)
+            for _ in range(args.clients)
+        ]
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summarize("legacy" if legacy else "streaming", timings, sent[0], peak)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Video range request benchmark")
+    parser.add_argument("--size", type=int, default=500, help="File size in MB")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4") as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size):
+            f.write(block)
+        f.flush()
+
+        await run(f.name, args, legacy=False)
+        if args.legacy:
+            await run(f.name, args, legacy=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -77,13 +77,6 @@ class DemoGen:
             tasks.append(self.create_branch(**folder_data))
 
         await asyncio.gather(*tasks)
-        logging.info("Refreshing views")
-        await Postgres.execute(
-            f"""
-            REFRESH MATERIALIZED VIEW project_{self.project.name}.hierarchy;
-            REFRESH MATERIALIZED VIEW project_{self.project.name}.version_list;
-            """
-        )
 
         elapsed_time = time.monotonic() - start_time
         logging.info(f"{self.folder_count} folders created")
@@ -5,11 +5,13 @@
 CREATE TABLE thumbnails(
     id UUID NOT NULL PRIMARY KEY,
     mime VARCHAR NOT NULL,
-    data BYTEA NOT NULL,
+    data BYTEA,
+    hash VARCHAR,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
  
 ALTER TABLE thumbnails ALTER COLUMN data SET STORAGE EXTERNAL;
+CREATE INDEX thumbnail_hash_idx ON thumbnails(hash);
 
 
 CREATE TABLE task_types(
@@ -159,6 +161,7 @@ CREATE TABLE folders(
 
 CREATE INDEX folder_parent_idx ON folders(parent_id);
 CREATE UNIQUE INDEX folder_creation_order_idx ON folders(creation_order);
+CREATE INDEX folder_thumbnail_idx ON folders(thumbnail_id) WHERE thumbnail_id IS NOT NULL;
 
 -- Two partial indices are used as a workaround for root folders (which have parent_id NULL)
 
@@ -169,30 +172,21 @@ CREATE UNIQUE INDEX folder_root_unique_name ON folders (name)
     WHERE (active IS TRUE AND parent_id IS NULL);
 
 
--- Hierarchy view
--- Materialized view used as a shorthand to get folder parents/full path
-
-CREATE MATERIALIZED VIEW hierarchy 
-AS 
-    WITH htable AS (
-        WITH RECURSIVE hierarchy AS (
-            SELECT id, name, parent_id, 1 as pos, id as base_id
-            FROM
-                folders
-            UNION
-                SELECT e.id, e.name, e.parent_id, pos + 1, base_id
-                FROM folders e
-                INNER JOIN hierarchy s ON s.parent_id = e.id
-        ) SELECT
-            base_id,
-            string_agg(name, '/' ORDER BY pos DESC) as path
-        FROM
-            hierarchy
-        GROUP BY base_id
-   )
-   SELECT base_id AS id, path FROM htable;
-
-CREATE UNIQUE INDEX hierarchy_id ON hierarchy (id);
+-- Hierarchy table
+-- Used as a shorthand to get folder parents/full path.
+-- Maintained by a trigger on the folders table (see public.update_folder_hierarchy),
+-- so creating, renaming or moving a folder only touches the affected subtree.
+
+CREATE TABLE hierarchy(
+    id UUID NOT NULL PRIMARY KEY REFERENCES folders(id) ON DELETE CASCADE,
+    path VARCHAR NOT NULL
+);
+
+CREATE INDEX hierarchy_path_idx ON hierarchy (path varchar_pattern_ops);
+
+CREATE TRIGGER folder_hierarchy_trigger
+    AFTER INSERT OR UPDATE OF name, parent_id ON folders
+    FOR EACH ROW EXECUTE FUNCTION public.update_folder_hierarchy();
 
 
 CREATE TABLE exported_attributes(
@@ -226,9 +220,44 @@ CREATE TABLE tasks(
 
 CREATE INDEX task_parent_idx ON tasks(folder_id);
 CREATE INDEX task_type_idx ON tasks(task_type);
+CREATE INDEX task_thumbnail_idx ON tasks(thumbnail_id) WHERE thumbnail_id IS NOT NULL;
 CREATE UNIQUE INDEX task_creation_order_idx ON tasks(creation_order);
 CREATE UNIQUE INDEX task_unique_name ON tasks(folder_id, name);
 
+-- Folder access of users with "assigned" access depends on task assignees
+-- and folder paths (see public.bump_folder_access_revision). The triggers
+-- are deferred, so the revision is bumped once per transaction at commit.
+
+CREATE CONSTRAINT TRIGGER task_access_insert_trigger
+    AFTER INSERT ON tasks
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW WHEN (cardinality(NEW.assignees) > 0)
+    EXECUTE FUNCTION public.bump_folder_access_revision();
+
+CREATE CONSTRAINT TRIGGER task_access_update_trigger
+    AFTER UPDATE OF assignees, folder_id ON tasks
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW WHEN (
+        OLD.assignees IS DISTINCT FROM NEW.assignees
+        OR OLD.folder_id IS DISTINCT FROM NEW.folder_id
+    )
+    EXECUTE FUNCTION public.bump_folder_access_revision();
+
+CREATE CONSTRAINT TRIGGER task_access_delete_trigger
+    AFTER DELETE ON tasks
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW WHEN (cardinality(OLD.assignees) > 0)
+    EXECUTE FUNCTION public.bump_folder_access_revision();
+
+CREATE CONSTRAINT TRIGGER folder_access_update_trigger
+    AFTER UPDATE OF name, parent_id ON folders
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW WHEN (
+        OLD.name IS DISTINCT FROM NEW.name
+        OR OLD.parent_id IS DISTINCT FROM NEW.parent_id
+    )
+    EXECUTE FUNCTION public.bump_folder_access_revision();
+
 -------------
 -- PRODUCTS --
 -------------
@@ -280,22 +309,23 @@ CREATE TABLE versions(
 
 CREATE INDEX version_parent_idx ON versions(product_id);
 CREATE UNIQUE INDEX version_creation_order_idx ON versions(creation_order);
+CREATE INDEX version_thumbnail_idx ON versions(thumbnail_id) WHERE thumbnail_id IS NOT NULL;
 CREATE UNIQUE INDEX version_unique_version_parent ON versions (product_id, version) WHERE (active IS TRUE);
 
--- Version list VIEW
--- Materialized view used as a shorthand to get product versions
+-- Version list
+-- Used as a shorthand to get product versions.
+-- Maintained by a trigger on the versions table (see public.update_version_list),
+-- so saving a version only recomputes the list of its product.
 
-CREATE MATERIALIZED VIEW version_list
-AS
-    SELECT
-        v.product_id AS product_id,
-        array_agg(v.id ORDER BY v.version ) AS ids, 
-        array_agg(v.version ORDER BY v.version ) AS versions
-    FROM
-        versions AS v
-    GROUP BY v.product_id;
+CREATE TABLE version_list(
+    product_id UUID NOT NULL PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+    ids UUID[] NOT NULL,
+    versions INTEGER[] NOT NULL
+);
 
-CREATE UNIQUE INDEX version_list_id ON version_list (product_id);
+CREATE TRIGGER version_list_trigger
+    AFTER INSERT OR DELETE OR UPDATE OF product_id, version ON versions
+    FOR EACH ROW EXECUTE FUNCTION public.update_version_list();
 
 ---------------------
 -- REPRESENTATIONS --
@@ -346,6 +376,8 @@ CREATE TABLE workfiles(
     creation_order SERIAL NOT NULL
 );
 
+CREATE INDEX workfile_thumbnail_idx ON workfiles(thumbnail_id) WHERE thumbnail_id IS NOT NULL;
+
 -----------
 -- LINKS --
 -----------
@@ -405,6 +437,25 @@ CREATE TABLE project_site_settings(
   PRIMARY KEY (addon_name, addon_version, site_id, user_name)
 );
 
+CREATE TRIGGER settings_revision_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON settings
+FOR EACH STATEMENT EXECUTE FUNCTION public.bump_settings_revision();
+
+CREATE TRIGGER settings_revision_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON project_site_settings
+FOR EACH STATEMENT EXECUTE FUNCTION public.bump_settings_revision();
+
+-- Settings snapshots of a previously deleted project with the same name
+-- must not be reused
+UPDATE public.settings_revision SET revision = revision + 1 WHERE id = 1;
+
+-- Cached folder access sets of a previously deleted project
+-- with the same name must not be reused either
+INSERT INTO public.folder_access_revision (project_schema, revision)
+VALUES (current_schema(), 1)
+ON CONFLICT (project_schema)
+DO UPDATE SET revision = public.folder_access_revision.revision + 1;
+
 CREATE TABLE IF NOT EXISTS addon_data(
   addon_name VARCHAR NOT NULL,
   addon_version VARCHAR NOT NULL,
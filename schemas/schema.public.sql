@@ -323,3 +323,523 @@ BEGIN
     END LOOP;
 END;
 $$ LANGUAGE plpgsql;
+
+
+---------------
+-- HIERARCHY --
+---------------
+
+-- Keeps project_*.hierarchy in sync with project_*.folders.
+-- On insert, only the new row is added. On rename or move, paths of the
+-- folder and its descendants are rewritten (cost scales with the subtree size).
+-- Deletes are handled by ON DELETE CASCADE of the hierarchy table.
+
+CREATE OR REPLACE FUNCTION public.update_folder_hierarchy()
+RETURNS TRIGGER AS $$
+DECLARE
+    parent_path VARCHAR;
+    new_path VARCHAR;
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND NEW.name = OLD.name
+        AND NEW.parent_id IS NOT DISTINCT FROM OLD.parent_id
+    THEN
+        RETURN NULL;
+    END IF;
+
+    IF NEW.parent_id IS NULL THEN
+        new_path := NEW.name;
+    ELSE
+        EXECUTE format(
+            'SELECT path FROM %I.hierarchy WHERE id = $1', TG_TABLE_SCHEMA
+        ) INTO parent_path USING NEW.parent_id;
+
+        IF parent_path IS NULL THEN
+            -- Parent is not indexed yet (should not happen).
+            -- Resolve its path by walking up the folders table.
+            EXECUTE format('
+                WITH RECURSIVE ancestors AS (
+                    SELECT id, name, parent_id, 1 AS pos
+                    FROM %1$I.folders WHERE id = $1
+                    UNION ALL
+                    SELECT f.id, f.name, f.parent_id, a.pos + 1
+                    FROM %1$I.folders f
+                    INNER JOIN ancestors a ON a.parent_id = f.id
+                )
+                SELECT string_agg(name, ''/'' ORDER BY pos DESC) FROM ancestors
+            ', TG_TABLE_SCHEMA) INTO parent_path USING NEW.parent_id;
+        END IF;
+
+        new_path := parent_path || '/' || NEW.name;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        EXECUTE format('
+            INSERT INTO %I.hierarchy (id, path) VALUES ($1, $2)
+            ON CONFLICT (id) DO UPDATE SET path = EXCLUDED.path
+        ', TG_TABLE_SCHEMA) USING NEW.id, new_path;
+        RETURN NULL;
+    END IF;
+
+    EXECUTE format('
+        WITH RECURSIVE subtree AS (
+            SELECT id, $2::VARCHAR AS path
+            FROM %1$I.folders WHERE id = $1
+            UNION ALL
+            SELECT f.id, s.path || ''/'' || f.name
+            FROM %1$I.folders f
+            INNER JOIN subtree s ON f.parent_id = s.id
+        )
+        INSERT INTO %1$I.hierarchy (id, path)
+        SELECT id, path FROM subtree
+        ON CONFLICT (id) DO UPDATE SET path = EXCLUDED.path
+        WHERE %1$I.hierarchy.path IS DISTINCT FROM EXCLUDED.path
+    ', TG_TABLE_SCHEMA) USING NEW.id, new_path;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Replace hierarchy materialized views created by older versions
+-- with the trigger maintained table
+
+DO $$
+DECLARE
+    rec RECORD;
+BEGIN
+    FOR rec IN
+        SELECT schemaname FROM pg_matviews
+        WHERE matviewname = 'hierarchy' AND schemaname LIKE 'project_%'
+    LOOP
+        RAISE WARNING 'Migrating hierarchy in %', rec.schemaname;
+        EXECUTE format('DROP MATERIALIZED VIEW %I.hierarchy', rec.schemaname);
+        EXECUTE format('
+            CREATE TABLE %1$I.hierarchy(
+                id UUID NOT NULL PRIMARY KEY
+                    REFERENCES %1$I.folders(id) ON DELETE CASCADE,
+                path VARCHAR NOT NULL
+            )', rec.schemaname);
+
+        EXECUTE format('
+            INSERT INTO %1$I.hierarchy (id, path)
+            WITH RECURSIVE paths AS (
+                SELECT id, name::VARCHAR AS path
+                FROM %1$I.folders WHERE parent_id IS NULL
+                UNION ALL
+                SELECT f.id, p.path || ''/'' || f.name
+                FROM %1$I.folders f
+                INNER JOIN paths p ON f.parent_id = p.id
+            ) SELECT id, path FROM paths
+        ', rec.schemaname);
+
+        EXECUTE format(
+            'CREATE INDEX hierarchy_path_idx ON %I.hierarchy (path varchar_pattern_ops)',
+            rec.schemaname
+        );
+        EXECUTE format('
+            CREATE TRIGGER folder_hierarchy_trigger
+            AFTER INSERT OR UPDATE OF name, parent_id ON %I.folders
+            FOR EACH ROW EXECUTE FUNCTION public.update_folder_hierarchy()
+        ', rec.schemaname);
+    END LOOP;
+END $$;
+
+
+------------------
+-- VERSION LIST --
+------------------
+
+-- Keeps project_*.version_list in sync with project_*.versions.
+-- Only the list of the affected product is recomputed (using the
+-- version_parent_idx index), so the cost does not depend on the project size.
+-- The advisory lock serializes maintenance of a single product's list,
+-- so concurrent transactions adding versions to the same product
+-- see each other's committed rows and none of them is lost.
+
+CREATE OR REPLACE FUNCTION public.update_version_list()
+RETURNS TRIGGER AS $$
+DECLARE
+    product_ids UUID[];
+    pid UUID;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        product_ids := ARRAY[NEW.product_id];
+    ELSIF TG_OP = 'DELETE' THEN
+        product_ids := ARRAY[OLD.product_id];
+    ELSIF NEW.product_id IS DISTINCT FROM OLD.product_id THEN
+        product_ids := ARRAY[OLD.product_id, NEW.product_id];
+    ELSIF NEW.version IS DISTINCT FROM OLD.version THEN
+        product_ids := ARRAY[NEW.product_id];
+    ELSE
+        RETURN NULL;
+    END IF;
+
+    FOREACH pid IN ARRAY product_ids LOOP
+        PERFORM pg_advisory_xact_lock(
+            hashtextextended(TG_TABLE_SCHEMA || '.version_list.' || pid::TEXT, 0)
+        );
+        EXECUTE format('
+            WITH agg AS (
+                SELECT
+                    array_agg(id ORDER BY version) AS ids,
+                    array_agg(version ORDER BY version) AS versions
+                FROM %1$I.versions WHERE product_id = $1
+            ),
+            upserted AS (
+                INSERT INTO %1$I.version_list (product_id, ids, versions)
+                SELECT $1, ids, versions FROM agg WHERE ids IS NOT NULL
+                ON CONFLICT (product_id) DO UPDATE
+                SET ids = EXCLUDED.ids, versions = EXCLUDED.versions
+            )
+            DELETE FROM %1$I.version_list
+            WHERE product_id = $1 AND (SELECT ids FROM agg) IS NULL
+        ', TG_TABLE_SCHEMA) USING pid;
+    END LOOP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Replace version_list materialized views created by older versions
+-- with the trigger maintained table
+
+DO $$
+DECLARE
+    rec RECORD;
+BEGIN
+    FOR rec IN
+        SELECT schemaname FROM pg_matviews
+        WHERE matviewname = 'version_list' AND schemaname LIKE 'project_%'
+    LOOP
+        RAISE WARNING 'Migrating version_list in %', rec.schemaname;
+        EXECUTE format('DROP MATERIALIZED VIEW %I.version_list', rec.schemaname);
+        EXECUTE format('
+            CREATE TABLE %1$I.version_list(
+                product_id UUID NOT NULL PRIMARY KEY
+                    REFERENCES %1$I.products(id) ON DELETE CASCADE,
+                ids UUID[] NOT NULL,
+                versions INTEGER[] NOT NULL
+            )', rec.schemaname);
+
+        EXECUTE format('
+            INSERT INTO %1$I.version_list (product_id, ids, versions)
+            SELECT
+                product_id,
+                array_agg(id ORDER BY version),
+                array_agg(version ORDER BY version)
+            FROM %1$I.versions
+            GROUP BY product_id
+        ', rec.schemaname);
+
+        EXECUTE format('
+            CREATE TRIGGER version_list_trigger
+            AFTER INSERT OR DELETE OR UPDATE OF product_id, version ON %I.versions
+            FOR EACH ROW EXECUTE FUNCTION public.update_version_list()
+        ', rec.schemaname);
+    END LOOP;
+END $$;
+
+
+----------------
+-- ENROLLMENT --
+----------------
+
+-- Source events waiting to be processed by enroll subscribers.
+-- A subscription is a (source topics, target topic) pair registered by
+-- the first call to enroll. Rows are added when a matching source event
+-- finishes (or its target event is restarted) and removed when the target
+-- event finishes or fails more than max_retries times, so workers never
+-- scan already processed events.
+
+CREATE TABLE IF NOT EXISTS public.enroll_subscriptions(
+  id SERIAL PRIMARY KEY,
+  source_topics VARCHAR[] NOT NULL,
+  is_pattern BOOLEAN NOT NULL DEFAULT FALSE,
+  target_topic VARCHAR NOT NULL,
+  max_retries INTEGER NOT NULL DEFAULT 3,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  last_used_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE public.enroll_subscriptions
+ADD COLUMN IF NOT EXISTS max_retries INTEGER NOT NULL DEFAULT 3;
+
+CREATE UNIQUE INDEX IF NOT EXISTS enroll_subscription_idx
+  ON public.enroll_subscriptions(source_topics, is_pattern, target_topic);
+
+CREATE TABLE IF NOT EXISTS public.enroll_pending(
+  subscription_id INTEGER NOT NULL
+    REFERENCES public.enroll_subscriptions(id) ON DELETE CASCADE,
+  source_id UUID NOT NULL
+    REFERENCES public.events(id) ON DELETE CASCADE,
+  created_at TIMESTAMPTZ NOT NULL,
+  PRIMARY KEY (subscription_id, source_id)
+);
+
+CREATE INDEX IF NOT EXISTS enroll_pending_order_idx
+  ON public.enroll_pending(subscription_id, created_at);
+CREATE INDEX IF NOT EXISTS enroll_pending_source_idx
+  ON public.enroll_pending(source_id);
+
+-- Lookup of finished target events of a source event
+CREATE INDEX IF NOT EXISTS event_finished_target_idx
+  ON public.events(depends_on, topic)
+  WHERE depends_on IS NOT NULL AND status = 'finished';
+
+
+CREATE OR REPLACE FUNCTION public.update_enroll_pending()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.status = OLD.status THEN
+        RETURN NULL;
+    END IF;
+
+    -- Finished source event: queue it for all matching subscriptions
+    -- unless it has already been processed
+
+    IF NEW.status = 'finished' THEN
+        INSERT INTO public.enroll_pending (subscription_id, source_id, created_at)
+        SELECT s.id, NEW.id, NEW.created_at
+        FROM public.enroll_subscriptions s
+        WHERE (
+            (s.is_pattern AND NEW.topic LIKE s.source_topics[1])
+            OR (NOT s.is_pattern AND NEW.topic = ANY(s.source_topics))
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM public.events t
+            WHERE t.depends_on = NEW.id
+            AND t.topic = s.target_topic
+            AND t.status = 'finished'
+        )
+        ON CONFLICT DO NOTHING;
+    END IF;
+
+    IF NEW.depends_on IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF NEW.status = 'finished' THEN
+        -- Finished target event: its source event is processed
+
+        DELETE FROM public.enroll_pending p
+        USING public.enroll_subscriptions s
+        WHERE p.subscription_id = s.id
+        AND p.source_id = NEW.depends_on
+        AND s.target_topic = NEW.topic;
+
+    ELSIF NEW.status = 'failed' THEN
+        -- Target event failed for the last time: it won't be retried
+
+        DELETE FROM public.enroll_pending p
+        USING public.enroll_subscriptions s
+        WHERE p.subscription_id = s.id
+        AND p.source_id = NEW.depends_on
+        AND s.target_topic = NEW.topic
+        AND NEW.retries > s.max_retries;
+
+    ELSIF TG_OP = 'UPDATE' AND OLD.status IN ('finished', 'failed') THEN
+        -- Restarted target event: process the source event again
+
+        INSERT INTO public.enroll_pending (subscription_id, source_id, created_at)
+        SELECT s.id, e.id, e.created_at
+        FROM public.enroll_subscriptions s
+        INNER JOIN public.events e ON e.id = NEW.depends_on
+        WHERE s.target_topic = NEW.topic
+        AND e.status = 'finished'
+        AND (
+            (s.is_pattern AND e.topic LIKE s.source_topics[1])
+            OR (NOT s.is_pattern AND e.topic = ANY(s.source_topics))
+        )
+        ON CONFLICT DO NOTHING;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS enroll_pending_trigger ON public.events;
+CREATE TRIGGER enroll_pending_trigger
+AFTER INSERT OR UPDATE OF status ON public.events
+FOR EACH ROW EXECUTE FUNCTION public.update_enroll_pending();
+
+
+-----------------------
+-- SETTINGS REVISION --
+-----------------------
+
+-- Global revision of addon settings overrides. It is bumped by every
+-- statement modifying studio, site or project settings tables and it is
+-- used to validate precomputed settings snapshots.
+
+CREATE TABLE IF NOT EXISTS public.settings_revision(
+  id INTEGER NOT NULL PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  revision BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO public.settings_revision (id) VALUES (1) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.bump_settings_revision()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.settings_revision SET revision = revision + 1 WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS settings_revision_trigger ON public.settings;
+CREATE TRIGGER settings_revision_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.settings
+FOR EACH STATEMENT EXECUTE FUNCTION public.bump_settings_revision();
+
+DROP TRIGGER IF EXISTS settings_revision_trigger ON public.site_settings;
+CREATE TRIGGER settings_revision_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.site_settings
+FOR EACH STATEMENT EXECUTE FUNCTION public.bump_settings_revision();
+
+-- Install the triggers in projects created by older versions
+
+DO $$
+DECLARE
+    rec RECORD;
+    tbl VARCHAR;
+BEGIN
+    FOR rec IN
+        SELECT nspname FROM pg_namespace WHERE nspname LIKE 'project_%'
+    LOOP
+        FOREACH tbl IN ARRAY ARRAY['settings', 'project_site_settings']
+        LOOP
+            IF to_regclass(format('%I.%I', rec.nspname, tbl)) IS NULL THEN
+                CONTINUE;
+            END IF;
+            IF EXISTS (
+                SELECT 1 FROM pg_trigger
+                WHERE tgname = 'settings_revision_trigger'
+                AND tgrelid = to_regclass(format('%I.%I', rec.nspname, tbl))
+            ) THEN
+                CONTINUE;
+            END IF;
+            EXECUTE format('
+                CREATE TRIGGER settings_revision_trigger
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I.%I
+                FOR EACH STATEMENT EXECUTE FUNCTION public.bump_settings_revision()
+            ', rec.nspname, tbl);
+        END LOOP;
+    END LOOP;
+END $$;
+
+
+---------------------
+-- PENDING COMMITS --
+---------------------
+
+-- Folders changed since the last (deferred) commit of their project.
+-- Rows are added in the same transaction as the folder change
+-- and removed when the commit scheduler rebuilds the derived data.
+
+CREATE TABLE IF NOT EXISTS public.pending_commits(
+    project_name VARCHAR NOT NULL
+        REFERENCES public.projects(name) ON DELETE CASCADE ON UPDATE CASCADE,
+    folder_id UUID NOT NULL,
+    first_queued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    queued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (project_name, folder_id)
+);
+
+
+----------------------------
+-- FOLDER ACCESS REVISION --
+----------------------------
+
+-- Per-project revision of data "assigned" folder access depends on:
+-- task assignees and folder paths. It is bumped by deferred row triggers
+-- on project_*.tasks and project_*.folders (only when the relevant columns
+-- actually change) and it is used to validate cached folder access sets.
+
+CREATE TABLE IF NOT EXISTS public.folder_access_revision(
+    project_schema VARCHAR NOT NULL PRIMARY KEY,
+    revision BIGINT NOT NULL DEFAULT 0,
+    bumped_by BIGINT
+);
+
+ALTER TABLE public.folder_access_revision
+ADD COLUMN IF NOT EXISTS bumped_by BIGINT;
+
+-- The triggers fire at commit, so concurrent transactions only contend
+-- for the revision row while committing. Only the first trigger of
+-- a transaction writes the row, the others find it already bumped.
+
+CREATE OR REPLACE FUNCTION public.bump_folder_access_revision()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.folder_access_revision
+        (project_schema, revision, bumped_by)
+    VALUES (TG_TABLE_SCHEMA, 1, txid_current())
+    ON CONFLICT (project_schema)
+    DO UPDATE SET
+        revision = public.folder_access_revision.revision + 1,
+        bumped_by = EXCLUDED.bumped_by
+    WHERE public.folder_access_revision.bumped_by
+        IS DISTINCT FROM EXCLUDED.bumped_by;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Install the (deferred) triggers in projects created by older versions
+
+DO $$
+DECLARE rec RECORD;
+BEGIN
+    FOR rec IN
+        SELECT nspname FROM pg_namespace WHERE nspname LIKE 'project_%'
+    LOOP
+        IF to_regclass(format('%I.tasks', rec.nspname)) IS NULL THEN
+            CONTINUE;
+        END IF;
+        IF EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = 'task_access_update_trigger'
+            AND tgrelid = to_regclass(format('%I.tasks', rec.nspname))
+            AND tgconstraint <> 0
+        ) THEN
+            CONTINUE;
+        END IF;
+        EXECUTE format('
+            DROP TRIGGER IF EXISTS task_access_insert_trigger ON %1$I.tasks;
+            DROP TRIGGER IF EXISTS task_access_update_trigger ON %1$I.tasks;
+            DROP TRIGGER IF EXISTS task_access_delete_trigger ON %1$I.tasks;
+            DROP TRIGGER IF EXISTS folder_access_update_trigger ON %1$I.folders;
+
+            CREATE CONSTRAINT TRIGGER task_access_insert_trigger
+            AFTER INSERT ON %1$I.tasks
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW WHEN (cardinality(NEW.assignees) > 0)
+            EXECUTE FUNCTION public.bump_folder_access_revision();
+
+            CREATE CONSTRAINT TRIGGER task_access_update_trigger
+            AFTER UPDATE OF assignees, folder_id ON %1$I.tasks
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW WHEN (
+                OLD.assignees IS DISTINCT FROM NEW.assignees
+                OR OLD.folder_id IS DISTINCT FROM NEW.folder_id
+            )
+            EXECUTE FUNCTION public.bump_folder_access_revision();
+
+            CREATE CONSTRAINT TRIGGER task_access_delete_trigger
+            AFTER DELETE ON %1$I.tasks
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW WHEN (cardinality(OLD.assignees) > 0)
+            EXECUTE FUNCTION public.bump_folder_access_revision();
+
+            CREATE CONSTRAINT TRIGGER folder_access_update_trigger
+            AFTER UPDATE OF name, parent_id ON %1$I.folders
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW WHEN (
+                OLD.name IS DISTINCT FROM NEW.name
+                OR OLD.parent_id IS DISTINCT FROM NEW.parent_id
+            )
+            EXECUTE FUNCTION public.bump_folder_access_revision();
+        ', rec.nspname);
+    END LOOP;
+END $$;
@@ -437,3 +437,47 @@ BEGIN
     END LOOP;
 END $$;
 
+
+-- Thumbnail payloads are stored outside the database, addressed
+-- by their content hash. Allow rows without data and add the hash column
+
+DO $$
+DECLARE rec RECORD;
+BEGIN
+    FOR rec IN
+        SELECT nspname FROM pg_namespace WHERE nspname LIKE 'project_%'
+    LOOP
+        IF to_regclass(format('%I.thumbnails', rec.nspname)) IS NULL THEN
+            CONTINUE;
+        END IF;
+        EXECUTE format('
+            ALTER TABLE %1$I.thumbnails ADD COLUMN IF NOT EXISTS hash VARCHAR;
+            ALTER TABLE %1$I.thumbnails ALTER COLUMN data DROP NOT NULL;
+            CREATE INDEX IF NOT EXISTS thumbnail_hash_idx
+                ON %1$I.thumbnails(hash);
+        ', rec.nspname);
+    END LOOP;
+END $$;
+
+-- Index entity references to thumbnails, so entities using a thumbnail
+-- are found without scanning the entity tables
+
+DO $$
+DECLARE rec RECORD;
+DECLARE entity_type VARCHAR;
+BEGIN
+    FOR rec IN
+        SELECT nspname FROM pg_namespace WHERE nspname LIKE 'project_%'
+    LOOP
+        FOREACH entity_type IN ARRAY ARRAY['folder', 'task', 'version', 'workfile']
+        LOOP
+            IF to_regclass(format('%I.%ss', rec.nspname, entity_type)) IS NULL THEN
+                CONTINUE;
+            END IF;
+            EXECUTE format('
+                CREATE INDEX IF NOT EXISTS %2$s_thumbnail_idx
+                ON %1$I.%2$ss(thumbnail_id) WHERE thumbnail_id IS NOT NULL;
+            ', rec.nspname, entity_type);
+        END LOOP;
+    END LOOP;
+END $$;
@@ -0,0 +1,155 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from api.operations import bulk
+from api.operations.bulk import BulkFallback, plan_batches, process_bulk_operations
+from api.operations.models import OperationModel
+
+
+def operation(op_type: str, entity_type: str, entity_id: str | None = None):
+    return OperationModel(type=op_type, entity_type=entity_type, entity_id=entity_id)
+
+
+class TestPlanBatches:
+    def test_empty(self):
+        assert plan_batches([]) == []
+
+    def test_batch_of_same_type(self):
+        ops = [operation("create", "version") for _ in range(3)]
+        assert plan_batches(ops) == [[0, 1, 2]]
+
+    def test_single_operation_not_batched(self):
+        ops = [operation("create", "version"), operation("create", "product")]
+        # Products are created before versions, each on its own
+        assert plan_batches(ops) == [[1], [0]]
+
+    def test_unsupported_entity_type(self):
+        ops = [operation("create", "folder") for _ in range(3)]
+        assert plan_batches(ops) == [[0], [1], [2]]
+
+    def test_creates_ordered_by_hierarchy(self):
+        ops = [
+            operation("create", "representation"),
+            operation("create", "version"),
+            operation("create", "product"),
+            operation("create", "representation"),
+            operation("create", "folder"),
+            operation("create", "version"),
+            operation("create", "product"),
+        ]
+        assert plan_batches(ops) == [[4], [2, 6], [1, 5], [0, 3]]
+
+    def test_updates_grouped_by_first_appearance(self):
+        ops = [
+            operation("update", "version", "a"),
+            operation("update", "product", "b"),
+            operation("update", "version", "c"),
+            operation("update", "product", "d"),
+        ]
+        assert plan_batches(ops) == [[0, 2], [1, 3]]
+
+    def test_deletes_keep_order(self):
+        ops = [
+            operation("delete", "representation", "a"),
+            operation("delete", "representation", "b"),
+            operation("delete", "version", "c"),
+            operation("delete", "representation", "d"),
+            operation("delete", "representation", "e"),
+        ]
+        assert plan_batches(ops) == [[0, 1], [2], [3, 4]]
+
+    def test_operation_types_not_mixed(self):
+        ops = [
+            operation("create", "version"),
+            operation("create", "version"),
+            operation("update", "version", "a"),
+            operation("update", "version", "b"),
+            operation("create", "product"),
+            operation("create", "version"),
+            operation("create", "product"),
+        ]
+        # Creates after the updates may depend on them, so they are
+        # never moved before the updates
+        assert plan_batches(ops) == [[0, 1], [2, 3], [4, 6], [5]]
+
+    def test_covers_all_operations(self):
+        ops = [
+            operation(op_type, entity_type, "x" if op_type != "create" else None)
+            for op_type in ["create", "update", "delete", "create"]
+            for entity_type in ["representation", "folder", "version", "task"]
+        ]
+        batches = plan_batches(ops)
+        assert sorted(i for batch in batches for i in batch) == list(range(len(ops)))
+
+
+class FakeTransaction:
+    def __init__(self):
+        self.savepoints = 0
+        self.rolled_back = 0
+
+    @asynccontextmanager
+    async def _savepoint(self):
+        self.savepoints += 1
+        try:
+            yield
+        except Exception:
+            self.rolled_back += 1
+            raise
+
+    def transaction(self):
+        return self._savepoint()
+
+
+def run_bulk(monkeypatch, process, operations: list[OperationModel]):
+    fallback_calls = []
+
+    async def fallback(ops, transaction):
+        fallback_calls.append((ops, transaction))
+        return [(index, None, None, "fallback") for index, _ in ops]
+
+    monkeypatch.setattr(bulk.BulkBatch, "process", process)
+    transaction = FakeTransaction()
+    indexed = list(enumerate(operations))[::-1]
+    result = asyncio.run(
+        process_bulk_operations(
+            "test",
+            SimpleNamespace(name="admin", is_manager=True),
+            indexed,
+            fallback,
+            transaction=transaction,
+        )
+    )
+    return result, fallback_calls, transaction
+
+
+class TestProcessBulkOperations:
+    ops = [operation("update", "version", f"{i:032x}") for i in range(3)]
+
+    def test_results_in_index_order(self, monkeypatch):
+        async def process(self, conn):
+            for item in self.items:
+                item.entity = SimpleNamespace(id=item.operation.entity_id)
+
+        result, fallback_calls, transaction = run_bulk(monkeypatch, process, self.ops)
+        assert not fallback_calls
+        assert transaction.savepoints == 1
+        assert [r[0] for r in result] == [0, 1, 2]
+        assert [r[3].entity_id for r in result] == [op.entity_id for op in self.ops]
+        assert all(r[3].success for r in result)
+
+    @pytest.mark.parametrize("error", [BulkFallback, ValueError])
+    def test_fallback_after_rollback(self, monkeypatch, error):
+        async def process(self, conn):
+            raise error()
+
+        result, fallback_calls, transaction = run_bulk(monkeypatch, process, self.ops)
+        # The savepoint is rolled back before the operations are retried
+        assert transaction.rolled_back == 1
+        assert len(fallback_calls) == 1
+        ops, conn = fallback_calls[0]
+        assert conn is transaction
+        assert sorted(index for index, _ in ops) == [0, 1, 2]
+        assert [r[3] for r in result] == ["fallback"] * 3
@@ -0,0 +1,231 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ayon_server.access.folder_access import SQL_OR_LIMIT, FolderAccessSet
+from ayon_server.access.utils import (
+    _add_access_path,
+    folder_access_set,
+    path_to_paths,
+)
+from ayon_server.exceptions import ForbiddenException
+
+PATHS = [
+    "assets",
+    "assets/characters",
+    "assets/characters/hero",
+    "assets/characters/hero/rig",
+    "assets/characters/villain",
+    "assets/props",
+    "assets_old",
+    "assets_old/characters",
+    "shots",
+    "shots/sq01",
+    "shots/sq01/sh010",
+    "shots/sq02",
+]
+
+
+def like_matches(patterns: list[str], path: str) -> bool:
+    """Evaluate `path LIKE ANY(patterns)` for patterns from path_to_paths"""
+    for pattern in patterns:
+        pattern = pattern.strip('"')
+        if pattern.endswith("%"):
+            if path.startswith(pattern[:-1]):
+                return True
+        elif path == pattern:
+            return True
+    return False
+
+
+def build(
+    paths: list[str],
+    include_parents: bool = False,
+    include_self: bool = True,
+) -> tuple[FolderAccessSet, list[str]]:
+    access_set = FolderAccessSet()
+    patterns = []
+    for path in paths:
+        _add_access_path(access_set, path, include_parents, include_self)
+        patterns.extend(path_to_paths(path, include_parents, include_self))
+    return access_set, patterns
+
+
+class TestFolderAccessSetMatching:
+    @pytest.mark.parametrize(
+        "paths",
+        [
+            ["assets/characters"],
+            ["assets/characters/hero"],
+            ["assets", "assets/characters/hero"],
+            ["assets/characters/hero", "shots/sq01"],
+            ["/assets/props/", "shots"],
+        ],
+    )
+    @pytest.mark.parametrize(
+        "include_parents,include_self",
+        [
+            (False, True),  # hierarchy
+            (False, False),  # children
+            (True, True),  # hierarchy, read
+            (True, False),  # children, read
+        ],
+    )
+    def test_same_as_like(self, paths, include_parents, include_self):
+        access_set, patterns = build(paths, include_parents, include_self)
+        for path in PATHS:
+            assert access_set.matches(path) == like_matches(patterns, path), path
+
+    def test_exact(self):
+        access_set = FolderAccessSet(exact=["assets/characters"])
+        assert access_set.matches("assets/characters")
+        assert access_set.matches("/assets/characters/")
+        assert not access_set.matches("assets")
+        assert not access_set.matches("assets/characters/hero")
+
+    def test_subtree(self):
+        access_set = FolderAccessSet(subtrees=["assets"])
+        assert access_set.matches("assets/characters")
+        assert access_set.matches("assets/characters/hero/rig")
+        assert not access_set.matches("assets")
+        assert not access_set.matches("assets_old/characters")
+        assert not access_set.matches("shots")
+
+    def test_children_only(self):
+        access_set, _ = build(["assets/characters"], include_self=False)
+        assert not access_set.matches("assets/characters")
+        assert access_set.matches("assets/characters/hero")
+        assert not access_set.matches("assets")
+
+    def test_parents_for_read(self):
+        access_set, _ = build(["assets/characters/hero"], include_parents=True)
+        assert access_set.matches("assets")
+        assert access_set.matches("assets/characters")
+        assert access_set.matches("assets/characters/hero")
+        assert access_set.matches("assets/characters/hero/rig")
+        assert not access_set.matches("assets/characters/villain")
+        assert not access_set.matches("assets/props")
+
+    def test_empty(self):
+        access_set = FolderAccessSet()
+        assert not access_set
+        assert not access_set.matches("")
+        assert not access_set.matches("assets")
+        assert access_set.sql_condition() == "FALSE"
+
+
+class TestFolderAccessSetRedundancy:
+    def test_subtree_covers_descendants(self):
+        access_set = FolderAccessSet(
+            exact=["assets/characters/hero"],
+            subtrees=["assets/characters", "assets/characters/hero"],
+        )
+        assert access_set.subtree_paths == ["assets/characters"]
+        assert access_set.exact_paths == []
+
+    def test_subtree_added_later_drops_descendants(self):
+        access_set = FolderAccessSet()
+        access_set.add_subtree("assets/characters/hero")
+        access_set.add_exact("assets/characters/villain")
+        access_set.add_subtree("assets/characters")
+        assert access_set.subtree_paths == ["assets/characters"]
+        assert access_set.exact_paths == []
+
+    def test_subtree_keeps_own_exact(self):
+        access_set = FolderAccessSet(exact=["assets"], subtrees=["assets"])
+        assert access_set.exact_paths == ["assets"]
+        assert access_set.subtree_paths == ["assets"]
+
+    def test_access_list(self):
+        access_set, _ = build(["assets/characters"])
+        assert access_set.access_list == [
+            '"assets/characters/%"',
+            '"assets/characters"',
+        ]
+
+    def test_dict_roundtrip(self):
+        access_set, _ = build(
+            ["assets/characters/hero", "shots/sq01"], include_parents=True
+        )
+        restored = FolderAccessSet.from_dict(access_set.to_dict())
+        assert restored.to_dict() == access_set.to_dict()
+        for path in PATHS:
+            assert restored.matches(path) == access_set.matches(path)
+
+
+class TestFolderAccessSetSQL:
+    def test_condition(self):
+        access_set = FolderAccessSet(exact=["assets"], subtrees=["shots/sq01"])
+        assert access_set.sql_condition("h.path") == (
+            "(h.path LIKE 'shots/sq01/%' OR h.path IN ('assets'))"
+        )
+
+    def test_escaping(self):
+        access_set = FolderAccessSet(
+            exact=["it's"],
+            subtrees=["assets_old", "100%"],
+        )
+        condition = access_set.sql_condition("path")
+        assert "path LIKE 'assets\\_old/%'" in condition
+        assert "path LIKE '100\\%/%'" in condition
+        assert "path IN ('it''s')" in condition
+
+    def test_many_subtrees(self):
+        subtrees = [f"shots/sh{i:03d}" for i in range(SQL_OR_LIMIT + 1)]
+        access_set = FolderAccessSet(subtrees=subtrees)
+        condition = access_set.sql_condition("path")
+        assert condition.startswith("(path LIKE ANY ('{")
+        assert condition.count("LIKE") == 1
+        assert '"shots/sh000/%"' in condition
+
+
+def make_user(permset, is_manager: bool = False):
+    return SimpleNamespace(
+        name="user",
+        is_manager=is_manager,
+        path_access_cache=None,
+        permissions=lambda project_name: SimpleNamespace(read=permset),
+    )
+
+
+def make_permset(*perms: tuple[str, str], enabled: bool = True):
+    return SimpleNamespace(
+        enabled=enabled,
+        access_list=[
+            SimpleNamespace(access_type=access_type, path=path)
+            for access_type, path in perms
+        ],
+    )
+
+
+class TestFolderAccessSetFromPermissions:
+    def test_manager(self):
+        user = make_user(make_permset(), is_manager=True)
+        assert asyncio.run(folder_access_set(user, "project")) is None
+
+    def test_disabled(self):
+        user = make_user(make_permset(enabled=False))
+        assert asyncio.run(folder_access_set(user, "project")) is None
+
+    def test_no_access(self):
+        user = make_user(make_permset())
+        with pytest.raises(ForbiddenException):
+            asyncio.run(folder_access_set(user, "project"))
+
+    def test_hierarchy_and_children(self):
+        permset = make_permset(
+            ("hierarchy", "assets/characters"),
+            ("children", "shots/sq01"),
+        )
+        user = make_user(permset)
+        access_set = asyncio.run(folder_access_set(user, "project"))
+        assert access_set is not None
+
+        patterns = path_to_paths("assets/characters", True, True)
+        patterns += path_to_paths("shots/sq01", True, False)
+        for path in PATHS:
+            assert access_set.matches(path) == like_matches(patterns, path), path
+
+        # cached for the rest of the request
+        assert user.path_access_cache["project"]["read"] is access_set
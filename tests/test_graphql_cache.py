@@ -0,0 +1,126 @@
+import hashlib
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+import strawberry
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ayon_server.lib.redis import Redis
+
+# The ayon_server.graphql package builds the schema from the attribute
+# library stored in the database, so the module is loaded on its own
+_spec = importlib.util.spec_from_file_location(
+    "graphql_cache",
+    Path(__file__).parent.parent / "ayon_server" / "graphql" / "cache.py",
+)
+assert _spec and _spec.loader
+cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cache)
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    def hello(self, name: str = "world") -> str:
+        return f"hello {name}"
+
+
+QUERY = "query Hello { hello }"
+QUERY_HASH = hashlib.sha256(QUERY.encode()).hexdigest()
+
+
+def persisted(sha256_hash: str = QUERY_HASH) -> dict:
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    storage: dict[str, str] = {}
+
+    async def get(namespace, key):
+        return storage.get(f"{namespace}-{key}")
+
+    async def set(namespace, key, value, ttl=0):
+        storage[f"{namespace}-{key}"] = value
+
+    monkeypatch.setattr(Redis, "get", get)
+    monkeypatch.setattr(Redis, "set", set)
+    for query_cache in cache.graphql_caches:
+        monkeypatch.setattr(query_cache, "data", type(query_cache.data)())
+        monkeypatch.setattr(query_cache, "hits", 0)
+        monkeypatch.setattr(query_cache, "misses", 0)
+    return storage
+
+
+@pytest.fixture
+def client(redis):
+    schema = cache.PersistedQuerySchema(
+        query=Query,
+        extensions=[cache.QueryCacheExtension],
+    )
+    app = FastAPI()
+    app.include_router(cache.PersistedQueryRouter(schema=schema), prefix="/graphql")
+    return TestClient(app)
+
+
+class TestPersistedQueries:
+    def test_register_and_hit(self, client, redis):
+        response = client.post(
+            "/graphql",
+            json={"query": QUERY, "extensions": persisted()},
+        )
+        assert response.json() == {"data": {"hello": "hello world"}}
+        assert redis == {f"{cache.PERSISTED_QUERY_NS}-{QUERY_HASH}": QUERY}
+
+        response = client.post("/graphql", json={"extensions": persisted()})
+        assert response.json() == {"data": {"hello": "hello world"}}
+
+    def test_hit_from_other_process(self, client, redis):
+        redis[f"{cache.PERSISTED_QUERY_NS}-{QUERY_HASH}"] = QUERY.encode()
+        response = client.get(
+            "/graphql",
+            params={"extensions": json.dumps(persisted())},
+            headers={"accept": "application/json"},
+        )
+        assert response.json() == {"data": {"hello": "hello world"}}
+
+    def test_miss_without_query(self, client, redis):
+        response = client.post("/graphql", json={"extensions": persisted()})
+        assert response.status_code == 200
+        result = response.json()
+        assert result["data"] is None
+        assert result["errors"][0]["message"] == "PersistedQueryNotFound"
+        assert result["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+        assert redis == {}
+
+    def test_hash_mismatch(self, client, redis):
+        response = client.post(
+            "/graphql",
+            json={"query": QUERY, "extensions": persisted("0" * 64)},
+        )
+        error = response.json()["errors"][0]
+        assert error["extensions"]["code"] == "PERSISTED_QUERY_HASH_MISMATCH"
+        assert redis == {}
+
+    def test_without_extensions(self, client, redis):
+        response = client.post("/graphql", json={"query": QUERY})
+        assert response.json() == {"data": {"hello": "hello world"}}
+        assert redis == {}
+
+
+class TestValidationCache:
+    def test_only_success_cached(self, client):
+        invalid = "{ goodbye }"
+        for _ in range(2):
+            response = client.post("/graphql", json={"query": invalid})
+            assert "goodbye" in response.json()["errors"][0]["message"]
+        assert invalid not in cache.validation_cache.data
+
+        for _ in range(2):
+            response = client.post("/graphql", json={"query": QUERY})
+            assert response.json() == {"data": {"hello": "hello world"}}
+        assert cache.validation_cache.data[QUERY] is True
+        assert cache.validation_cache.hits == 1
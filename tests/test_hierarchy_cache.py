@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from ayon_server.helpers import hierarchy_cache
+from ayon_server.lib.postgres import Postgres
+
+
+class FakeConnection:
+    def __init__(self):
+        self.in_transaction = False
+
+    def is_in_transaction(self):
+        return self.in_transaction
+
+
+class FakePool:
+    async def acquire(self, timeout=None):
+        return FakeConnection()
+
+
+@pytest.fixture
+def patches(monkeypatch):
+    patched: list[tuple[str, set[str], bool]] = []
+
+    async def patch(project_name, folder_ids, descendants=True):
+        patched.append((project_name, set(folder_ids), descendants))
+
+    async def release(conn):
+        # Nothing is patched before the transaction ends
+        assert patched == []
+
+    monkeypatch.setattr(hierarchy_cache, "_patch_hierarchy_cache", patch)
+    pool = FakePool()
+    pool.release = release
+    monkeypatch.setattr(Postgres, "pool", pool)
+    return patched
+
+
+def run_in_transaction(changes, fail: bool = False):
+    """Call update_hierarchy_cache within a (fake) transaction"""
+
+    async def run():
+        async with Postgres.acquire() as conn:
+            conn.in_transaction = True
+            for project_name, folder_ids, descendants in changes:
+                await hierarchy_cache.update_hierarchy_cache(
+                    project_name,
+                    folder_ids,
+                    transaction=conn,
+                    descendants=descendants,
+                )
+            if fail:
+                raise ValueError("rollback")
+
+    asyncio.run(run())
+
+
+class TestUpdateHierarchyCache:
+    def test_without_transaction(self, patches):
+        asyncio.run(hierarchy_cache.update_hierarchy_cache("p", ["a"]))
+        assert patches == [("p", {"a"}, True)]
+
+    def test_after_commit(self, patches):
+        run_in_transaction(
+            [
+                ("p", ["a"], True),
+                ("p", ["b", "a"], True),
+                ("p", ["c"], False),
+                ("q", ["a"], True),
+            ]
+        )
+        assert sorted(patches, key=str) == sorted(
+            [("p", {"a", "b"}, True), ("p", {"c"}, False), ("q", {"a"}, True)],
+            key=str,
+        )
+        assert Postgres._after_commit == {}
+
+    def test_rollback(self, patches):
+        with pytest.raises(ValueError):
+            run_in_transaction([("p", ["a"], True)], fail=True)
+        assert patches == []
+        assert Postgres._after_commit == {}
+
+    def test_empty(self, patches):
+        run_in_transaction([("p", [], True)])
+        assert patches == []
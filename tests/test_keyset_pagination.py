@@ -0,0 +1,148 @@
+import sqlite3
+from datetime import datetime, timezone
+from itertools import product
+
+import pytest
+
+from ayon_server.helpers.keyset import (
+    _keyset_expanded,
+    create_pagination,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+)
+
+# (a, b, id) - a and b contain NULLs, id is unique
+ROWS = [
+    (a, b, i)
+    for i, (a, b) in enumerate(product([1, 2, None], ["x", "y", None]), start=1)
+] + [(2, "x", 10), (None, None, 11)]
+
+
+@pytest.fixture(scope="module")
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (a INTEGER, b TEXT, id INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def ordered(db, columns: list[str], descending: bool, condition: str = "TRUE"):
+    # Postgres puts NULLs last in ascending and first in descending order
+    nulls = "NULLS FIRST" if descending else "NULLS LAST"
+    direction = "DESC" if descending else "ASC"
+    order = ", ".join(f"{c} {direction} {nulls}" for c in columns)
+    query = f"SELECT {', '.join(columns)} FROM t WHERE {condition} ORDER BY {order}"
+    return db.execute(query).fetchall()
+
+
+class TestCursor:
+    def test_roundtrip(self):
+        ts = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+        values = ["name", 42, None, ts]
+        cursor = encode_cursor(values)
+        assert decode_cursor(cursor, 4) == values
+
+    def test_is_url_safe(self):
+        cursor = encode_cursor(["a/b?c=d&e", "ü" * 10])
+        assert all(c.isalnum() or c in "-_=" for c in cursor)
+
+    def test_invalid(self):
+        assert decode_cursor("not a cursor", 1) is None
+        assert decode_cursor("", 1) is None
+        assert decode_cursor(encode_cursor([1, 2]), 1) is None
+        assert decode_cursor(encode_cursor([1]), 2) is None
+
+
+class TestKeysetCondition:
+    @pytest.mark.parametrize(
+        "columns",
+        [["id"], ["a", "id"], ["b", "id"], ["a", "b", "id"]],
+    )
+    @pytest.mark.parametrize("descending", [False, True])
+    def test_follows_order(self, db, columns, descending):
+        rows = ordered(db, columns, descending)
+        for i, row in enumerate(rows):
+            condition = keyset_condition(columns, list(row), descending)
+            assert ordered(db, columns, descending, condition) == rows[i + 1 :], (
+                row,
+                condition,
+            )
+
+    @pytest.mark.parametrize("descending", [False, True])
+    def test_expanded_follows_order(self, db, descending):
+        # The expanded form is used for cursors with NULLs,
+        # but it must be correct for any cursor
+        columns = ["a", "b", "id"]
+        rows = ordered(db, columns, descending)
+        for i, row in enumerate(rows):
+            condition = _keyset_expanded(columns, list(row), descending)
+            assert ordered(db, columns, descending, condition) == rows[i + 1 :]
+
+    def test_single_column(self):
+        assert keyset_condition(["id"], [5], False) == "id > 5"
+        assert keyset_condition(["id"], [5], True) == "id < 5"
+        assert keyset_condition(["name"], ["it's"], False) == "name > 'it''s'"
+
+    def test_row_value_comparison(self):
+        assert keyset_condition(["a", "id"], [1, 5], True) == "((a, id) < (1, 5))"
+        assert keyset_condition(["a", "id"], [1, 5], False) == (
+            "((a, id) > (1, 5) OR a IS NULL)"
+        )
+
+    def test_null_uses_expanded(self):
+        condition = keyset_condition(["a", "id"], [None, 5], False)
+        assert condition == "(FALSE OR (a IS NULL AND id > 5))"
+
+    def test_timestamp(self):
+        ts = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        condition = keyset_condition(["created_at", "id"], [ts, 1], False)
+        assert f"'{ts.isoformat()}'::timestamptz" in condition
+
+
+class TestCreatePagination:
+    def test_first(self):
+        pagination, conditions, cursor = create_pagination(["a", "id"], first=10)
+        assert pagination == "ORDER BY a ASC, id ASC LIMIT 11"
+        assert conditions == []
+        assert cursor == "a AS cursor_0, id AS cursor_1"
+
+    def test_default_page_size(self):
+        pagination, _, _ = create_pagination(["id"])
+        assert pagination == "ORDER BY id ASC LIMIT 101"
+
+    def test_after(self):
+        after = encode_cursor([None, 3])
+        _, conditions, _ = create_pagination(["a", "id"], first=10, after=after)
+        assert conditions == [keyset_condition(["a", "id"], [None, 3], False)]
+
+    def test_last_before(self):
+        before = encode_cursor([2, 3])
+        pagination, conditions, _ = create_pagination(
+            ["a", "id"],
+            last=5,
+            before=before,
+        )
+        assert pagination == "ORDER BY a DESC, id DESC LIMIT 6"
+        assert conditions == ["((a, id) < (2, 3))"]
+
+    def test_after_ignored_with_last(self):
+        after = encode_cursor([2, 3])
+        _, conditions, _ = create_pagination(["a", "id"], last=5, after=after)
+        assert conditions == []
+
+    def test_no_cursor_columns(self):
+        _, _, cursor = create_pagination(["id"], need_cursor=False)
+        assert cursor == "NULL AS cursor"
+
+    def test_legacy_cursor(self):
+        # Cursors of older versions were raw values of the sort column
+        _, conditions, _ = create_pagination(["creation_order"], first=10, after="42")
+        assert conditions == ["creation_order > '42'"]
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError):
+            create_pagination(["a", "id"], first=10, after="42")
+        with pytest.raises(ValueError):
+            create_pagination(["a", "id"], first=10, after=encode_cursor([1]))
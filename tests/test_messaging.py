@@ -0,0 +1,151 @@
+from itertools import product
+from types import SimpleNamespace
+
+import pytest
+
+from ayon_server.api.messaging import Messaging, TopicTrie
+
+
+class TestTopicTrie:
+    def test_prefix(self):
+        trie = TopicTrie()
+        trie.add("entity.folder", "a")
+        assert trie.match("entity.folder.created") == {"a"}
+        assert trie.match("entity.folder") == {"a"}
+        assert trie.match("entity.fold") == set()
+        assert trie.match("entity.task.created") == set()
+
+    def test_wildcard(self):
+        trie = TopicTrie()
+        trie.add("*", "a")
+        assert trie.match("entity.folder.created") == {"a"}
+        assert trie.match("") == {"a"}
+
+    def test_exact_and_nested(self):
+        trie = TopicTrie()
+        trie.add("entity", "a")
+        trie.add("entity.task.created", "b")
+        trie.add("entity.task", "c")
+        assert trie.match("entity.task.created") == {"a", "b", "c"}
+        assert trie.match("entity.task.updated") == {"a", "c"}
+        assert trie.match("entity.folder.created") == {"a"}
+
+    def test_remove_prunes(self):
+        trie = TopicTrie()
+        trie.add("entity.task", "a")
+        trie.add("entity.task", "b")
+        trie.add("*", "c")
+
+        trie.remove("entity.task", "a")
+        assert trie.match("entity.task.created") == {"b", "c"}
+
+        trie.remove("entity.task", "b")
+        trie.remove("*", "c")
+        assert trie.match("entity.task.created") == set()
+        assert trie.children == {}
+
+    def test_remove_unknown(self):
+        trie = TopicTrie()
+        trie.add("entity.task", "a")
+        trie.remove("entity.folder", "a")
+        trie.remove("entity.task", "b")
+        assert trie.match("entity.task.created") == {"a"}
+
+
+def make_client(
+    client_id: str,
+    topics: list[str],
+    user_name: str,
+    project_name: str | None = None,
+    is_manager: bool = False,
+    access_groups: dict | None = None,
+):
+    return SimpleNamespace(
+        id=client_id,
+        topics=topics,
+        authorized=True,
+        project_name=project_name,
+        user_name=user_name,
+        user=SimpleNamespace(
+            is_manager=is_manager,
+            data={"accessGroups": access_groups or {}},
+        ),
+    )
+
+
+def reference_recipients(clients, message) -> set[str]:
+    """Subscription matching done by looping over all clients"""
+    result = set()
+    project_name = message.get("project", None)
+    for client in clients:
+        if client.project_name is not None and message["topic"] != "inbox.message":
+            if project_name and project_name != client.project_name:
+                continue
+        if project_name and client.user and not client.user.is_manager:
+            if project_name not in client.user.data.get("accessGroups", {}):
+                continue
+        recipients = message.get("recipients", None)
+        if isinstance(recipients, list) and client.user_name not in recipients:
+            continue
+        if any(t == "*" or message["topic"].startswith(t) for t in client.topics):
+            result.add(client.id)
+    return result
+
+
+CLIENTS = [
+    make_client("all", ["*"], "admin", is_manager=True),
+    make_client("entities", ["entity"], "artist", access_groups={"p1": ["a"]}),
+    make_client("tasks", ["entity.task"], "artist", "p1", access_groups={"p1": []}),
+    make_client("exact", ["entity.task.created"], "lead", "p2", is_manager=True),
+    make_client("inbox", ["inbox"], "artist", "p2", access_groups={"p1": []}),
+    make_client("nogroups", ["entity", "inbox"], "guest"),
+]
+
+MESSAGES = [
+    {"topic": topic, **extra}
+    for topic, extra in product(
+        [
+            "entity.task.created",
+            "entity.task.updated",
+            "entity.folder.created",
+            "inbox.message",
+            "heartbeat",
+        ],
+        [
+            {},
+            {"project": "p1"},
+            {"project": "p2"},
+            {"recipients": ["artist"]},
+            {"project": "p1", "recipients": ["artist", "lead"]},
+            {"recipients": []},
+        ],
+    )
+]
+
+
+@pytest.fixture
+def messaging():
+    messaging = Messaging()
+    for client in CLIENTS:
+        messaging.clients[client.id] = client
+        messaging.index(client)
+    return messaging
+
+
+class TestGetRecipients:
+    @pytest.mark.parametrize("message", MESSAGES)
+    def test_same_as_reference(self, messaging, message):
+        result = {client.id for client in messaging.get_recipients(message)}
+        assert result == reference_recipients(CLIENTS, message)
+
+    def test_unindexed_client(self, messaging):
+        client = CLIENTS[0]
+        messaging.unindex(client)
+        message = {"topic": "heartbeat"}
+        assert messaging.get_recipients(message) == []
+
+    def test_removed_client(self, messaging):
+        messaging.clients.pop("entities")
+        message = {"topic": "entity.folder.created"}
+        result = {client.id for client in messaging.get_recipients(message)}
+        assert result == {"all", "nogroups"}
@@ -0,0 +1,183 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from api.operations import stream
+from api.operations.models import OperationModel, OperationResponseModel
+
+
+class FakeRequest:
+    def __init__(self, chunks: list[bytes]):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def collect_lines(chunks: list[bytes]) -> list[bytes]:
+    async def collect():
+        return [line async for line in stream.read_ndjson_lines(FakeRequest(chunks))]
+
+    return asyncio.run(collect())
+
+
+class TestReadNDJSONLines:
+    def test_lines_split_across_chunks(self):
+        chunks = [b'{"a":', b" 1}\n{", b'"b": 2}\n', b'{"c": 3}\n']
+        assert collect_lines(chunks) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+    def test_many_lines_in_chunk(self):
+        assert collect_lines([b"1\n2\n3\n"]) == [b"1", b"2", b"3"]
+
+    def test_empty_lines(self):
+        assert collect_lines([b"\n1\n\n", b"  \n2\r\n\n"]) == [b"1", b"2\r"]
+
+    def test_no_trailing_newline(self):
+        assert collect_lines([b"1\n", b"2"]) == [b"1", b"2"]
+
+    def test_empty(self):
+        assert collect_lines([]) == []
+        assert collect_lines([b"", b"\n\n"]) == []
+
+
+def operation(op_type: str, entity_id: str | None = None, fail: bool = False):
+    data = {"fail": True} if fail else {}
+    return OperationModel(
+        type=op_type,
+        entity_type="folder",
+        entity_id=entity_id,
+        data=data,
+    )
+
+
+def run_stream(
+    monkeypatch,
+    operations: list[OperationModel | str],
+    batch_size: int = 500,
+    can_fail: bool = False,
+) -> tuple[list[list[OperationModel]], list[dict]]:
+    """Run the endpoint and return processed batches and response lines"""
+    batches: list[list[OperationModel]] = []
+
+    async def process_batch(project_name, user, ops, can_fail):
+        batches.append(list(ops))
+        results = [
+            OperationResponseModel(
+                id=op.id,
+                type=op.type,
+                success=not (op.data or {}).get("fail"),
+                entity_type=op.entity_type,
+                entity_id=op.entity_id,
+            )
+            for op in ops
+        ]
+        committed = can_fail or all(r.success for r in results)
+        return [], results, committed
+
+    monkeypatch.setattr(stream, "process_batch", process_batch)
+
+    body = b"".join(
+        (op if isinstance(op, str) else op.json(by_alias=True)).encode() + b"\n"
+        for op in operations
+    )
+
+    async def run():
+        response = await stream.operations_stream(
+            request=FakeRequest([body]),
+            project_name="test",
+            user=SimpleNamespace(name="admin"),
+            batch_size=batch_size,
+            can_fail=can_fail,
+            x_sender=None,
+        )
+        return [json.loads(line) async for line in response.body_iterator]
+
+    return batches, asyncio.run(run())
+
+
+def batch_ids(batches: list[list[OperationModel]]) -> list[list[str]]:
+    return [[op.id for op in batch] for batch in batches]
+
+
+class TestOperationsStream:
+    def test_batch_size(self, monkeypatch):
+        ops = [operation("create") for _ in range(5)]
+        batches, lines = run_stream(monkeypatch, ops, batch_size=2)
+        assert batch_ids(batches) == [
+            [ops[0].id, ops[1].id],
+            [ops[2].id, ops[3].id],
+            [ops[4].id],
+        ]
+        assert [line["id"] for line in lines[:-1]] == [op.id for op in ops]
+        assert lines[-1] == {
+            "success": True,
+            "processed": 5,
+            "failed": 0,
+            "detail": None,
+        }
+
+    def test_duplicate_entity_flushes_early(self, monkeypatch):
+        ops = [
+            operation("update", "a"),
+            operation("update", "b"),
+            operation("delete", "a"),
+            operation("update", "b"),
+        ]
+        batches, _ = run_stream(monkeypatch, ops)
+        assert batch_ids(batches) == [
+            [ops[0].id, ops[1].id],
+            [ops[2].id, ops[3].id],
+        ]
+
+    def test_creates_never_conflict(self, monkeypatch):
+        ops = [operation("create"), operation("create"), operation("update", "a")]
+        batches, _ = run_stream(monkeypatch, ops)
+        assert batch_ids(batches) == [[op.id for op in ops]]
+
+    def test_stop_after_rollback(self, monkeypatch):
+        ops = [
+            operation("update", "a"),
+            operation("update", "b", fail=True),
+            operation("update", "c"),
+            operation("update", "d"),
+        ]
+        batches, lines = run_stream(monkeypatch, ops, batch_size=2)
+        # The failed batch is reported, the following one is not processed
+        assert batch_ids(batches) == [[ops[0].id, ops[1].id]]
+        assert [line["id"] for line in lines[:-1]] == [ops[0].id, ops[1].id]
+        assert lines[-1]["success"] is False
+        assert lines[-1]["failed"] == 1
+        assert lines[-1]["detail"] == "Batch rolled back"
+
+    def test_rollback_of_last_batch(self, monkeypatch):
+        ops = [operation("update", "a"), operation("update", "b", fail=True)]
+        batches, lines = run_stream(monkeypatch, ops, batch_size=2)
+        assert len(batches) == 1
+        assert lines[-1]["success"] is False
+
+    def test_can_fail_continues(self, monkeypatch):
+        ops = [
+            operation("update", "a", fail=True),
+            operation("update", "b"),
+            operation("update", "c"),
+        ]
+        batches, lines = run_stream(monkeypatch, ops, batch_size=1, can_fail=True)
+        assert len(batches) == 3
+        assert lines[-1]["success"] is False
+        assert lines[-1]["processed"] == 3
+        assert lines[-1]["failed"] == 1
+
+    @pytest.mark.parametrize("invalid", ["not json", '{"type": "rename"}'])
+    def test_invalid_line(self, monkeypatch, invalid):
+        ops = [operation("update", "a"), operation("update", "b")]
+        batches, lines = run_stream(
+            monkeypatch,
+            [ops[0], invalid, ops[1]],
+        )
+        # Operations before the invalid line are processed
+        assert batch_ids(batches) == [[ops[0].id]]
+        assert lines[-1]["success"] is False
+        assert lines[-1]["detail"].startswith("Invalid operation on line 2")
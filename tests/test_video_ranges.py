@@ -0,0 +1,193 @@
+import asyncio
+import email.utils
+import os
+
+import pytest
+from fastapi import Request
+
+from api.files.video import (
+    MAX_200_SIZE,
+    MAX_CHUNK_SIZE,
+    MAX_RANGES,
+    VideoResponse,
+    _get_ranges,
+    _if_range_matches,
+    range_requests_response,
+)
+from ayon_server.exceptions import RangeNotSatisfiableException
+
+# Larger than MAX_200_SIZE, so range requests are honored
+FILE_SIZE = MAX_200_SIZE + 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def video_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("video") / "video.mp4"
+    with open(path, "wb") as f:
+        f.write(os.urandom(1024 * 64))
+        f.truncate(FILE_SIZE)
+    return str(path)
+
+
+def make_request(headers: dict[str, str]) -> Request:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": [
+            (key.lower().encode("latin-1"), value.encode("latin-1"))
+            for key, value in headers.items()
+        ],
+    }
+    return Request(scope)
+
+
+def get_response(file_path: str, headers: dict[str, str]) -> VideoResponse:
+    return asyncio.run(
+        range_requests_response(make_request(headers), file_path, "video/mp4")
+    )
+
+
+def send_response(response: VideoResponse) -> tuple[dict[str, str], bytes]:
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response({"type": "http"}, receive, send))
+    headers = {k.decode(): v.decode() for k, v in messages[0]["headers"]}
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return headers, body
+
+
+class TestGetRanges:
+    def test_single(self):
+        assert _get_ranges("bytes=0-99", 1000) == [(0, 99)]
+        assert _get_ranges("bytes=100-", 1000) == [(100, 999)]
+
+    def test_suffix(self):
+        assert _get_ranges("bytes=-100", 1000) == [(900, 999)]
+        assert _get_ranges("bytes=-5000", 1000) == [(0, 999)]
+
+    def test_end_clamped(self):
+        assert _get_ranges("bytes=900-5000", 1000) == [(900, 999)]
+
+    def test_merge_overlapping(self):
+        assert _get_ranges("bytes=0-99,50-149", 1000) == [(0, 149)]
+        assert _get_ranges("bytes=500-599,0-99,550-", 1000) == [
+            (0, 99),
+            (500, 999),
+        ]
+
+    def test_merge_adjacent(self):
+        assert _get_ranges("bytes=0-99,100-199", 1000) == [(0, 199)]
+        assert _get_ranges("bytes=0-99,101-199", 1000) == [(0, 99), (101, 199)]
+
+    def test_start_out_of_bounds(self):
+        with pytest.raises(RangeNotSatisfiableException):
+            _get_ranges("bytes=1000-", 1000)
+        with pytest.raises(RangeNotSatisfiableException):
+            _get_ranges("bytes=2000-3000", 1000)
+        # Unsatisfiable ranges are ignored if others are valid
+        assert _get_ranges("bytes=2000-3000,0-9", 1000) == [(0, 9)]
+
+    @pytest.mark.parametrize(
+        "header",
+        ["items=0-99", "bytes=abc", "bytes=0-x", "bytes=10", "bytes=", "bytes=5-1"],
+    )
+    def test_invalid(self, header):
+        with pytest.raises(RangeNotSatisfiableException):
+            _get_ranges(header, 1000)
+
+
+class TestIfRange:
+    etag = '"abc-123"'
+    last_modified = "Wed, 01 May 2024 12:00:00 GMT"
+
+    def test_missing(self):
+        assert _if_range_matches(None, self.etag, self.last_modified)
+
+    def test_etag(self):
+        assert _if_range_matches('"abc-123"', self.etag, self.last_modified)
+        assert not _if_range_matches('"abc-124"', self.etag, self.last_modified)
+        # Weak tags never match
+        assert not _if_range_matches('W/"abc-123"', self.etag, self.last_modified)
+
+    def test_date(self):
+        assert _if_range_matches(self.last_modified, self.etag, self.last_modified)
+        other = "Wed, 01 May 2024 12:00:01 GMT"
+        assert not _if_range_matches(other, self.etag, self.last_modified)
+
+
+class TestRangeRequestsResponse:
+    def test_suffix_range(self, video_file):
+        response = get_response(video_file, {"Range": "bytes=-100"})
+        assert response.status_code == 206
+        headers, body = send_response(response)
+        assert (
+            headers["content-range"]
+            == f"bytes {FILE_SIZE - 100}-{FILE_SIZE - 1}/{FILE_SIZE}"
+        )
+        assert len(body) == 100
+
+    def test_open_range_capped(self, video_file):
+        response = get_response(video_file, {"Range": "bytes=0-"})
+        assert response.status_code == 206
+        assert response.parts == [(b"", 0, MAX_CHUNK_SIZE - 1)]
+
+    def test_multipart_content_length(self, video_file):
+        response = get_response(video_file, {"Range": "bytes=0-9,100-199,5000-5099"})
+        assert response.status_code == 206
+        headers, body = send_response(response)
+        assert headers["content-type"].startswith("multipart/byteranges; boundary=")
+        assert int(headers["content-length"]) == len(body)
+
+        with open(video_file, "rb") as f:
+            data = f.read(6000)
+        boundary = headers["content-type"].split("boundary=")[1]
+        parts = body.split(f"--{boundary}".encode())
+        assert parts[0] == b"\r\n"
+        assert parts[-1] == b"--\r\n"
+        for part, (start, end) in zip(parts[1:-1], [(0, 9), (100, 199), (5000, 5099)]):
+            head, payload = part.split(b"\r\n\r\n", 1)
+            assert f"content-range: bytes {start}-{end}/{FILE_SIZE}".encode() in head
+            assert payload == data[start : end + 1] + b"\r\n"
+
+    def test_too_many_ranges(self, video_file):
+        ranges = ",".join(f"{i * 100}-{i * 100 + 9}" for i in range(MAX_RANGES + 1))
+        response = get_response(video_file, {"Range": f"bytes={ranges}"})
+        assert response.status_code == 200
+        assert response.parts == [(b"", 0, FILE_SIZE - 1)]
+
+    def test_max_ranges(self, video_file):
+        ranges = ",".join(f"{i * 100}-{i * 100 + 9}" for i in range(MAX_RANGES))
+        response = get_response(video_file, {"Range": f"bytes={ranges}"})
+        assert response.status_code == 206
+        assert len(response.parts) == MAX_RANGES
+
+    def test_if_range_etag(self, video_file):
+        etag = get_response(video_file, {}).headers["etag"]
+        response = get_response(video_file, {"Range": "bytes=0-9", "If-Range": etag})
+        assert response.status_code == 206
+
+        response = get_response(
+            video_file, {"Range": "bytes=0-9", "If-Range": '"changed"'}
+        )
+        assert response.status_code == 200
+        assert response.parts == [(b"", 0, FILE_SIZE - 1)]
+
+    def test_if_range_date(self, video_file):
+        last_modified = get_response(video_file, {}).headers["last-modified"]
+        response = get_response(
+            video_file, {"Range": "bytes=0-9", "If-Range": last_modified}
+        )
+        assert response.status_code == 206
+
+        mtime = os.stat(video_file).st_mtime - 3600
+        older = email.utils.formatdate(mtime, usegmt=True)
+        response = get_response(video_file, {"Range": "bytes=0-9", "If-Range": older})
+        assert response.status_code == 200